@@ -15,7 +15,13 @@ export NODE_TLS_REJECT_UNAUTHORIZED=0
 export TIMESTAMP=$(date +"%m-%d-%y-%T")
 
 export CONFIG_GRPO="configs/config_qwen2.5_coder_7b_instruct.yaml" # configs/config_qwen3.yaml
-export PROJECT_ROOT="./projects"
+export PROJECT_ROOT="/dev/shm/webgen_projects"  # RAM-backed workspace, new projects fall back to ./projects when it runs low
+# same filesystem as PROJECT_ROOT (the default, beside it), so store hits are hardlinked rather than copied into RAM
+export NODE_MODULES_STORE="/dev/shm/webgen_node_modules_store"
+export NODE_MODULES_STORE_BUDGET_GB=16  # counts against /dev/shm, keep it well below its size
+export NPM_MIRROR_DIR="./npm_mirror"  # node-local npm registry mirror, NPM_MIRROR_OFFLINE=1 once populated
+export LAUNCHER="supervisor"  # project dev servers as process groups of each worker, "pm2" for the old behaviour
+# export PROJECT_CGROUP_PARENT="/sys/fs/cgroup/webgen.slice"  # delegated cgroup v2 parent for per-project cpu/memory/pids limits
 
 export CHROME="./chrome/chrome-linux64/chrome"
 export CHROME_DRIVER="./chrome/chromedriver-linux64/chromedriver"
@@ -28,6 +34,11 @@ export ROLLOUT_FILE="$OUTPUT_DIR/web_rollout.jsonl"
 export LOG_FILE="$OUTPUT_DIR/train.log"
 
 export OPENAI_API_KEY="sk-xxxxxx"
+export GRADER_BACKEND="openai"  # "local" grades on an OpenAI-compatible server at GRADER_BASE_URL (GRADER_MODEL)
+
+# Optional: one render daemon per node shared by all ranks (see web/render_daemon.py)
+# python -m web.render_daemon --socket /tmp/webgen_render.sock &
+# export RENDER_DAEMON_SOCKET="/tmp/webgen_render.sock"
 
 mkdir -p $OUTPUT_DIR
 
@@ -38,7 +38,10 @@ from .utils.competitive_programming import score_subtask
 
 # WebGen-R1
 from web import async_validate_code_format as web_code_format
-from web import async_grade_web_appearance as web_appearance
+from web import async_grade_web_appearance_batch as web_appearance_batch
+from web import render_dedup_key as web_render_dedup_key
+from web import rollout_to_jsonl as web_rollout_to_jsonl
+from web import flush_step_summary as web_flush_trace
 
 
 def accuracy_reward(completions: list[list[dict[str, str]]], solution: list[str], **kwargs) -> list[Optional[float]]:
@@ -681,6 +684,9 @@ def web_code_format_reward(completions, **kwargs):
 def web_appearance_reward(completions, **kwargs):
     """Reward function that evaluates website appearance using a VLM model, e.g., GPT-4o.
 
+    Completions that build byte-identical projects for the same instruction (e.g. differing only in
+    their reasoning) are rendered once and the score is shared among them.
+
     Assumes the dataset has the same format as hf.co/datasets/open-r1/ioi
 
     Args:
@@ -688,11 +694,30 @@ def web_appearance_reward(completions, **kwargs):
         **kwargs: Additional arguments passed from the dataset
     """
     async def async_call_appearance(completions, ids, instructions):
-        tasks = [
-            web_appearance(completion[0]["content"], problem_id, instruction)
-            for completion, problem_id, instruction in zip(completions, ids, instructions)
-        ]
-        results = await asyncio.gather(*tasks)
+        contents = [completion[0]["content"] for completion in completions]
+        groups = {}
+        for idx, (content, instruction) in enumerate(zip(contents, instructions)):
+            key = web_render_dedup_key(content, instruction)
+            groups.setdefault(key if key is not None else ("unparsed", idx), []).append(idx)
+
+        firsts = [members[0] for members in groups.values()]
+        for members in groups.values():
+            for idx in members[1:]:
+                web_rollout_to_jsonl(str(ids[idx]), instructions[idx], contents[idx])
+        group_scores = await web_appearance_batch(
+            [contents[idx] for idx in firsts], [ids[idx] for idx in firsts], [instructions[idx] for idx in firsts]
+        )
+
+        results = [0.0] * len(contents)
+        for members, score in zip(groups.values(), group_scores):
+            for idx in members:
+                results[idx] = score
+        if contents:
+            print(
+                f"web_appearance dedup: {len(contents)} completions -> {len(groups)} renders "
+                f"(dedup ratio {1 - len(groups) / len(contents):.2%})"
+            )
+        web_flush_trace()  # per-step span histograms and failure counts
         return results
     return asyncio.run(async_call_appearance(completions, kwargs["id"], kwargs["instruction"]))
 
@@ -0,0 +1,73 @@
+import os
+import json
+import time
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from web.render import lockfile_cache, node_modules_store
+
+
+def make_project(root: Path, dependencies: dict) -> Path:
+    root.mkdir(parents=True)
+    (root / "package.json").write_text(json.dumps({"name": root.name, "dependencies": dependencies}))
+    (root / lockfile_cache.LOCKFILE).write_text(json.dumps({"lockfileVersion": 3, "name": root.name}))
+    return root
+
+
+class LockfileCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.root, True)
+        patcher = mock.patch.object(lockfile_cache, "lockfile_root", str(self.root / "cache"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_key_is_independent_of_node_version(self):
+        project = make_project(self.root / "a", {"react": "^18.3.1"})
+        with mock.patch.object(node_modules_store, "_node_version", "v18.0.0"):
+            key = lockfile_cache.lockfile_key(project)
+        with mock.patch.object(node_modules_store, "_node_version", "v20.0.0"):
+            self.assertEqual(lockfile_cache.lockfile_key(project), key)
+        self.assertNotEqual(lockfile_cache.lockfile_key(project, ["npm install axios"]), key)
+        self.assertIsNone(lockfile_cache.lockfile_key(self.root / "missing"))
+
+    def test_record_lookup_invalidate(self):
+        project = make_project(self.root / "a", {"react": "^18.3.1"})
+        key = lockfile_cache.lockfile_key(project)
+        self.assertIsNone(lockfile_cache.lookup(key))
+        self.assertTrue(lockfile_cache.record(key, project, ["--legacy-peer-deps"]))
+        resolution = lockfile_cache.lookup(key)
+        self.assertEqual(resolution["flags"], ["--legacy-peer-deps"])
+        self.assertEqual(resolution["dependencies"], {"react": "^18.3.1"})
+        lockfile_cache.invalidate(key)
+        self.assertIsNone(lockfile_cache.lookup(key))
+
+    def test_expired_entry_is_replaced(self):
+        project = make_project(self.root / "a", {"react": "^18.3.1"})
+        key = lockfile_cache.lockfile_key(project)
+        with mock.patch.object(lockfile_cache.time, "time", return_value=time.time() - 30 * 86400):
+            lockfile_cache.record(key, project, [])
+        self.assertIsNone(lockfile_cache.lookup(key))
+        self.assertTrue(lockfile_cache.record(key, project, []))
+        self.assertIsNotNone(lockfile_cache.lookup(key))
+
+    def test_evict_least_recently_used(self):
+        keys = []
+        for i in range(3):
+            project = make_project(self.root / f"p{i}", {"react": f"^18.{i}.0"})
+            key = lockfile_cache.lockfile_key(project)
+            lockfile_cache.record(key, project, [])
+            meta = lockfile_cache._entry_path(key) / lockfile_cache.META_FILE
+            os.utime(meta, (1000 + i, 1000 + i))
+            keys.append(key)
+        self.assertEqual(lockfile_cache.evict(max_entries=2), 1)
+        self.assertIsNone(lockfile_cache.lookup(keys[0]))
+        self.assertIsNotNone(lockfile_cache.lookup(keys[1]))
+        self.assertIsNotNone(lockfile_cache.lookup(keys[2]))
+
+
+if __name__ == "__main__":
+    unittest.main()
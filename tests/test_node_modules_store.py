@@ -0,0 +1,144 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from web.render import node_modules_store as store
+
+
+def write_tree(root: Path, files: dict):
+    for name, content in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+
+
+class DependencyKeyTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(store, "_node_version", "v20.0.0")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_extra_packages(self):
+        actions = ["npm install && npm install axios@1.7.2 -D", "npm i dayjs && npm run dev", "yarn add lodash"]
+        self.assertEqual(store.extra_packages(actions), ["axios@1.7.2", "dayjs"])
+
+    def test_key_ignores_order_and_unrelated_fields(self):
+        a = {"name": "a", "dependencies": {"react": "^18.3.1", "vite": "^5.0.0"}, "scripts": {"dev": "vite"}}
+        b = {"name": "b", "dependencies": {"vite": " ^5.0.0", "react": "^18.3.1"}}
+        self.assertEqual(store.dependency_key_for(a), store.dependency_key_for(b))
+
+    def test_key_changes_with_dependencies(self):
+        base = {"dependencies": {"react": "^18.3.1"}}
+        key = store.dependency_key_for(base)
+        self.assertNotEqual(key, store.dependency_key_for({"dependencies": {"react": "^18.2.0"}}))
+        self.assertNotEqual(key, store.dependency_key_for({"devDependencies": {"react": "^18.3.1"}}))
+        self.assertNotEqual(key, store.dependency_key_for(base, ["npm install axios"]))
+
+    def test_invalid_package_json(self):
+        self.assertIsNone(store.dependency_key_for(["react"]))
+        with tempfile.TemporaryDirectory() as project:
+            self.assertIsNone(store.dependency_key(project))
+            Path(project, "package.json").write_text("{not json")
+            self.assertIsNone(store.dependency_key(project))
+
+
+class CloneTreeTest(unittest.TestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.root, True)
+        self.src = self.root / "node_modules"
+        write_tree(self.src, {"react/index.js": "module.exports = 1", ".vite/deps/chunk.js": "cached"})
+        os.symlink("../react/index.js", self.src / "entry.js")
+
+    def test_hardlink_shares_inodes(self):
+        dst = self.root / "project" / "node_modules"
+        self.assertEqual(store.clone_tree(self.src, dst, mode="hardlink"), "hardlink")
+        self.assertTrue(os.path.samefile(self.src / "react/index.js", dst / "react/index.js"))
+        self.assertTrue((dst / "entry.js").is_symlink())
+        self.assertFalse((dst / ".vite").exists())  # build caches stay per project
+
+    def test_copy(self):
+        dst = self.root / "project" / "node_modules"
+        self.assertEqual(store.clone_tree(self.src, dst, mode="copy"), "copy")
+        self.assertFalse(os.path.samefile(self.src / "react/index.js", dst / "react/index.js"))
+        self.assertEqual((dst / "react/index.js").read_text(), "module.exports = 1")
+
+    def test_auto_copies_across_filesystems(self):
+        dst = self.root / "project" / "node_modules"
+        with mock.patch.object(store, "same_filesystem", return_value=False), \
+                mock.patch.object(store, "_hardlink", side_effect=AssertionError("hardlink attempted")):
+            self.assertEqual(store.clone_tree(self.src, dst, mode="auto"), "copy")
+
+    def test_same_filesystem_of_missing_path(self):
+        self.assertTrue(store.same_filesystem(self.src, self.root / "missing" / "deeper"))
+
+
+class StoreTest(unittest.TestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.root, True)
+        for name, value in (("store_root", str(self.root / "store")), ("STORE_ENABLED", True),
+                            ("LINK_MODE", "auto"), ("_node_version", "v20.0.0")):
+            patcher = mock.patch.object(store, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def make_project(self, name: str, installed: bool = True) -> Path:
+        project = self.root / name
+        write_tree(project, {"package.json": json.dumps({"dependencies": {"react": "^18.3.1"}})})
+        if installed:
+            write_tree(project / "node_modules", {"react/index.js": "module.exports = 1"})
+        return project
+
+    def test_populate_then_link(self):
+        source = self.make_project("source")
+        key = store.dependency_key(source)
+        self.assertTrue(store.populate(key, source))
+        self.assertFalse(store.populate(key, source))  # already published
+
+        target = self.make_project("target", installed=False)
+        self.assertTrue(store.link_into(key, target))
+        self.assertEqual((target / "node_modules/react/index.js").read_text(), "module.exports = 1")
+        self.assertEqual((target / "node_modules" / store.STORE_MARKER).read_text(), key)
+        self.assertIn((target / "node_modules" / store.LINK_MODE_MARKER).read_text(), ("reflink", "hardlink", "copy"))
+
+    def test_miss(self):
+        target = self.make_project("target", installed=False)
+        self.assertFalse(store.link_into("0" * 32, target))
+        self.assertFalse(store.link_into(None, target))
+        self.assertFalse((target / "node_modules").exists())
+
+    def test_default_root_beside_workspace(self):
+        from web.render import workspace
+        with mock.patch.object(store, "store_root", ""), \
+                mock.patch.object(workspace, "project_root", str(self.root / "projects")):
+            self.assertEqual(store.get_store_root(), self.root / "webgen_node_modules_store")
+
+    def test_key_lock_removes_lock_file(self):
+        with store.key_lock("0" * 32) as acquired:
+            self.assertTrue(acquired)
+            self.assertTrue((self.root / "store/locks" / f"{'0' * 32}.lock").exists())
+        self.assertEqual(list((self.root / "store/locks").iterdir()), [])
+
+    def test_evict_least_recently_used(self):
+        keys = []
+        for i in range(3):
+            project = self.make_project(f"project_{i}")
+            key = f"{i:032d}"
+            self.assertTrue(store.populate(key, project))
+            meta = store._entry_path(key) / "meta.json"
+            os.utime(meta, (1000 + i, 1000 + i))
+            keys.append(key)
+        size = json.loads((store._entry_path(keys[0]) / "meta.json").read_text())["size"]
+        self.assertEqual(store.evict(budget_bytes=2 * size), 1)
+        self.assertFalse(store._entry_path(keys[0]).exists())
+        self.assertTrue(store._entry_path(keys[1]).exists())
+        self.assertTrue(store._entry_path(keys[2]).exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+import unittest
+import subprocess
+from unittest import mock
+
+from web.render import port_allocator
+from web.render.port_allocator import PortAllocator
+
+
+PORT_START = 47000
+PORT_COUNT = 8
+
+
+class PortAllocatorTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        self.path = os.path.join(self.directory, "leases.bin")
+        patcher = mock.patch.object(port_allocator, "_bindable", return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def allocator(self) -> PortAllocator:
+        return PortAllocator(path=self.path, start=PORT_START, size=PORT_COUNT)
+
+    def test_ports_are_unique_across_instances(self):
+        a, b = self.allocator(), self.allocator()
+        ports = [a.allocate("p1"), b.allocate("p2"), a.allocate("p3"), b.allocate("p4")]
+        self.assertEqual(len(set(ports)), 4)
+        self.assertTrue(all(PORT_START <= port < PORT_START + PORT_COUNT for port in ports))
+
+    def test_exhausted_range(self):
+        allocator = self.allocator()
+        for i in range(PORT_COUNT):
+            allocator.allocate(f"p{i}")
+        with self.assertRaises(RuntimeError):
+            allocator.allocate("one too many")
+
+    def test_release(self):
+        allocator = self.allocator()
+        ports = [allocator.allocate(f"p{i}") for i in range(PORT_COUNT)]
+        allocator.release(ports[3])
+        allocator.release(None)
+        allocator.release(PORT_START - 1)  # outside the range, ignored
+        self.assertEqual(allocator.allocate("again"), ports[3])
+
+    def test_release_owner(self):
+        a, b = self.allocator(), self.allocator()
+        a.allocate("project")
+        a.allocate("project")
+        b.allocate("project")
+        a.allocate("other")
+        self.assertEqual(a.release_owner("project"), 2)
+        self.assertEqual(a.release_owner("project", scan=True), 1)  # the lease b took
+        self.assertEqual(a.release_owner("project", scan=True), 0)
+
+    def test_dead_leases_are_reclaimed(self):
+        allocator = self.allocator()
+        child = subprocess.Popen(["true"])
+        child.wait()
+        for idx in range(PORT_COUNT):
+            allocator._write_slot(idx, child.pid, b"")
+        self.assertEqual(allocator.reclaim_dead(), PORT_COUNT)
+        for idx in range(PORT_COUNT):
+            allocator._write_slot(idx, child.pid, b"")
+        self.assertIn(allocator.allocate("p"), range(PORT_START, PORT_START + PORT_COUNT))
+
+    def test_unbindable_ports_are_skipped(self):
+        allocator = self.allocator()
+        with mock.patch.object(port_allocator, "_bindable", side_effect=lambda port: port != PORT_START):
+            self.assertEqual(allocator.allocate("p"), PORT_START + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
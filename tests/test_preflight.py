@@ -0,0 +1,125 @@
+import re
+import json
+import unittest
+from unittest import mock
+
+from web.render import preflight
+from web.render.preflight import (
+    MISSING_DEPENDENCY,
+    MISSING_ENTRY,
+    MISSING_RELATIVE_IMPORT,
+    NO_ARTIFACT,
+    OK,
+    TRUNCATED,
+    preflight_check,
+    preflight_stats,
+    record_outcome,
+    record_preflight,
+)
+from web.render.system_prompt import WEB_GEN_SYSTEM_PROMPT
+
+
+PACKAGE_JSON = json.dumps({"dependencies": {"react": "^18.3.1", "react-dom": "^18.3.1"}})
+INDEX_HTML = '<div id="root"></div>\n<script type="module" src="/src/main.tsx"></script>'
+
+
+def make_response(files, shell_actions=()):
+    actions = [f'<webAction type="file" filePath="{path}">\n{content}\n</webAction>' for path, content in files.items()]
+    actions += [f'<webAction type="shell">{action}</webAction>' for action in shell_actions]
+    return '<webArtifact id="test" title="Test">\n' + "\n".join(actions) + "\n</webArtifact>"
+
+def make_project(**extra_files):
+    files = {
+        "package.json": PACKAGE_JSON,
+        "index.html": INDEX_HTML,
+        "src/main.tsx": "import { createRoot } from 'react-dom/client'\nimport App from './App'\n",
+        "src/App.tsx": "export default function App() { return null }\n",
+    }
+    files.update(extra_files)
+    return files
+
+
+class PreflightTest(unittest.TestCase):
+    def test_valid_project(self):
+        self.assertEqual(preflight_check(make_response(make_project())), (OK, ""))
+
+    def test_starter_template(self):
+        template = re.search(r'```xml\s*(<webArtifact.*?</webArtifact>)\s*```', WEB_GEN_SYSTEM_PROMPT, re.DOTALL)
+        self.assertEqual(preflight_check(template.group(1))[0], OK)
+
+    def test_public_asset_import(self):
+        # stock create-vite pattern: `import viteLogo from '/vite.svg'`, served from public/
+        files = make_project(**{
+            "src/App.tsx": "import logo from '/logo.svg'\nexport default function App() { return logo }\n",
+            "public/logo.svg": "<svg></svg>",
+        })
+        self.assertEqual(preflight_check(make_response(files)), (OK, ""))
+
+    def test_missing_public_asset(self):
+        files = make_project(**{"src/App.tsx": "import logo from '/logo.svg'\nexport default logo\n"})
+        self.assertEqual(preflight_check(make_response(files))[0], MISSING_RELATIVE_IMPORT)
+
+    def test_missing_relative_import(self):
+        files = make_project(**{"src/App.tsx": "import Header from './components/Header'\nexport default Header\n"})
+        self.assertEqual(preflight_check(make_response(files)), (MISSING_RELATIVE_IMPORT, "src/App.tsx -> ./components/Header"))
+
+    def test_index_import_resolves(self):
+        files = make_project(**{
+            "src/App.tsx": "import Header from './components'\nexport default Header\n",
+            "src/components/index.tsx": "export default function Header() { return null }\n",
+        })
+        self.assertEqual(preflight_check(make_response(files))[0], OK)
+
+    def test_missing_entry(self):
+        files = make_project()
+        del files["src/main.tsx"]
+        self.assertEqual(preflight_check(make_response(files)), (MISSING_ENTRY, "/src/main.tsx"))
+
+    def test_undeclared_dependency(self):
+        files = make_project(**{"src/App.tsx": "import axios from 'axios'\nexport default axios\n"})
+        self.assertEqual(preflight_check(make_response(files)), (MISSING_DEPENDENCY, "src/App.tsx -> axios"))
+
+    def test_hoisted_dependency(self):
+        files = make_project(**{"src/App.tsx": "import { useNavigate } from 'react-router'\nexport default useNavigate\n"})
+        self.assertEqual(preflight_check(make_response(files))[0], MISSING_DEPENDENCY)
+        package_data = {"dependencies": {"react": "^18.3.1", "react-dom": "^18.3.1", "react-router-dom": "^6.26.0"}}
+        files["package.json"] = json.dumps(package_data)
+        self.assertEqual(preflight_check(make_response(files))[0], OK)
+
+    def test_dependency_installed_by_shell_action(self):
+        files = make_project(**{"src/App.tsx": "import axios from 'axios'\nexport default axios\n"})
+        self.assertEqual(preflight_check(make_response(files, ["npm install && npm install axios@1.7.2"]))[0], OK)
+
+    def test_type_imports_and_comments_ignored(self):
+        files = make_project(**{
+            "src/App.tsx": "import type { Foo } from 'missing-types'\n// import x from 'nope'\n"
+                           "/* import y from './nope' */\nexport default function App() { return null }\n",
+        })
+        self.assertEqual(preflight_check(make_response(files))[0], OK)
+
+    def test_truncated_and_missing_artifact(self):
+        response = make_response(make_project())
+        self.assertEqual(preflight_check(response[:len(response) // 2])[0], TRUNCATED)
+        self.assertEqual(preflight_check("no artifact here")[0], NO_ARTIFACT)
+
+
+class ShadowOutcomeTest(unittest.TestCase):
+    def setUp(self):
+        for name in ("_stats", "_disagreements"):
+            patcher = mock.patch.object(preflight, name, {})
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_rejected_project_that_scored_is_a_disagreement(self):
+        for reason in (MISSING_DEPENDENCY, MISSING_DEPENDENCY, OK):
+            record_preflight(reason)
+        self.assertTrue(record_outcome(MISSING_DEPENDENCY, 3))
+        self.assertFalse(record_outcome(MISSING_DEPENDENCY, 0))
+        self.assertFalse(record_outcome(OK, 4))
+        stats = preflight_stats()
+        self.assertEqual(stats[MISSING_DEPENDENCY]["disagreements"], 1)
+        self.assertEqual(stats[OK]["disagreements"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
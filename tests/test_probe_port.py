@@ -0,0 +1,50 @@
+import socket
+import threading
+import unittest
+
+from web.render.step_2_start_service import probe_port
+
+
+def serve_once(response: bytes) -> int:
+    """Answer one connection on a free port with `response`, return the port"""
+    server = socket.socket()
+    server.bind(("localhost", 0))
+    server.listen(1)
+
+    def answer():
+        with server:
+            conn, _ = server.accept()
+            with conn:
+                conn.recv(1024)
+                conn.sendall(response)
+
+    threading.Thread(target=answer, daemon=True).start()
+    return server.getsockname()[1]
+
+
+class ProbePortTest(unittest.TestCase):
+    def test_ok(self):
+        self.assertTrue(probe_port(serve_once(b"HTTP/1.1 200 OK\r\nContent-Length: 0\r\n\r\n")))
+
+    def test_redirect(self):
+        self.assertTrue(probe_port(serve_once(b"HTTP/1.1 302 Found\r\nLocation: /app/\r\n\r\n")))
+
+    def test_not_found(self):
+        self.assertTrue(probe_port(serve_once(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n")))
+
+    def test_server_error(self):
+        self.assertFalse(probe_port(serve_once(b"HTTP/1.1 503 Service Unavailable\r\n\r\n")))
+
+    def test_not_http(self):
+        self.assertFalse(probe_port(serve_once(b"SSH-2.0-OpenSSH_9.6\r\n")))
+        self.assertTrue(probe_port(serve_once(b"SSH-2.0-OpenSSH_9.6\r\n"), mode="tcp"))
+
+    def test_closed_port(self):
+        with socket.socket() as s:
+            s.bind(("localhost", 0))
+            port = s.getsockname()[1]
+        self.assertFalse(probe_port(port))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from web.render.screenshot_cache import ScreenshotCache, hamming, screenshot_cache_key
+
+
+def flip(value: str, bits: int) -> str:
+    """`value` with its lowest `bits` bits inverted"""
+    return f"{int(value, 16) ^ ((1 << bits) - 1):0{len(value)}x}"
+
+
+class ScreenshotCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        self.cache = ScreenshotCache(path=os.path.join(self.directory, "cache.sqlite"), max_distance=6)
+        self.key = screenshot_cache_key("a landing page", "grader:v1")
+        self.hashes = ["0" * 64, "f" * 64]
+
+    def test_hamming(self):
+        self.assertEqual(hamming("00", "00"), 0)
+        self.assertEqual(hamming("0f", "00"), 4)
+        self.assertEqual(hamming(flip("0" * 64, 6), "0" * 64), 6)
+
+    def test_key_depends_on_grader(self):
+        self.assertNotEqual(self.key, screenshot_cache_key("a landing page", "grader:v2"))
+
+    def test_exact_hit(self):
+        self.cache.put(self.key, self.hashes, "Grade: 4")
+        self.assertEqual(self.cache.get(self.key, self.hashes), "Grade: 4")
+        self.assertEqual(self.cache.cache_stats()["hits"], 1)
+
+    def test_near_hit(self):
+        self.cache.put(self.key, self.hashes, "Grade: 4")
+        self.assertEqual(self.cache.get(self.key, [flip(self.hashes[0], 6), self.hashes[1]]), "Grade: 4")
+        self.assertIsNone(self.cache.get(self.key, [flip(self.hashes[0], 7), self.hashes[1]]))
+        stats = self.cache.cache_stats()
+        self.assertEqual((stats["near_hits"], stats["misses"]), (1, 1))
+
+    def test_closest_entry_wins(self):
+        self.cache.put(self.key, [flip(self.hashes[0], 5), self.hashes[1]], "Grade: 2")
+        self.cache.put(self.key, [flip(self.hashes[0], 1), self.hashes[1]], "Grade: 3")
+        self.assertEqual(self.cache.get(self.key, self.hashes), "Grade: 3")
+
+    def test_miss_on_other_key_or_screenshot_count(self):
+        self.cache.put(self.key, self.hashes, "Grade: 4")
+        self.assertIsNone(self.cache.get(screenshot_cache_key("a blog", "grader:v1"), self.hashes))
+        self.assertIsNone(self.cache.get(self.key, self.hashes[:1]))
+
+    def test_evict_least_recently_used(self):
+        cache = ScreenshotCache(path=os.path.join(self.directory, "small.sqlite"), max_entries=2, max_distance=0)
+        for i in range(3):
+            cache.put(self.key, [f"{i:064x}"], f"Grade: {i}")
+        cache._conn().execute("UPDATE vlm_outputs SET last_used = 0 WHERE output = 'Grade: 1'")
+        self.assertEqual(cache.evict(), 1)
+        self.assertIsNone(cache.get(self.key, [f"{1:064x}"]))
+        self.assertEqual(cache.get(self.key, [f"{0:064x}"]), "Grade: 0")
+
+
+if __name__ == "__main__":
+    unittest.main()
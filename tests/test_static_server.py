@@ -0,0 +1,51 @@
+import shutil
+import tempfile
+import unittest
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from web.render.static_server import MOUNT_COOKIE, StaticMountServer
+
+
+class StaticMountServerTest(unittest.TestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.root, True)
+        for name in ("a", "b"):
+            (self.root / name).mkdir()
+            (self.root / name / "index.html").write_text(f"index {name}")
+            (self.root / name / "data.json").write_text(f'"{name}"')
+        self.server = StaticMountServer()
+        self.addCleanup(self.server.shutdown)
+        self.server.mount("a", self.root / "a")
+        self.server.mount("b", self.root / "b")
+
+    def get(self, path: str, **headers):
+        request = urllib.request.Request(f"http://127.0.0.1:{self.server.port}{path}", headers=headers)
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.read().decode(), response.headers
+
+    def test_prefixed_path_sets_mount_cookie(self):
+        body, headers = self.get("/b/data.json")
+        self.assertEqual(body, '"b"')
+        self.assertIn(f"{MOUNT_COOKIE}=b", headers["Set-Cookie"])
+        self.assertEqual(self.get("/a/some/route")[0], "index a")
+
+    def test_root_path_from_referer(self):
+        self.assertEqual(self.get("/data.json", Referer=f"http://127.0.0.1:{self.server.port}/b/assets/x.css")[0], '"b"')
+
+    def test_root_path_from_cookie(self):
+        self.assertEqual(self.get("/data.json", Cookie=f"{MOUNT_COOKIE}=a")[0], '"a"')
+        self.assertEqual(self.get("/dashboard", Cookie=f"{MOUNT_COOKIE}=b")[0], "index b")
+
+    def test_root_path_without_mount(self):
+        with self.assertRaises(urllib.error.HTTPError) as error:
+            self.get("/data.json")
+        self.assertEqual(error.exception.code, 404)
+        with self.assertRaises(urllib.error.HTTPError):
+            self.get("/data.json", Cookie=f"{MOUNT_COOKIE}=gone")
+
+
+if __name__ == "__main__":
+    unittest.main()
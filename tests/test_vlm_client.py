@@ -0,0 +1,25 @@
+import os
+import unittest
+from unittest import mock
+
+import openai
+
+from web.render.vlm_client import VLMClient
+
+
+class VLMClientTest(unittest.TestCase):
+    def test_missing_api_key_raises(self):
+        environ = {k: v for k, v in os.environ.items() if k not in ("OPENAI_API_KEY", "OPENAI_BASE_URL")}
+        with mock.patch.dict(os.environ, environ, clear=True):
+            with self.assertRaises(openai.OpenAIError):
+                VLMClient()
+
+    def test_client_starts_with_api_key(self):
+        client = VLMClient(api_key="test-key")
+        self.assertTrue(client.thread.is_alive())
+        self.assertEqual(client.vlm_stats()["requests"], 0)
+        client.loop.call_soon_threadsafe(client.loop.stop)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -12,7 +12,23 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from .web_appearance import grade_web_appearance, async_grade_web_appearance
+from .web_appearance import (
+    async_grade_web_appearance,
+    async_grade_web_appearance_batch,
+    grade_web_appearance,
+    render_dedup_key,
+    rollout_to_jsonl,
+)
 from .web_code_format import validate_code_format, async_validate_code_format
+from .render.trace import flush_step_summary
 
-__all__ = ["grade_web_appearance", "validate_code_format", "async_grade_web_appearance", "async_validate_code_format"]
\ No newline at end of file
+__all__ = [
+    "grade_web_appearance",
+    "validate_code_format",
+    "async_grade_web_appearance",
+    "async_validate_code_format",
+    "async_grade_web_appearance_batch",
+    "render_dedup_key",
+    "rollout_to_jsonl",
+    "flush_step_summary",
+]
\ No newline at end of file
@@ -0,0 +1,321 @@
+"""
+Offline benchmark of the web render reward pipeline.
+
+Replays stored rollouts through the render path against a local stub of the VLM endpoint
+(or the in-process stub grader, or a local grading server with --grader local), so render
+throughput can be measured without a GPU or the real OpenAI API:
+
+    python -m web.benchmark --rollouts web_rollout.jsonl --concurrency 1,4,16 \\
+        --vlm-latency 2.0 --output bench/baseline.json
+
+    # later, after a change
+    python -m web.benchmark --rollouts web_rollout.jsonl --concurrency 1,4,16 \\
+        --vlm-latency 2.0 --output bench/candidate.json --compare bench/baseline.json
+
+Input files are JSON or JSONL in the format written by `rollout_to_jsonl`
+({"problem_id", "instruction", "model_response"}); records using "id"/"response"/"completion"
+keys are accepted too. For every concurrency level the report has p50/p95/p99 per traced
+span (see render/trace.py), per-rollout latency, rollouts per second and the failure classes.
+
+Levels run one after another in one process, so by default later levels find the node_modules
+store, lockfile cache and npm cache warmed by earlier ones. With --cold every level gets its own
+empty cache directories; the report records which mode was used.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import asyncio
+import argparse
+import platform
+import threading
+import subprocess
+import tempfile
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+
+def load_rollouts(paths: List[str], limit: Optional[int] = None) -> List[dict]:
+    from .render.utils import load_json_or_jsonl
+
+    rollouts = []
+    for path in paths:
+        for idx, record in enumerate(load_json_or_jsonl(path)):
+            model_response = record.get("model_response") or record.get("response") or record.get("completion")
+            if not model_response:
+                continue
+            rollouts.append({
+                "problem_id": str(record.get("problem_id", record.get("id", f"{os.path.basename(path)}-{idx}"))),
+                "instruction": record.get("instruction") or record.get("prompt") or "",
+                "model_response": model_response,
+            })
+    return rollouts[:limit] if limit else rollouts
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"count": 0}
+    values = sorted(values)
+
+    def rank(q):
+        return round(values[min(len(values) - 1, int(q * len(values)))], 4)
+
+    return {"count": len(values), "mean": round(sum(values) / len(values), 4),
+            "p50": rank(0.50), "p95": rank(0.95), "p99": rank(0.99)}
+
+
+class StubVLMHandler(BaseHTTPRequestHandler):
+    """OpenAI-compatible /chat/completions that answers with a canned grade after a delay"""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", "0")))
+        config = self.server.config
+        time.sleep(max(0.0, random.gauss(config["latency"], config["jitter"])))
+        if random.random() < config["error_rate"]:
+            self.send_error(500, "stub VLM error")
+            return
+        grade = config["grade"] if config["grade"] is not None else random.randint(0, 5)
+        body = json.dumps({
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "stub",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": f"Analysis: stub grader.\n\nGrade: {grade}"},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_vlm(latency: float, jitter: float, grade: Optional[int], error_rate: float) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubVLMHandler)
+    server.daemon_threads = True
+    server.config = {"latency": latency, "jitter": jitter, "grade": grade, "error_rate": error_rate}
+    threading.Thread(target=server.serve_forever, daemon=True, name="stub-vlm").start()
+    return server
+
+
+class SpanCollector:
+    """Collect raw span and rollout durations from the trace listener of the current level"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.spans = {}
+        self.rollouts = []
+        self.failures = {}
+
+    def __call__(self, record: dict):
+        with self.lock:
+            if record.get("type") == "span":
+                self.spans.setdefault(record["span"], []).append(record["duration"])
+            elif record.get("type") == "trace":
+                self.rollouts.append(record["duration"])
+                failure = record.get("failure") or "ok"
+                self.failures[failure] = self.failures.get(failure, 0) + 1
+
+
+def isolate_caches(level_dir: Path):
+    """Point the dependency and score caches at empty directories under `level_dir`"""
+    from . import reward_cache
+    from .render import lockfile_cache, node_modules_store, screenshot_cache
+
+    node_modules_store.store_root = str(level_dir / "node_modules_store")
+    lockfile_cache.lockfile_root = str(level_dir / "lockfile_cache")
+    os.environ["npm_config_cache"] = str(level_dir / "npm_cache")  # inherited by npm install
+    if reward_cache.CACHE_ENABLED:
+        reward_cache._cache = reward_cache.RewardCache(path=str(level_dir / "reward_cache.sqlite"))
+    if screenshot_cache.CACHE_ENABLED and screenshot_cache.Image is not None:
+        screenshot_cache._cache = screenshot_cache.ScreenshotCache(path=str(level_dir / "screenshot_cache.sqlite"))
+
+def run_level(rollouts: List[dict], concurrency: int, mode: str, cache_mode: str = "shared") -> dict:
+    from .render import trace
+    from .web_appearance import async_grade_web_appearance_local, grade_web_appearance
+
+    collector = SpanCollector()
+    trace.add_listener(collector)
+    start = time.time()
+    try:
+        if mode == "sync":
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                scores = list(executor.map(
+                    lambda r: grade_web_appearance(r["model_response"], r["problem_id"], r["instruction"]), rollouts
+                ))
+        else:
+            async def run_all():
+                slots = asyncio.Semaphore(concurrency)
+
+                async def one(r):
+                    async with slots:
+                        return await async_grade_web_appearance_local(
+                            r["model_response"], r["problem_id"], r["instruction"], log_rollout=False
+                        )
+                return await asyncio.gather(*[one(r) for r in rollouts])
+            scores = asyncio.run(run_all())
+    finally:
+        trace.remove_listener(collector)
+    wall = time.time() - start
+    return {
+        "concurrency": concurrency,
+        "cache_mode": cache_mode,
+        "rollouts": len(rollouts),
+        "wall_seconds": round(wall, 3),
+        "rollouts_per_second": round(len(rollouts) / wall, 4) if wall > 0 else 0.0,
+        "score_mean": round(sum(scores) / len(scores), 4) if scores else 0.0,
+        "failures": collector.failures,
+        "rollout_latency": percentiles(collector.rollouts),
+        "stages": {name: percentiles(values) for name, values in sorted(collector.spans.items())},
+    }
+
+def environment_info(args) -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, timeout=10
+        ).stdout.strip()
+    except Exception:
+        commit = ""
+    knobs = {k: v for k, v in os.environ.items()
+             if k.startswith(("RENDER_", "BROWSER_", "NODE_MODULES_", "TEMPLATE_POOL_", "SERVE_MODE",
+                              "READINESS_", "PREFLIGHT_", "PORT_", "GRADER_", "VLM_"))}
+    return {
+        "commit": commit,
+        "host": platform.node(),
+        "platform": f"{platform.system()}-{platform.machine()}",
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "timestamp": time.time(),
+        "mode": args.mode,
+        "cache_mode": "cold" if args.cold else "shared",
+        "rollout_files": args.rollouts,
+        "vlm": {"grader": args.grader, "latency": args.vlm_latency, "jitter": args.vlm_jitter,
+                "grade": args.vlm_grade, "error_rate": args.vlm_error_rate},
+        "env": knobs,
+    }
+
+def compare(report: dict, baseline: dict, tolerance: float) -> bool:
+    """Print throughput and p95 changes per concurrency level, False if throughput regressed beyond `tolerance`"""
+    ok = True
+    base_mode = baseline["environment"].get("cache_mode", "shared")
+    if base_mode != report["environment"]["cache_mode"]:
+        print(f"warning: comparing {report['environment']['cache_mode']} caches against a {base_mode} baseline")
+    base_levels = {level["concurrency"]: level for level in baseline["levels"]}
+    for level in report["levels"]:
+        base = base_levels.get(level["concurrency"])
+        if base is None or not base["rollouts_per_second"]:
+            continue
+        change = level["rollouts_per_second"] / base["rollouts_per_second"] - 1
+        flag = ""
+        if change < -tolerance:
+            ok = False
+            flag = "  REGRESSION"
+        print(f"concurrency {level['concurrency']}: {base['rollouts_per_second']:.3f} -> "
+              f"{level['rollouts_per_second']:.3f} rollouts/s ({change:+.1%}){flag}")
+        for name, stats in level["stages"].items():
+            base_stats = base["stages"].get(name, {})
+            if "p95" in stats and base_stats.get("p95"):
+                print(f"  {name:<20} p95 {base_stats['p95']:.3f}s -> {stats['p95']:.3f}s")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the web render reward pipeline")
+    parser.add_argument("--rollouts", nargs="+", required=True, help="web_rollout.jsonl / requests.jsonl files")
+    parser.add_argument("--limit", type=int, default=None, help="use the first N rollouts")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated concurrency levels")
+    parser.add_argument("--mode", choices=["pipeline", "sync"], default="pipeline",
+                        help="pipeline: async_grade_web_appearance_local, sync: grade_web_appearance on threads")
+    parser.add_argument("--grader", choices=["http-stub", "stub", "local"], default="http-stub",
+                        help="http-stub: OpenAI-compatible stub server, stub: in-process StubGrader, "
+                             "local: the GRADER_BASE_URL endpoint")
+    parser.add_argument("--vlm-latency", type=float, default=2.0, help="mean stub VLM latency in seconds")
+    parser.add_argument("--vlm-jitter", type=float, default=0.5, help="stddev of the stub VLM latency")
+    parser.add_argument("--vlm-grade", type=int, default=None, help="fixed grade, random 0-5 if unset")
+    parser.add_argument("--vlm-error-rate", type=float, default=0.0, help="share of stub requests answered with HTTP 500")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--use-reward-cache", action="store_true", help="keep the persistent score and screenshot caches enabled")
+    parser.add_argument("--cold", action="store_true",
+                        help="give every concurrency level its own empty caches instead of the ones warmed by earlier levels")
+    parser.add_argument("--output", default="render_benchmark.json", help="machine-readable report")
+    parser.add_argument("--compare", default=None, help="baseline report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed throughput drop vs. the baseline")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    from . import reward_cache
+    from .render import screenshot_cache
+    from .render.graders import OpenAIGrader, StubGrader, get_grader, make_grader, set_grader
+
+    # replace the grader, the render modules are already imported with `web`
+    stub = None
+    if args.grader == "http-stub":
+        stub = start_stub_vlm(args.vlm_latency, args.vlm_jitter, args.vlm_grade, args.vlm_error_rate)
+        grader_url = f"http://127.0.0.1:{stub.server_address[1]}/v1"
+        set_grader(OpenAIGrader("stub", base_url=grader_url, api_key="stub"))
+    elif args.grader == "stub":
+        grader_url = "in-process"
+        set_grader(StubGrader(args.vlm_latency, args.vlm_jitter, args.vlm_grade))
+    else:
+        grader = make_grader("local")
+        grader_url = grader.client.base_url
+        set_grader(grader)
+    if not args.use_reward_cache:
+        reward_cache.CACHE_ENABLED = False
+        screenshot_cache.CACHE_ENABLED = False
+
+    rollouts = load_rollouts(args.rollouts, args.limit)
+    if not rollouts:
+        sys.exit("no rollouts found")
+    print(f"Benchmarking {len(rollouts)} rollouts on {socket.gethostname()}, {args.grader} grader at {grader_url}")
+
+    report = {"environment": environment_info(args), "levels": []}
+    cold_root = None
+    if args.cold:
+        # beside the default store, so linking from the per-level store stays on one filesystem
+        from .render import node_modules_store
+        store_parent = node_modules_store.get_store_root().parent
+        store_parent.mkdir(parents=True, exist_ok=True)
+        cold_root = Path(tempfile.mkdtemp(prefix="webgen_benchmark_", dir=store_parent))
+    try:
+        for idx, concurrency in enumerate(int(c) for c in args.concurrency.split(",") if c.strip()):
+            if cold_root is not None:
+                isolate_caches(cold_root / f"level_{idx}")
+            level = run_level(rollouts, concurrency, args.mode, report["environment"]["cache_mode"])
+            report["levels"].append(level)
+            latency = level["rollout_latency"]
+            print(f"concurrency {concurrency}: {level['rollouts_per_second']:.3f} rollouts/s, "
+                  f"rollout p50 {latency.get('p50')}s p95 {latency.get('p95')}s p99 {latency.get('p99')}s, "
+                  f"failures {level['failures']}")
+    finally:
+        if cold_root is not None:
+            shutil.rmtree(cold_root, ignore_errors=True)
+    if stub is not None:
+        stub.shutdown()
+    report["grader"] = get_grader().grader_stats()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if not compare(report, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
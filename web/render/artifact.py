@@ -0,0 +1,43 @@
+import re
+import json
+import hashlib
+from typing import Optional
+
+from .step_1_response_parsing import extract_web_actions
+
+
+ARTIFACT_PATTERN = re.compile(r'<webArtifact[^>]*>(.*?)</webArtifact>', re.DOTALL)
+# same action pattern as extract_and_build_project, so the canonical form matches the built project
+ACTION_PATTERN = re.compile(
+    r'<webAction\s+type="([^"]+)"(?:.*?filePath="([^"]+)")?.*?>(.*?)</webAction>',
+    re.DOTALL
+)
+
+
+def canonical_artifact(model_response: str) -> Optional[dict]:
+    """
+    Reduce a response to what actually determines the rendered project: the files written by
+    extract_and_build_project and the shell/start actions. Reasoning text, comments and
+    whitespace around actions are dropped. Returns None if there is no complete artifact.
+    """
+    artifact_match = ARTIFACT_PATTERN.search(model_response)
+    if not artifact_match:
+        return None
+    files = {}
+    for match in ACTION_PATTERN.finditer(artifact_match.group(1)):
+        if match.group(1) == "file" and match.group(2):
+            files[match.group(2)] = match.group(3).strip()  # last write wins, as on disk
+    shell_actions, last_start_action = extract_web_actions(model_response)
+    return {
+        "files": dict(sorted(files.items())),
+        "shell": [" ".join(action.split()) for action in shell_actions],
+        "start": " ".join(last_start_action.split()),
+    }
+
+def artifact_digest(model_response: str, *context: str) -> Optional[str]:
+    """Hash of the canonical artifact plus any extra context (instruction, grader version, ...)"""
+    artifact = canonical_artifact(model_response)
+    if artifact is None:
+        return None
+    payload = json.dumps({"artifact": artifact, "context": list(context)}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
@@ -0,0 +1,181 @@
+import os
+import queue
+import atexit
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from selenium.common.exceptions import WebDriverException
+
+
+RANK = int(os.environ.get("RANK", "0"))
+POOL_SIZE = int(os.environ.get("BROWSER_POOL_SIZE", "4"))
+MAX_PAGES_PER_BROWSER = int(os.environ.get("BROWSER_MAX_PAGES", "200"))
+MAX_BROWSER_RSS_MB = float(os.environ.get("BROWSER_MAX_RSS_MB", "2048"))
+browser_data_root = os.environ.get("BROWSER_DATA_DIR", tempfile.gettempdir())
+
+
+def _process_tree_rss(pid: int) -> int:
+    """Sum the resident memory (bytes) of a process and all its descendants using /proc"""
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status", "r") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children", "r") as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except (OSError, ValueError):
+            continue
+    return total
+
+
+class PooledBrowser:
+    """A long-lived chromedriver + Chrome pair, each capture runs in a throwaway browser context"""
+
+    def __init__(self, width: int = 1024, height: int = 768):
+        from .step_3_get_screenshots import make_driver
+
+        self.user_data_dir = tempfile.mkdtemp(prefix=f"chrome_rank{RANK}_pid{os.getpid()}_", dir=browser_data_root)
+        self.driver = make_driver(width=width, height=height, user_data_dir=self.user_data_dir)
+        self.base_handle = self.driver.current_window_handle
+        self.pages = 0
+
+    def is_healthy(self) -> bool:
+        try:
+            self.driver.switch_to.window(self.base_handle)
+            return self.driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def rss_bytes(self) -> int:
+        try:
+            return _process_tree_rss(self.driver.service.process.pid)
+        except Exception:
+            return 0
+
+    @contextmanager
+    def isolated_page(self, width: int, height: int):
+        """
+        Open a tab in a fresh incognito-like browser context (own cookies, storage and cache)
+        and dispose of the whole context afterwards.
+        """
+        context_id = self.driver.execute_cdp_cmd("Target.createBrowserContext", {"disposeOnDetach": True})["browserContextId"]
+        target_id = None
+        try:
+            target_id = self.driver.execute_cdp_cmd(
+                "Target.createTarget", {"url": "about:blank", "browserContextId": context_id}
+            )["targetId"]
+            self.driver.switch_to.window(target_id)  # chromedriver window handles are target ids
+            self.driver.execute_cdp_cmd(
+                "Emulation.setDeviceMetricsOverride",
+                {"width": width, "height": height, "deviceScaleFactor": 1, "mobile": False},
+            )
+            yield self.driver
+        finally:
+            self.pages += 1
+            try:
+                self.driver.switch_to.window(self.base_handle)
+                if target_id is not None:
+                    self.driver.execute_cdp_cmd("Target.closeTarget", {"targetId": target_id})
+                self.driver.execute_cdp_cmd("Target.disposeBrowserContext", {"browserContextId": context_id})
+            except Exception:
+                pass
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception:
+            pass
+        shutil.rmtree(self.user_data_dir, ignore_errors=True)
+
+
+class BrowserPool:
+    """
+    Bounded pool of long-lived headless browsers for one worker.
+
+    Browsers are health-checked on checkout, recycled after `max_pages` captures or once the
+    Chrome process tree exceeds `max_rss_mb`, and replaced if a capture leaves them broken.
+    """
+
+    def __init__(self, size: int = POOL_SIZE, max_pages: int = MAX_PAGES_PER_BROWSER, max_rss_mb: float = MAX_BROWSER_RSS_MB):
+        self.size = size
+        self.max_pages = max_pages
+        self.max_rss_bytes = max_rss_mb * 1024 * 1024
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(size)
+        self.stats_lock = threading.Lock()
+        self.stats = {"launched": 0, "recycled": 0, "crashed": 0, "pages": 0}
+
+    def _bump(self, counter: str):
+        with self.stats_lock:
+            self.stats[counter] += 1
+
+    def _checkout(self) -> PooledBrowser:
+        while True:
+            try:
+                browser = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            if browser.is_healthy():
+                return browser
+            self._bump("crashed")
+            browser.quit()
+        self._bump("launched")
+        return PooledBrowser()
+
+    def _checkin(self, browser: PooledBrowser, failed: bool):
+        if failed and not browser.is_healthy():
+            self._bump("crashed")
+            browser.quit()
+        elif browser.pages >= self.max_pages or browser.rss_bytes() > self.max_rss_bytes:
+            self._bump("recycled")
+            browser.quit()
+        else:
+            self.idle.put(browser)
+
+    @contextmanager
+    def page(self, width: int = 1024, height: int = 768):
+        """Borrow an isolated page, blocking while all `size` browsers are busy"""
+        self.slots.acquire()
+        browser = None
+        failed = False
+        try:
+            browser = self._checkout()
+            with browser.isolated_page(width, height) as driver:
+                yield driver
+        except WebDriverException:
+            failed = True
+            raise
+        finally:
+            if browser is not None:
+                self._bump("pages")
+                self._checkin(browser, failed)
+            self.slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().quit()
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_browser_pool() -> BrowserPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            Path(browser_data_root).mkdir(parents=True, exist_ok=True)
+            _pool = BrowserPool()
+            atexit.register(_pool.close)
+    return _pool
@@ -0,0 +1,117 @@
+import os
+import re
+import time
+import threading
+import urllib.error
+import urllib.request
+from typing import List, Optional, Tuple
+
+from .log_tail import LogTail
+from .trace import RenderFailure
+
+
+# Fatal Vite/esbuild errors in a project's out.log/err.log fail the serve stage before a
+# browser is launched, the page would only show the error overlay
+BUILD_LOG_GATE_ENABLED = os.environ.get("BUILD_LOG_GATE_ENABLED", "1") == "1"
+# after the port is up: request the entry modules so Vite transforms them, then watch the logs this long
+SETTLE_SECONDS = float(os.environ.get("BUILD_LOG_SETTLE", "0.5"))
+WARMUP_TIMEOUT = 5
+
+# (failure class, pattern), checked in order
+FATAL_PATTERNS = [
+    ("compile_config_error", re.compile(r"failed to load config from|error when starting dev server", re.IGNORECASE)),
+    ("compile_unresolved_import", re.compile(
+        r"Failed to resolve import|Failed to resolve entry|Could not resolve \"|"
+        r"dependencies are imported but could not be resolved|Cannot find module ['\"]"
+    )),
+    ("compile_syntax_error", re.compile(
+        r"\[plugin:vite:(esbuild|react-babel|react-swc|vue)\]|Transform failed with \d+ errors?|"
+        r"^\s*✘ \[ERROR\]|SyntaxError: |Unterminated (string|regular expression|template)|Expected \".+\" but found"
+    )),
+    ("compile_css_error", re.compile(r"\[plugin:vite:css\]|\[postcss\]|CssSyntaxError")),
+]
+
+_stats_lock = threading.Lock()
+_stats = {"checked": 0}
+
+
+def classify_log_line(line: str) -> Optional[str]:
+    for failure_class, pattern in FATAL_PATTERNS:
+        if pattern.search(line):
+            return failure_class
+    return None
+
+def classify_log_lines(lines: List[str]) -> Optional[Tuple[str, str]]:
+    """(failure class, line) of the first fatal error in `lines`, or None"""
+    for line in lines:
+        failure_class = classify_log_line(line)
+        if failure_class is not None:
+            return failure_class, line.strip()
+    return None
+
+def gate_stats() -> dict:
+    with _stats_lock:
+        return dict(_stats)
+
+def _record(failure_class: Optional[str]):
+    with _stats_lock:
+        _stats["checked"] += 1
+        if failure_class is not None:
+            _stats[failure_class] = _stats.get(failure_class, 0) + 1
+
+
+class BuildLogGate:
+    """Incrementally scans a project's out.log and err.log for fatal compile and resolve errors"""
+
+    def __init__(self, project_path):
+        self.tails = [LogTail(os.path.join(project_path, name)) for name in ("out.log", "err.log")]
+        self.error = None
+
+    def check(self) -> Optional[Tuple[str, str]]:
+        """New fatal error since the last call (or the one already seen), as (failure class, line)"""
+        if not BUILD_LOG_GATE_ENABLED:
+            return None
+        if self.error is None:
+            for tail in self.tails:
+                self.error = classify_log_lines(tail.read_new_lines())
+                if self.error is not None:
+                    break
+        return self.error
+
+    def raise_if_failed(self):
+        error = self.check()
+        if error is not None:
+            _record(error[0])
+            raise RenderFailure(error[0], error[1][:500])
+
+    def warm_up(self, url: str):
+        """
+        Vite transforms modules on request, so most compile errors only reach the log once
+        something asks for them. Fetch the page and its module scripts, which also saves the
+        browser that work later.
+        """
+        try:
+            with urllib.request.urlopen(url, timeout=WARMUP_TIMEOUT) as response:
+                html = response.read().decode("utf-8", errors="ignore")
+        except (urllib.error.URLError, OSError, ValueError):
+            return
+        for src in re.findall(r'<script[^>]*type=["\']module["\'][^>]*src=["\']([^"\']+)["\']', html):
+            if src.startswith(("http://", "https://", "//")):
+                continue
+            try:
+                urllib.request.urlopen(urllib.request.Request(url.rstrip("/") + "/" + src.lstrip("/")),
+                                       timeout=WARMUP_TIMEOUT).close()
+            except (urllib.error.URLError, OSError, ValueError):
+                pass  # a 500 here is exactly what the logs will explain
+
+    def settle(self, url: str, seconds: float = SETTLE_SECONDS):
+        """Warm the entry modules, watch the logs for `seconds`, raise RenderFailure on a fatal error"""
+        if not BUILD_LOG_GATE_ENABLED:
+            return
+        self.warm_up(url)
+        deadline = time.time() + seconds
+        while self.check() is None and time.time() < deadline:
+            time.sleep(0.05)
+        if self.error is None:
+            _record(None)
+        self.raise_if_failed()
@@ -0,0 +1,123 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+from .vlm_client import VLMClient
+
+
+# Which VLM grades the screenshots:
+#   openai: the OpenAI API (GRADER_MODEL, OPENAI_API_KEY)
+#   local:  any OpenAI-compatible endpoint, e.g. vLLM/SGLang on a spare node (GRADER_BASE_URL);
+#           the server batches concurrent requests itself (continuous batching)
+#   stub:   in-process canned grades after GRADER_STUB_LATENCY seconds, for offline benchmarks
+GRADER_BACKEND = os.environ.get("GRADER_BACKEND", "openai")
+DEFAULT_MODELS = {"openai": "gpt-4o-2024-11-20", "local": "Qwen/Qwen2.5-VL-72B-Instruct", "stub": "stub"}
+grader_model = os.environ.get("GRADER_MODEL", DEFAULT_MODELS.get(GRADER_BACKEND, ""))
+grader_base_url = os.environ.get("GRADER_BASE_URL", "http://127.0.0.1:8000/v1")
+STUB_LATENCY = float(os.environ.get("GRADER_STUB_LATENCY", "0"))
+STUB_JITTER = float(os.environ.get("GRADER_STUB_JITTER", "0"))
+STUB_GRADE = os.environ.get("GRADER_STUB_GRADE", "")  # fixed grade, random 0-5 if empty
+
+
+class Grader(ABC):
+    """
+    A VLM that turns chat messages (prompt and screenshots) into a grading response.
+    `version` identifies the model in cache keys, so switching graders never reuses old scores.
+    Both methods raise vlm_client.VLMRequestError when no response could be obtained.
+    """
+
+    version = ""
+
+    @abstractmethod
+    def complete(self, messages: List[dict]) -> str:
+        ...
+
+    @abstractmethod
+    async def acomplete(self, messages: List[dict]) -> str:
+        ...
+
+    def grader_stats(self) -> dict:
+        return {}
+
+
+class OpenAIGrader(Grader):
+    """The OpenAI API, or an OpenAI-compatible server when `base_url` is given"""
+
+    def __init__(self, model: str, base_url: Optional[str] = None, api_key: Optional[str] = None):
+        self.model = model
+        # remote grades keep the bare model name, so scores cached before graders were pluggable stay valid
+        self.version = model if base_url is None else f"local:{model}"
+        self.client = VLMClient(base_url=base_url, api_key=api_key)
+
+    def complete(self, messages: List[dict]) -> str:
+        return self.client.complete(self.model, messages)
+
+    async def acomplete(self, messages: List[dict]) -> str:
+        return await self.client.acomplete(self.model, messages)
+
+    def grader_stats(self) -> dict:
+        return self.client.vlm_stats()
+
+
+class StubGrader(Grader):
+    """Canned grades without any network I/O, a local stand-in for benchmarks"""
+
+    def __init__(self, latency: float = STUB_LATENCY, jitter: float = STUB_JITTER, grade: Optional[int] = None):
+        self.version = "stub"
+        self.latency = latency
+        self.jitter = jitter
+        self.grade = grade
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def _output(self) -> str:
+        with self.lock:
+            self.requests += 1
+        grade = self.grade if self.grade is not None else random.randint(0, 5)
+        return f"Analysis: stub grader.\n\nGrade: {grade}"
+
+    def _delay(self) -> float:
+        return max(0.0, random.gauss(self.latency, self.jitter))
+
+    def complete(self, messages: List[dict]) -> str:
+        time.sleep(self._delay())
+        return self._output()
+
+    async def acomplete(self, messages: List[dict]) -> str:
+        await asyncio.sleep(self._delay())
+        return self._output()
+
+    def grader_stats(self) -> dict:
+        with self.lock:
+            return {"requests": self.requests}
+
+
+def make_grader(backend: str = GRADER_BACKEND) -> Grader:
+    if backend == "openai":
+        return OpenAIGrader(grader_model)
+    if backend == "local":
+        return OpenAIGrader(grader_model, base_url=grader_base_url, api_key=os.environ.get("GRADER_API_KEY", "EMPTY"))
+    if backend == "stub":
+        return StubGrader(grade=int(STUB_GRADE) if STUB_GRADE else None)
+    raise ValueError(f"Unknown GRADER_BACKEND {backend!r}, expected openai, local or stub")
+
+
+_grader = None
+_grader_lock = threading.Lock()
+
+def get_grader() -> Grader:
+    global _grader
+    with _grader_lock:
+        if _grader is None:
+            _grader = make_grader()
+    return _grader
+
+def set_grader(grader: Grader):
+    """Replace the process-wide grader, e.g. to point a benchmark at a stub"""
+    global _grader
+    with _grader_lock:
+        _grader = grader
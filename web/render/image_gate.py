@@ -0,0 +1,202 @@
+"""
+Local pre-VLM gate for screenshots that are certainly worth a 0.
+
+Blank pages (low pixel variance, one dominant color), the Vite error overlay and pages that
+look like a stored template are recognized on a small thumbnail on the CPU. Needs Pillow; without
+it the gate is disabled. Templates are runtime data, added from archived screenshots of recurring
+0-graded pages with `add-template`. Connection errors never get here: the capture fails first and
+the render is recorded as page_load_failed.
+
+The gate runs in shadow mode by default: decisions are recorded in the trace, the VLM is still
+called. Set IMAGE_GATE_MODE=enforce to skip the VLM once `evaluate` shows a precision near 1.
+
+Offline evaluation against stored grades (screenshots next to appearance_result.json, as
+archived with GRADE_ARCHIVE_DIR):
+
+    python -m web.render.image_gate evaluate ./grade_archive
+    python -m web.render.image_gate add-template ./some/error_page.png error_page
+"""
+
+import os
+import json
+import shutil
+import tempfile
+import argparse
+import threading
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional
+    Image = None
+
+
+GATE_ENABLED = os.environ.get("IMAGE_GATE_ENABLED", "1") == "1"
+GATE_MODE = os.environ.get("IMAGE_GATE_MODE", "shadow")  # shadow (record the decision, still call the VLM) | enforce
+templates_dir = os.environ.get("IMAGE_GATE_TEMPLATES", os.path.join(tempfile.gettempdir(), "webgen_gate_templates"))
+BLANK_MAX_STDDEV = float(os.environ.get("IMAGE_GATE_BLANK_STDDEV", "3.0"))
+# share of thumbnail pixels in one color; a few lines of text on white are ~0.5%, so stay well above that
+BLANK_DOMINANT_RATIO = float(os.environ.get("IMAGE_GATE_DOMINANT_RATIO", "0.9995"))
+TEMPLATE_MAX_MAD = float(os.environ.get("IMAGE_GATE_TEMPLATE_MAD", "6.0"))
+# if set, screenshots and appearance_result.json of every grade are kept here for `evaluate`
+archive_dir = os.environ.get("GRADE_ARCHIVE_DIR", "")
+
+THUMB_SIZE = (96, 72)
+TEMPLATE_SIZE = (48, 36)
+
+_stats_lock = threading.Lock()
+_stats = {"checked": 0}
+_templates = None
+_templates_lock = threading.Lock()
+
+
+def _luminance(pixel) -> float:
+    r, g, b = pixel
+    return 0.299 * r + 0.587 * g + 0.114 * b
+
+def _region(pixels, box) -> list:
+    width, height = THUMB_SIZE
+    x0, y0, x1, y1 = int(box[0] * width), int(box[1] * height), int(box[2] * width), int(box[3] * height)
+    return [pixels[y * width + x] for y in range(y0, y1) for x in range(x0, x1)]
+
+def is_blank(pixels) -> bool:
+    """Almost no luminance variance, or nearly every pixel has the same (quantized) color"""
+    lum = [_luminance(p) for p in pixels]
+    mean = sum(lum) / len(lum)
+    stddev = (sum((v - mean) ** 2 for v in lum) / len(lum)) ** 0.5
+    if stddev <= BLANK_MAX_STDDEV:
+        return True
+    counts = {}
+    for r, g, b in pixels:
+        key = (r >> 3, g >> 3, b >> 3)
+        counts[key] = counts.get(key, 0) + 1
+    return max(counts.values()) / len(pixels) >= BLANK_DOMINANT_RATIO
+
+def is_vite_overlay(pixels) -> bool:
+    """
+    Vite's overlay: the page dimmed by a rgba(0,0,0,.66) backdrop, a #181818 window in the
+    middle and the error message in red (#ff5555) at the top of the window.
+    """
+    window = _region(pixels, (0.15, 0.08, 0.85, 0.5))
+    margins = _region(pixels, (0.0, 0.0, 0.04, 1.0)) + _region(pixels, (0.96, 0.0, 1.0, 1.0))
+    dark_window = sum(1 for p in window if _luminance(p) < 45) / len(window)
+    dimmed_margins = sum(1 for p in margins if _luminance(p) <= 90) / len(margins)
+    red_text = sum(1 for r, g, b in window if r > 150 and r - g > 60 and r - b > 60) / len(window)
+    return dark_window > 0.6 and dimmed_margins > 0.95 and red_text > 0.002
+
+def _template_thumbnail(image) -> List[int]:
+    return list(image.convert("L").resize(TEMPLATE_SIZE).getdata())
+
+def load_templates(directory: str = templates_dir) -> List[Tuple[str, List[int]]]:
+    global _templates
+    with _templates_lock:
+        if _templates is None:
+            _templates = []
+            if Image is not None and os.path.isdir(directory):
+                for path in sorted(Path(directory).glob("*.png")):
+                    with Image.open(path) as image:
+                        _templates.append((path.stem, _template_thumbnail(image)))
+    return _templates
+
+def matches_template(image) -> Optional[str]:
+    thumbnail = _template_thumbnail(image)
+    for name, template in load_templates():
+        mad = sum(abs(a - b) for a, b in zip(thumbnail, template)) / len(template)
+        if mad <= TEMPLATE_MAX_MAD:
+            return name
+    return None
+
+def classify_screenshot(path: str) -> Optional[str]:
+    """Reason a screenshot is a certain 0 (blank, vite_overlay, template:<name>), or None"""
+    if Image is None:
+        return None
+    try:
+        with Image.open(path) as image:
+            image = image.convert("RGB")
+            pixels = list(image.resize(THUMB_SIZE).getdata())
+            if is_blank(pixels):
+                return "blank"
+            if is_vite_overlay(pixels):
+                return "vite_overlay"
+            template = matches_template(image)
+    except OSError:
+        return None
+    return f"template:{template}" if template else None
+
+def gate_screenshots(image_paths: List[str]) -> Optional[str]:
+    """Reason to skip the VLM if every screenshot is a certain 0, else None"""
+    if not GATE_ENABLED or Image is None or not image_paths:
+        return None
+    reasons = [classify_screenshot(path) for path in image_paths]
+    reason = reasons[0] if all(reasons) else None
+    with _stats_lock:
+        _stats["checked"] += 1
+        if reason is not None:
+            _stats[reason] = _stats.get(reason, 0) + 1
+    return reason
+
+def gate_stats() -> dict:
+    with _stats_lock:
+        return dict(_stats)
+
+def archive_grade(shot_path: str, project_path: str):
+    """Copy a graded shots directory to GRADE_ARCHIVE_DIR (no-op when unset)"""
+    if not archive_dir:
+        return
+    try:
+        shutil.copytree(shot_path, os.path.join(archive_dir, os.path.basename(os.path.normpath(project_path))))
+    except OSError as e:
+        print(f"Could not archive {shot_path}: {e}")
+
+
+def evaluate(archive_dir: str) -> dict:
+    """
+    Precision of the gate against stored VLM grades: of the screenshots the gate would zero,
+    how many did the VLM also grade 0. Also reports the share of VLM zeros the gate catches.
+    """
+    results = {"graded": 0, "gated": 0, "gated_zero": 0, "vlm_zero": 0, "reasons": {}, "false_positives": []}
+    for result_path in Path(archive_dir).rglob("appearance_result.json"):
+        with open(result_path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        fields = {k: v for entry in entries for k, v in entry.items()}
+        if fields.get("vlm_output") is None:
+            continue  # gated in enforce mode, there is no VLM grade to compare with
+        images = sorted(str(p) for p in result_path.parent.glob("*.png"))
+        reasons = [classify_screenshot(p) for p in images]
+        reason = reasons[0] if images and all(reasons) else None
+        grade = fields.get("grade_score", 0)
+        results["graded"] += 1
+        results["vlm_zero"] += grade == 0
+        if reason is not None:
+            results["gated"] += 1
+            results["gated_zero"] += grade == 0
+            results["reasons"][reason] = results["reasons"].get(reason, 0) + 1
+            if grade != 0:
+                results["false_positives"].append({"path": str(result_path.parent), "reason": reason, "grade": grade})
+    results["precision"] = results["gated_zero"] / results["gated"] if results["gated"] else None
+    results["recall"] = results["gated_zero"] / results["vlm_zero"] if results["vlm_zero"] else None
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-VLM screenshot gate")
+    sub = parser.add_subparsers(dest="command", required=True)
+    evaluate_parser = sub.add_parser("evaluate", help="measure gate precision against stored VLM grades")
+    evaluate_parser.add_argument("archive_dir")
+    template_parser = sub.add_parser("add-template", help="store a screenshot as an error-page template")
+    template_parser.add_argument("image")
+    template_parser.add_argument("name")
+    args = parser.parse_args()
+    if Image is None:
+        raise SystemExit("Pillow is required for the image gate")
+
+    if args.command == "evaluate":
+        print(json.dumps(evaluate(args.archive_dir), indent=2))
+    else:
+        os.makedirs(templates_dir, exist_ok=True)
+        shutil.copy(args.image, os.path.join(templates_dir, f"{args.name}.png"))
+        print(f"Template {args.name} stored in {templates_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import threading
+from pathlib import Path
+from typing import List, Optional
+
+from .node_modules_store import dependency_set
+
+
+# Resolved package-lock.json per dependency set, plus the npm flags that made the install succeed,
+# so later installs skip the resolver and the retry ladder. Unlike the node_modules store the key
+# leaves out the node version and platform (a lockfile covers the optional binaries of every
+# platform), and entries are a few hundred KB, so the directory can be shared by all nodes and
+# keeps resolutions long after their node_modules trees were evicted from the node-local store.
+lockfile_root = os.environ.get("LOCKFILE_CACHE_DIR", "./lockfile_cache")
+LOCKFILE_CACHE_ENABLED = os.environ.get("LOCKFILE_CACHE_ENABLED", "1") == "1"
+MAX_ENTRIES = int(os.environ.get("LOCKFILE_CACHE_MAX_ENTRIES", "20000"))
+MAX_AGE_SECONDS = float(os.environ.get("LOCKFILE_CACHE_MAX_AGE_DAYS", "14")) * 86400  # registries move on
+EVICT_EVERY = 100  # records between eviction passes
+
+LOCKFILE = "package-lock.json"
+META_FILE = "meta.json"
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "recorded": 0, "ci_failures": 0, "evicted": 0}
+
+
+def _bump(counter: str):
+    with _stats_lock:
+        _stats[counter] += 1
+
+def lockfile_stats() -> dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    return stats
+
+def _entry_path(key: str) -> Path:
+    return Path(lockfile_root) / key
+
+def lockfile_key(project_path, shell_actions: Optional[List[str]] = None) -> Optional[str]:
+    """Hash of the project's dependency set, None if package.json is missing or invalid"""
+    try:
+        with open(Path(project_path) / "package.json", "r", encoding="utf-8") as f:
+            package_data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(package_data, dict):
+        return None
+    canonical = json.dumps(dependency_set(package_data, shell_actions), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+def lookup(key: Optional[str]) -> Optional[dict]:
+    """The cached resolution for `key`: {"lockfile", "flags", "dependencies", "devDependencies"}, or None"""
+    if key is None or not LOCKFILE_CACHE_ENABLED:
+        return None
+    entry = _entry_path(key)
+    try:
+        with open(entry / META_FILE, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        meta["lockfile"] = (entry / LOCKFILE).read_text(encoding="utf-8")
+    except (OSError, ValueError):
+        _bump("misses")
+        return None
+    if time.time() - meta.get("created", 0) > MAX_AGE_SECONDS:
+        _remove(entry)  # make room for a fresh resolution of the same dependency set
+        _bump("misses")
+        return None
+    try:
+        os.utime(entry / META_FILE)  # LRU: refresh last-used time
+    except OSError:
+        pass
+    _bump("hits")
+    return meta
+
+def apply(resolution: dict, project_path):
+    """
+    Write the cached lockfile into the project. `npm install <pkg>` shell actions save their
+    packages into package.json, so the resolved dependency maps are copied over as well,
+    otherwise `npm ci` rejects the lockfile as out of sync.
+    """
+    project_path = Path(project_path)
+    package_json = project_path / "package.json"
+    with open(package_json, "r", encoding="utf-8") as f:
+        package_data = json.load(f)
+    for field in ("dependencies", "devDependencies"):
+        if resolution.get(field):
+            package_data[field] = resolution[field]
+    with open(package_json, "w", encoding="utf-8") as f:
+        json.dump(package_data, f, indent=2)
+    (project_path / LOCKFILE).write_text(resolution["lockfile"], encoding="utf-8")
+
+def record(key: Optional[str], project_path, flags: List[str]) -> bool:
+    """Cache the lockfile npm produced for `key` together with the flags that were needed"""
+    if key is None or not LOCKFILE_CACHE_ENABLED:
+        return False
+    project_path = Path(project_path)
+    try:
+        lockfile = (project_path / LOCKFILE).read_text(encoding="utf-8")
+        with open(project_path / "package.json", "r", encoding="utf-8") as f:
+            package_data = json.load(f)
+    except (OSError, ValueError):
+        return False
+    meta = {
+        "created": time.time(),
+        "flags": flags,
+        "dependencies": package_data.get("dependencies") or {},
+        "devDependencies": package_data.get("devDependencies") or {},
+    }
+    entry = _entry_path(key)
+    staging = Path(lockfile_root) / f".tmp-{key}-{uuid.uuid4().hex}"
+    try:
+        staging.mkdir(parents=True)
+        (staging / LOCKFILE).write_text(lockfile, encoding="utf-8")
+        with open(staging / META_FILE, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.rename(staging, entry)
+    except OSError:
+        # another process recorded the same dependency set first
+        shutil.rmtree(staging, ignore_errors=True)
+        return False
+    _bump("recorded")
+    with _stats_lock:
+        evict_now = _stats["recorded"] % EVICT_EVERY == 0
+    if evict_now:
+        evict()
+    return True
+
+def invalidate(key: Optional[str]):
+    """Drop a resolution that no longer installs, e.g. after a yanked version"""
+    if key is None:
+        return
+    _bump("ci_failures")
+    _remove(_entry_path(key))
+
+def _remove(entry: Path) -> bool:
+    """Rename the entry away first, so readers see either all of it or nothing"""
+    trash = Path(lockfile_root) / f".tmp-removed-{entry.name}-{uuid.uuid4().hex}"
+    try:
+        os.rename(entry, trash)
+    except OSError:
+        return False
+    shutil.rmtree(trash, ignore_errors=True)
+    return True
+
+def evict(max_entries: int = MAX_ENTRIES, max_age: float = MAX_AGE_SECONDS) -> int:
+    """Drop resolutions older than `max_age`, then the least recently used ones beyond `max_entries`"""
+    root = Path(lockfile_root)
+    if not root.is_dir():
+        return 0
+    entries = []
+    for entry in root.iterdir():
+        if entry.name.startswith("."):
+            continue  # staging or trash of another process
+        try:
+            with open(entry / META_FILE, "r", encoding="utf-8") as f:
+                created = json.load(f).get("created", 0)
+            entries.append((os.stat(entry / META_FILE).st_mtime, created, entry))
+        except (OSError, ValueError):
+            continue
+    entries.sort(key=lambda e: e[0])
+    now = time.time()
+    excess = len(entries) - max_entries
+    removed = 0
+    for last_used, created, entry in entries:
+        if now - created <= max_age and excess <= 0:
+            continue
+        if not _remove(entry):
+            continue
+        excess -= 1
+        removed += 1
+    if removed:
+        with _stats_lock:
+            _stats["evicted"] += removed
+    return removed
@@ -0,0 +1,50 @@
+import os
+import re
+from typing import List
+
+
+ANSI_ESCAPE = re.compile(r'\x1B\[[0-?]*[ -/]*[@-~]')
+
+
+class LogTail:
+    """
+    Incrementally read complete lines appended to a log file.
+
+    Only bytes past the last read offset are read and ANSI-stripped, a trailing partial line is
+    kept until its newline arrives. A missing file simply yields no lines.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offset = 0
+        self.partial = b""
+
+    def _decode(self, line: bytes) -> str:
+        return ANSI_ESCAPE.sub('', line.decode("utf-8", errors="ignore")).rstrip("\r")
+
+    def read_new_lines(self) -> List[str]:
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return []
+        if size < self.offset:
+            # file was truncated or recreated, start over
+            self.offset = 0
+            self.partial = b""
+        if size == self.offset:
+            return []
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            chunk = f.read()
+        self.offset += len(chunk)
+        lines = (self.partial + chunk).split(b"\n")
+        self.partial = lines.pop()
+        return [self._decode(line) for line in lines]
+
+    def flush(self) -> List[str]:
+        """Return the pending partial line too, for a final read once the writer is gone"""
+        lines = self.read_new_lines()
+        if self.partial:
+            lines.append(self._decode(self.partial))
+            self.partial = b""
+        return lines
@@ -0,0 +1,340 @@
+import os
+import json
+import time
+import uuid
+import fcntl
+import errno
+import shutil
+import hashlib
+import platform
+import threading
+import subprocess
+from pathlib import Path
+from contextlib import contextmanager
+from typing import List, Optional
+
+from .trace import RenderFailure
+
+
+# Node-wide content-addressed store of installed node_modules trees, keyed by the dependency set.
+# By default it sits next to the workspace root, so hits are hardlinked into projects, not copied.
+store_root = os.environ.get("NODE_MODULES_STORE", "")
+STORE_ENABLED = os.environ.get("NODE_MODULES_STORE_ENABLED", "1") == "1"
+STORE_BUDGET_BYTES = int(float(os.environ.get("NODE_MODULES_STORE_BUDGET_GB", "50")) * 1024 ** 3)
+MAX_FS_SHARE = 0.25  # the store never takes more than this share of its filesystem (e.g. /dev/shm)
+LINK_MODE = os.environ.get("NODE_MODULES_LINK_MODE", "auto")  # auto | reflink | hardlink | copy
+LOCK_TIMEOUT = float(os.environ.get("NODE_MODULES_STORE_LOCK_TIMEOUT", "900"))
+
+STORE_MARKER = ".store_key"
+LINK_MODE_MARKER = ".store_link_mode"  # how clone_tree materialized a project's node_modules
+SKIP_DIRS = {".vite", ".cache"}  # per-project build caches that must not be shared
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "populated": 0, "evicted": 0, "link_errors": 0}
+_node_version = None
+
+
+def _bump(counter: str, n: int = 1):
+    with _stats_lock:
+        _stats[counter] += n
+
+def store_stats() -> dict:
+    """Return a snapshot of the hit/miss counters of this process"""
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    return stats
+
+def _get_node_version() -> str:
+    global _node_version
+    if _node_version is None:
+        try:
+            _node_version = subprocess.run(
+                ["node", "--version"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, timeout=10
+            ).stdout.strip()
+        except Exception:
+            _node_version = "unknown"
+    return _node_version
+
+def extra_packages(shell_actions: List[str]) -> List[str]:
+    """Collect package specs passed explicitly to `npm install <pkg>...` in the shell actions"""
+    packages = []
+    for action in shell_actions or []:
+        for part in action.split("&&"):
+            tokens = part.split()
+            if len(tokens) < 2 or tokens[0] != "npm" or tokens[1] not in ("install", "i", "add"):
+                continue
+            packages.extend(t for t in tokens[2:] if not t.startswith("-"))
+    return sorted(set(packages))
+
+def dependency_key(project_path, shell_actions: Optional[List[str]] = None) -> Optional[str]:
+    """
+    Hash the normalized dependency set of a project.
+
+    The key covers the `dependencies`/`devDependencies` maps of package.json, any packages
+    installed explicitly by the shell actions, and the node version/platform (native
+    binaries such as esbuild are platform specific). Returns None if package.json is
+    missing or invalid, in which case the store is bypassed.
+    """
+    package_json = Path(project_path) / "package.json"
+    try:
+        with open(package_json, "r", encoding="utf-8") as f:
+            package_data = json.load(f)
+    except Exception:
+        return None
+    return dependency_key_for(package_data, shell_actions)
+
+def dependency_set(package_data: dict, shell_actions: Optional[List[str]] = None) -> dict:
+    """The normalized dependency maps of a parsed package.json plus the explicitly installed packages"""
+
+    def normalize(deps):
+        if not isinstance(deps, dict):
+            return {}
+        return {str(k).strip(): str(v).strip() for k, v in deps.items()}
+
+    return {
+        "dependencies": normalize(package_data.get("dependencies")),
+        "devDependencies": normalize(package_data.get("devDependencies")),
+        "extra": extra_packages(shell_actions),
+    }
+
+def dependency_key_for(package_data, shell_actions: Optional[List[str]] = None) -> Optional[str]:
+    """dependency_key for an already parsed package.json"""
+    if not isinstance(package_data, dict):
+        return None
+    payload = {
+        **dependency_set(package_data, shell_actions),
+        "node": _get_node_version(),
+        "platform": f"{platform.system()}-{platform.machine()}",
+    }
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+def get_store_root() -> Path:
+    """NODE_MODULES_STORE, or `webgen_node_modules_store` beside the workspace root"""
+    if store_root:
+        return Path(store_root)
+    from .workspace import project_root  # the workspace imports this module
+    return Path(os.path.abspath(project_root)).parent / "webgen_node_modules_store"
+
+def _entry_path(key: str) -> Path:
+    return get_store_root() / "entries" / key
+
+def _dir_size(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+def _ignore_build_caches(src, names):
+    return [name for name in names if name in SKIP_DIRS and os.path.basename(src) == "node_modules"]
+
+class _LinkFailed(Exception):
+    """Not an OSError, so copytree stops at the first file instead of collecting one error per file"""
+
+def _hardlink(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError as e:
+        raise _LinkFailed(e) from e
+
+def same_filesystem(a, b) -> bool:
+    """True if `a` and `b` (or the nearest existing parent of `b`) are on the same device"""
+    b = Path(b)
+    while not b.exists() and b.parent != b:
+        b = b.parent
+    try:
+        return os.stat(a).st_dev == os.stat(b).st_dev
+    except OSError:
+        return False
+
+def clone_tree(src, dst, mode: str = LINK_MODE):
+    """
+    Materialize `src` at `dst` as cheaply as the filesystem allows.
+
+    `reflink` gives a copy-on-write clone (btrfs/xfs), `hardlink` shares inodes and only
+    copies the directory skeleton, `copy` is a plain deep copy. `auto` tries them in that order,
+    and goes straight to `copy` when `src` and `dst` are on different filesystems.
+    """
+    src, dst = str(src), str(dst)
+    if mode != "auto":
+        modes = [mode]
+    elif same_filesystem(src, os.path.dirname(os.path.abspath(dst))):
+        modes = ["reflink", "hardlink", "copy"]
+    else:
+        modes = ["copy"]
+    last_error = None
+    for m in modes:
+        try:
+            if m == "reflink":
+                subprocess.run(
+                    ["cp", "-a", "--reflink=always", src, dst],
+                    check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+                )
+            elif m == "hardlink":
+                shutil.copytree(src, dst, symlinks=True, copy_function=_hardlink, ignore=_ignore_build_caches)
+            else:
+                shutil.copytree(src, dst, symlinks=True, ignore=_ignore_build_caches)
+            return m
+        except (subprocess.CalledProcessError, OSError, shutil.Error, _LinkFailed) as e:
+            last_error = e
+            shutil.rmtree(dst, ignore_errors=True)
+    raise last_error
+
+@contextmanager
+def key_lock(key: Optional[str], timeout: float = LOCK_TIMEOUT):
+    """
+    Node-wide lock for populating one store entry, so that concurrent ranks installing the
+    same dependency set wait for the first install instead of repeating it.
+    Yields True if the lock was acquired, False if it timed out (the caller proceeds unlocked).
+    """
+    if key is None or not STORE_ENABLED:
+        yield False
+        return
+    lock_dir = get_store_root() / "locks"
+    lock_dir.mkdir(parents=True, exist_ok=True)
+    lock_path = lock_dir / f"{key}.lock"
+    deadline = time.time() + timeout
+    while True:
+        lock_file = open(lock_path, "a")
+        acquired = False
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                acquired = True
+                break
+            except OSError as e:
+                if e.errno not in (errno.EAGAIN, errno.EACCES) or time.time() > deadline:
+                    break
+                time.sleep(0.2)
+        if acquired:
+            try:
+                if os.stat(lock_path).st_ino != os.fstat(lock_file.fileno()).st_ino:
+                    raise FileNotFoundError  # the holder before us removed this file, lock the new one
+            except FileNotFoundError:
+                lock_file.close()
+                continue
+        break
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            # removed while still locked, so the lock directory does not grow with every dependency set
+            lock_path.unlink(missing_ok=True)
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+
+def check_copy_room(entry: Path, project_path):
+    """Reject a full copy of a store entry that would exceed the project quota or fill the workspace"""
+    from .workspace import MIN_FREE_BYTES, PROJECT_QUOTA_BYTES  # the workspace imports this module
+    try:
+        with open(entry / "meta.json", "r", encoding="utf-8") as f:
+            size = json.load(f).get("size", 0)
+        free = shutil.disk_usage(project_path).free
+    except (OSError, ValueError):
+        return
+    if PROJECT_QUOTA_BYTES > 0 and size > PROJECT_QUOTA_BYTES:
+        raise RenderFailure("workspace_quota", f"copying node_modules ({size >> 20} MB) exceeds the project quota")
+    if free - size < MIN_FREE_BYTES:
+        raise RenderFailure("workspace_full", f"no room to copy node_modules ({size >> 20} MB, {free >> 20} MB free)")
+
+def link_into(key: Optional[str], project_path, count_miss: bool = True) -> bool:
+    """Materialize the stored node_modules for `key` into the project. Returns True on a hit."""
+    if key is None:
+        return False
+    entry = _entry_path(key)
+    target = Path(project_path) / "node_modules"
+    try:
+        if (target / STORE_MARKER).read_text() == key:
+            # already materialized for this dependency set, e.g. by the template pool
+            _bump("hits")
+            return True
+    except OSError:
+        pass
+    if not STORE_ENABLED:
+        return False
+    if not (entry / "node_modules").is_dir():
+        if count_miss:
+            _bump("misses")
+        return False
+    if LINK_MODE == "copy" or not same_filesystem(entry, project_path):
+        check_copy_room(entry, project_path)
+    try:
+        if target.exists():
+            shutil.rmtree(target)
+        mode = clone_tree(entry / "node_modules", target)
+        (target / STORE_MARKER).write_text(key)
+        (target / LINK_MODE_MARKER).write_text(mode)
+        os.utime(entry / "meta.json")  # LRU: refresh last-used time
+    except Exception:
+        # the entry may have been evicted mid-copy, fall back to a regular install
+        shutil.rmtree(target, ignore_errors=True)
+        _bump("link_errors")
+        _bump("misses")
+        return False
+    _bump("hits")
+    return True
+
+def populate(key: Optional[str], project_path) -> bool:
+    """Publish the freshly installed node_modules of a project under `key` (atomic rename)"""
+    if key is None or not STORE_ENABLED:
+        return False
+    source = Path(project_path) / "node_modules"
+    entry = _entry_path(key)
+    if not source.is_dir() or entry.exists():
+        return False
+    staging = get_store_root() / "tmp" / f"{key}-{uuid.uuid4().hex}"
+    try:
+        staging.mkdir(parents=True)
+        clone_tree(source, staging / "node_modules")
+        size = _dir_size(staging / "node_modules")
+        with open(staging / "meta.json", "w", encoding="utf-8") as f:
+            json.dump({"key": key, "size": size, "created": time.time()}, f)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        os.rename(staging, entry)
+    except OSError:
+        # another process published the same key first, or the copy failed
+        shutil.rmtree(staging, ignore_errors=True)
+        return False
+    (source / STORE_MARKER).write_text(key)
+    _bump("populated")
+    evict()
+    return True
+
+def evict(budget_bytes: Optional[int] = None) -> int:
+    """Remove least recently used entries until the store fits in the disk budget"""
+    entries_dir = get_store_root() / "entries"
+    if not entries_dir.is_dir():
+        return 0
+    if budget_bytes is None:
+        budget_bytes = min(STORE_BUDGET_BYTES, int(shutil.disk_usage(entries_dir).total * MAX_FS_SHARE))
+    entries = []
+    for entry in entries_dir.iterdir():
+        meta_path = entry / "meta.json"
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                size = json.load(f).get("size", 0)
+            entries.append((meta_path.stat().st_mtime, size, entry))
+        except Exception:
+            continue
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, entry in sorted(entries, key=lambda e: e[0]):
+        if total <= budget_bytes:
+            break
+        trash = get_store_root() / "tmp" / f"evict-{entry.name}-{uuid.uuid4().hex}"
+        try:
+            os.rename(entry, trash)  # atomic, readers see either the full entry or nothing
+        except OSError:
+            continue
+        shutil.rmtree(trash, ignore_errors=True)
+        total -= size
+        removed += 1
+    if removed:
+        _bump("evicted", removed)
+    return removed
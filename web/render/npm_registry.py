@@ -0,0 +1,244 @@
+"""
+Node-local caching mirror of the npm registry.
+
+Serves packuments and tarballs from a disk cache and fetches misses from the upstream
+registry. Tarballs are immutable and cached forever; packuments are refreshed after
+NPM_MIRROR_PACKUMENT_TTL seconds, and a stale copy is served if the upstream is unreachable.
+With --offline (or NPM_MIRROR_OFFLINE=1) the upstream is never contacted, so a populated
+cache can serve installs on machines without internet.
+
+run_npm_install starts the mirror on demand (one per node, see ensure_registry) and passes
+`--registry <mirror> --prefer-offline` to npm. It can also be run by hand:
+
+    python web/render/npm_registry.py --port 4873 --cache-dir ./npm_mirror
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import fcntl
+import socket
+import argparse
+import threading
+import subprocess
+import urllib.error
+import urllib.parse
+import urllib.request
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+MIRROR_ENABLED = os.environ.get("NPM_MIRROR_ENABLED", "1") == "1"
+MIRROR_PORT = int(os.environ.get("NPM_MIRROR_PORT", "4873"))
+mirror_dir = os.environ.get("NPM_MIRROR_DIR", "./npm_mirror")
+UPSTREAM = os.environ.get("NPM_MIRROR_UPSTREAM", "https://registry.npmjs.org")
+OFFLINE = os.environ.get("NPM_MIRROR_OFFLINE", "0") == "1"
+PACKUMENT_TTL = float(os.environ.get("NPM_MIRROR_PACKUMENT_TTL", "86400"))
+UPSTREAM_TIMEOUT = 60
+START_TIMEOUT = 15
+
+# /<name> or /@scope%2f<name> (also unescaped), and /<name>/-/<file>.tgz
+TARBALL_PATH = re.compile(r'^/((?:@[^/]+/)?[^/@][^/]*)/-/([^/]+\.tgz)$')
+ABBREVIATED = "application/vnd.npm.install-v1+json"
+
+
+def _safe_name(name: str) -> str:
+    return urllib.parse.quote(name, safe="")
+
+
+class RegistryMirror:
+    def __init__(self, cache_dir: str, upstream: str = UPSTREAM, offline: bool = OFFLINE,
+                 packument_ttl: float = PACKUMENT_TTL):
+        self.cache_dir = Path(cache_dir)
+        self.upstream = upstream.rstrip("/")
+        self.offline = offline
+        self.packument_ttl = packument_ttl
+        self.locks_lock = threading.Lock()
+        self.locks = {}
+        self.stats_lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "errors": 0}
+        for sub in ("packuments", "tarballs", "tmp"):
+            (self.cache_dir / sub).mkdir(parents=True, exist_ok=True)
+
+    def _bump(self, counter: str):
+        with self.stats_lock:
+            self.stats[counter] += 1
+
+    def _lock(self, key: str) -> threading.Lock:
+        with self.locks_lock:
+            return self.locks.setdefault(key, threading.Lock())
+
+    def _fetch(self, url: str, target: Path, accept: Optional[str] = None):
+        """Download `url` into `target` through a temp file, so readers never see partial files"""
+        request = urllib.request.Request(url, headers={"Accept": accept} if accept else {})
+        tmp = self.cache_dir / "tmp" / uuid.uuid4().hex
+        try:
+            with urllib.request.urlopen(request, timeout=UPSTREAM_TIMEOUT) as response, open(tmp, "wb") as f:
+                while True:
+                    chunk = response.read(1 << 20)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp, target)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def packument(self, name: str, abbreviated: bool) -> Optional[Path]:
+        suffix = ".min.json" if abbreviated else ".json"
+        path = self.cache_dir / "packuments" / (_safe_name(name) + suffix)
+        with self._lock(str(path)):
+            fresh = path.exists() and time.time() - path.stat().st_mtime < self.packument_ttl
+            if fresh or (self.offline and path.exists()):
+                self._bump("hits")
+                return path
+            if self.offline:
+                self._bump("misses")
+                return None
+            try:
+                self._fetch(f"{self.upstream}/{name.replace('/', '%2f')}", path, ABBREVIATED if abbreviated else "application/json")
+                self._bump("misses")
+                return path
+            except (urllib.error.URLError, OSError) as e:
+                if path.exists():
+                    self._bump("stale")
+                    return path
+                self._bump("errors")
+                if isinstance(e, urllib.error.HTTPError) and e.code == 404:
+                    return None
+                raise
+
+    def tarball(self, name: str, filename: str) -> Optional[Path]:
+        path = self.cache_dir / "tarballs" / _safe_name(name) / filename
+        if path.exists():
+            self._bump("hits")
+            return path
+        if self.offline:
+            self._bump("misses")
+            return None
+        with self._lock(str(path)):
+            if not path.exists():
+                self._fetch(f"{self.upstream}/{name}/-/{filename}", path)
+                self._bump("misses")
+        return path
+
+
+class RegistryHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_GET(self):
+        mirror = self.server.mirror
+        path = urllib.parse.unquote(urllib.parse.urlsplit(self.path).path)
+        try:
+            if path == "/-/ping":
+                return self._send(200, b"{}")
+            if path == "/-/stats":
+                return self._send(200, json.dumps(mirror.stats).encode("utf-8"))
+            match = TARBALL_PATH.match(path)
+            if match:
+                tarball = mirror.tarball(match.group(1), match.group(2))
+                if tarball is None:
+                    return self._send(404, b'{"error": "not cached"}')
+                return self._send(200, tarball.read_bytes(), "application/octet-stream")
+            name = path.lstrip("/")
+            if not name or name.startswith("-/"):
+                return self._send(404, b'{"error": "not found"}')
+            abbreviated = ABBREVIATED in self.headers.get("Accept", "")
+            packument = mirror.packument(name, abbreviated)
+            if packument is None:
+                return self._send(404, b'{"error": "not found"}')
+            # tarball URLs in the packument point back at this mirror
+            own_base = f"http://{self.headers.get('Host', self.server.server_address[0])}"
+            body = packument.read_bytes().replace(mirror.upstream.encode("utf-8"), own_base.encode("utf-8"))
+            return self._send(200, body, ABBREVIATED if abbreviated else "application/json")
+        except Exception as e:
+            return self._send(502, json.dumps({"error": str(e)}).encode("utf-8"))
+
+    do_HEAD = do_GET
+
+    def do_POST(self):
+        # audits and other write endpoints are not mirrored
+        self.rfile.read(int(self.headers.get("Content-Length", "0")))
+        self._send(404, b'{"error": "not supported by the mirror"}')
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port: int, cache_dir: str, upstream: str = UPSTREAM, offline: bool = OFFLINE):
+    server = ThreadingHTTPServer(("127.0.0.1", port), RegistryHandler)
+    server.daemon_threads = True
+    server.mirror = RegistryMirror(cache_dir, upstream=upstream, offline=offline)
+    print(f"npm mirror on http://127.0.0.1:{port} (cache {cache_dir}, {'offline' if offline else upstream})")
+    server.serve_forever()
+
+def registry_url(port: int = MIRROR_PORT) -> str:
+    return f"http://127.0.0.1:{port}/"
+
+def _is_up(port: int) -> bool:
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/-/ping", timeout=1) as response:
+            return response.status == 200
+    except (urllib.error.URLError, OSError, socket.timeout):
+        return False
+
+_started = False
+_start_lock = threading.Lock()
+
+def ensure_registry(port: int = MIRROR_PORT) -> Optional[str]:
+    """
+    URL of the node's mirror, starting it as a detached process if nobody has yet.
+    Returns None if the mirror is disabled or could not be started, npm then uses its default registry.
+    """
+    global _started
+    if not MIRROR_ENABLED:
+        return None
+    with _start_lock:
+        if _started and _is_up(port):
+            return registry_url(port)
+        os.makedirs(mirror_dir, exist_ok=True)
+        with open(os.path.join(mirror_dir, ".start.lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            if not _is_up(port):
+                log = open(os.path.join(mirror_dir, "mirror.log"), "a")
+                subprocess.Popen(
+                    # run as a plain script, the mirror does not need the rest of the package
+                    [sys.executable, str(Path(__file__).resolve()), "--port", str(port),
+                     "--cache-dir", os.path.abspath(mirror_dir)],
+                    stdout=log, stderr=subprocess.STDOUT, start_new_session=True,
+                )
+                log.close()
+                deadline = time.time() + START_TIMEOUT
+                while time.time() < deadline and not _is_up(port):
+                    time.sleep(0.1)
+        _started = _is_up(port)
+    if not _started:
+        print(f"npm mirror did not come up on port {port}, using the default registry")
+        return None
+    return registry_url(port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Caching npm registry mirror for render installs")
+    parser.add_argument("--port", type=int, default=MIRROR_PORT)
+    parser.add_argument("--cache-dir", default=mirror_dir)
+    parser.add_argument("--upstream", default=UPSTREAM)
+    parser.add_argument("--offline", action="store_true", default=OFFLINE, help="serve from the cache only")
+    args = parser.parse_args()
+    serve(args.port, os.path.abspath(args.cache_dir), args.upstream, args.offline)
+
+
+if __name__ == "__main__":
+    main()
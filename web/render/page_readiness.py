@@ -0,0 +1,118 @@
+import os
+import json
+import time
+from typing import Optional
+
+
+READINESS_MODE = os.environ.get("PAGE_READINESS", "events")  # events | sleep
+READINESS_TIMEOUT = float(os.environ.get("PAGE_READINESS_TIMEOUT", "5.0"))
+READINESS_IDLE_MS = float(os.environ.get("PAGE_READINESS_IDLE_MS", "100"))
+FREEZE_ANIMATIONS = os.environ.get("FREEZE_ANIMATIONS", "1") == "1"
+
+FREEZE_CSS = (
+    "*, *::before, *::after {"
+    " animation-duration: 0s !important; animation-delay: 0s !important;"
+    " animation-iteration-count: 1 !important; transition: none !important;"
+    " caret-color: transparent !important; }"
+    " html { scroll-behavior: auto !important; }"
+)
+
+# Installed before any page script runs. Counts in-flight fetch/XHR requests and records the
+# last network completion or DOM mutation, so Python only polls one cheap function.
+READINESS_HOOK = """
+(() => {
+  if (window.__webgenReadiness) return;
+  const state = { pending: 0, lastActivity: performance.now() };
+  const touch = () => { state.lastActivity = performance.now(); };
+
+  if (window.fetch) {
+    const originalFetch = window.fetch;
+    window.fetch = function (...args) {
+      state.pending++; touch();
+      return originalFetch.apply(this, args).finally(() => { state.pending--; touch(); });
+    };
+  }
+  const originalSend = XMLHttpRequest.prototype.send;
+  XMLHttpRequest.prototype.send = function (...args) {
+    state.pending++; touch();
+    this.addEventListener('loadend', () => { state.pending--; touch(); }, { once: true });
+    return originalSend.apply(this, args);
+  };
+  try {
+    new PerformanceObserver(touch).observe({ type: 'resource', buffered: true });
+  } catch (e) {}
+  // style/class changes are how JS animations run every frame, they would keep the page from ever going idle
+  new MutationObserver((records) => {
+    if (records.some(r => r.type !== 'attributes' || (r.attributeName !== 'style' && r.attributeName !== 'class'))) touch();
+  }).observe(document, {
+    subtree: true, childList: true, attributes: true, characterData: true
+  });
+
+  if (%(freeze)s) {
+    const freeze = () => {
+      const style = document.createElement('style');
+      style.textContent = %(css)s;
+      (document.head || document.documentElement).appendChild(style);
+    };
+    if (document.documentElement) freeze();
+    else document.addEventListener('readystatechange', freeze, { once: true });
+  }
+
+  window.__webgenReadiness = () => ({
+    complete: document.readyState === 'complete',
+    pending: state.pending,
+    fonts: !document.fonts || document.fonts.status === 'loaded',
+    idle: performance.now() - state.lastActivity,
+  });
+})();
+"""
+
+READINESS_PROBE = "return window.__webgenReadiness ? window.__webgenReadiness() : {complete: document.readyState === 'complete', pending: 0, fonts: true, idle: 1e9}"
+
+
+def install_readiness_hooks(driver, freeze_animations: bool = FREEZE_ANIMATIONS):
+    """Register the readiness hook (and optional animation freeze) for the next navigation of this tab"""
+    source = READINESS_HOOK % {"freeze": "true" if freeze_animations else "false", "css": json.dumps(FREEZE_CSS)}
+    driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": source})
+
+
+def wait_for_page_ready(driver,
+                        timeout: float = READINESS_TIMEOUT,
+                        idle_ms: float = READINESS_IDLE_MS,
+                        poll_interval: float = 0.02) -> bool:
+    """
+    Block until the page is settled or `timeout` seconds have passed.
+
+    Settled means: load event fired (so static module imports are done), no fetch/XHR in
+    flight, web fonts loaded, and no resource completion or DOM mutation for `idle_ms`.
+    Returns True if the page settled, False if the hard cap was hit.
+    """
+    deadline = time.time() + timeout
+    while True:
+        try:
+            state = driver.execute_script(READINESS_PROBE)
+            if state["complete"] and state["pending"] <= 0 and state["fonts"] and state["idle"] >= idle_ms:
+                return True
+        except Exception:
+            pass  # navigation in progress, context not ready yet
+        if time.time() >= deadline:
+            return False
+        time.sleep(poll_interval)
+
+
+def capture_deadline(timeout: float = READINESS_TIMEOUT) -> float:
+    """One readiness budget for all `settle` calls of a capture, so a page that never idles costs it once"""
+    return time.time() + timeout
+
+
+def settle(driver, pause: float, deadline: Optional[float] = None) -> bool:
+    """
+    Wait for the page in the configured mode, the legacy mode is a fixed `pause` sleep.
+    Waits until `deadline` (default: READINESS_TIMEOUT from now); once it passed the page is checked once.
+    """
+    if READINESS_MODE == "sleep":
+        time.sleep(pause)
+        return True
+    if deadline is None:
+        deadline = capture_deadline()
+    return wait_for_page_ready(driver, timeout=max(0.0, deadline - time.time()))
@@ -0,0 +1,145 @@
+import os
+import mmap
+import time
+import fcntl
+import socket
+import struct
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+
+# Node-wide port leases shared by every process through one memory-mapped file
+lease_file = os.environ.get("PORT_LEASE_FILE", "/tmp/webgen_port_leases.bin")
+PORT_RANGE_START = int(os.environ.get("PORT_RANGE_START", "30000"))
+PORT_RANGE_SIZE = int(os.environ.get("PORT_RANGE_SIZE", "10000"))
+
+HEADER = struct.Struct("<q")          # next slot to try (rotating cursor)
+SLOT = struct.Struct("<qd20s")        # owner pid, lease time, sha1 of the owner project name
+HEADER_SIZE = 16
+
+
+def _owner_digest(owner: str) -> bytes:
+    return hashlib.sha1(owner.encode("utf-8")).digest()
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _bindable(port: int) -> bool:
+    """Skip ports held by processes outside the allocator (e.g. a dev server from a crashed run)"""
+    try:
+        with socket.socket() as s:
+            s.bind(("", port))
+        return True
+    except OSError:
+        return False
+
+
+class PortAllocator:
+    """
+    Lease ports from a fixed range to all processes on the node.
+
+    The lease table is a memory-mapped file guarded by flock (across processes) and a thread
+    lock (within the process). Allocation walks from a rotating cursor, so the next slot is
+    almost always free and allocation is O(1) amortized with no sleeping. Leases of dead PIDs
+    are reclaimed on the fly.
+    """
+
+    def __init__(self, path: str = lease_file, start: int = PORT_RANGE_START, size: int = PORT_RANGE_SIZE):
+        self.path = path
+        self.start = start
+        self.size = size
+        self.thread_lock = threading.Lock()
+        self.owned = {}  # owner digest -> ports leased by this process
+        total = HEADER_SIZE + SLOT.size * size
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+        with self._locked():
+            if os.fstat(self.fd).st_size < total:
+                os.ftruncate(self.fd, total)
+        self.map = mmap.mmap(self.fd, total)
+
+    @contextmanager
+    def _locked(self):
+        with self.thread_lock:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def _read_slot(self, idx: int):
+        return SLOT.unpack_from(self.map, HEADER_SIZE + idx * SLOT.size)
+
+    def _write_slot(self, idx: int, pid: int, owner_digest: bytes):
+        SLOT.pack_into(self.map, HEADER_SIZE + idx * SLOT.size, pid, time.time() if pid else 0.0, owner_digest)
+
+    def allocate(self, owner: str) -> int:
+        digest = _owner_digest(owner)
+        with self._locked():
+            cursor = HEADER.unpack_from(self.map, 0)[0] % self.size
+            for i in range(self.size):
+                idx = (cursor + i) % self.size
+                pid, _, _ = self._read_slot(idx)
+                if pid and _pid_alive(pid):
+                    continue
+                port = self.start + idx
+                if not _bindable(port):
+                    continue
+                self._write_slot(idx, os.getpid(), digest)
+                HEADER.pack_into(self.map, 0, idx + 1)
+                self.owned.setdefault(digest, []).append(port)
+                return port
+        raise RuntimeError("No free port in range!")
+
+    def release(self, port: Optional[int]):
+        if port is None or not (self.start <= port < self.start + self.size):
+            return
+        with self._locked():
+            self._write_slot(port - self.start, 0, b"")
+
+    def release_owner(self, owner: str, scan: bool = False) -> int:
+        """
+        Free the leases held for a project, called when the project is cleaned up.
+        Leases taken by this process are tracked locally, `scan=True` also searches the whole
+        table for leases another process took for the same project.
+        """
+        digest = _owner_digest(owner)
+        released = 0
+        with self._locked():
+            ports = self.owned.pop(digest, [])
+            indices = range(self.size) if scan else [port - self.start for port in ports]
+            for idx in indices:
+                pid, _, slot_owner = self._read_slot(idx)
+                if pid and slot_owner == digest:
+                    self._write_slot(idx, 0, b"")
+                    released += 1
+        return released
+
+    def reclaim_dead(self) -> int:
+        """Free leases whose owning process has exited"""
+        reclaimed = 0
+        with self._locked():
+            for idx in range(self.size):
+                pid, _, _ = self._read_slot(idx)
+                if pid and not _pid_alive(pid):
+                    self._write_slot(idx, 0, b"")
+                    reclaimed += 1
+        return reclaimed
+
+
+_allocator = None
+_allocator_lock = threading.Lock()
+
+def get_port_allocator() -> PortAllocator:
+    global _allocator
+    with _allocator_lock:
+        if _allocator is None:
+            _allocator = PortAllocator()
+    return _allocator
@@ -0,0 +1,161 @@
+import os
+import re
+import json
+import posixpath
+import threading
+from typing import Dict, Tuple
+
+from . import node_modules_store
+from .artifact import canonical_artifact
+
+
+PREFLIGHT_ENABLED = os.environ.get("PREFLIGHT_ENABLED", "1") == "1"
+# shadow: record the verdict and render anyway, so rejections that would have scored are logged
+# enforce: stop rejected projects before npm install, once shadow runs show no disagreements
+PREFLIGHT_MODE = os.environ.get("PREFLIGHT_MODE", "shadow")
+
+# reason codes, "ok" means the project goes on to npm install
+OK = "ok"
+NO_ARTIFACT = "no_artifact"
+TRUNCATED = "truncated"
+INVALID_PACKAGE_JSON = "invalid_package_json"
+MISSING_ENTRY = "missing_entry"
+MISSING_RELATIVE_IMPORT = "missing_relative_import"
+MISSING_DEPENDENCY = "missing_dependency"
+
+SOURCE_EXTENSIONS = (".ts", ".tsx", ".js", ".jsx", ".mjs")
+RESOLVE_SUFFIXES = ("", ".ts", ".tsx", ".js", ".jsx", ".mjs", ".json",
+                    "/index.ts", "/index.tsx", "/index.js", "/index.jsx")
+
+IMPORT_PATTERN = re.compile(
+    r'''(?:^|[;\s])(?:import|export)\s+(type\s+)?(?:[\w*{}\s,$]+?\s+from\s+)?['"]([^'"\n]+)['"]'''
+    r'''|\bimport\s*\(\s*['"]([^'"\n]+)['"]\s*\)''',
+    re.MULTILINE
+)
+LINE_COMMENT = re.compile(r'^\s*//.*$', re.MULTILINE)
+BLOCK_COMMENT = re.compile(r'/\*.*?\*/', re.DOTALL)
+ENTRY_PATTERN = re.compile(r'<script[^>]+type="module"[^>]+src="([^"]+)"')
+
+# packages that npm hoists with common dependencies, so importing them without declaring them works
+HOISTED_DEPENDENCIES = {
+    "react": {"scheduler"},
+    "react-dom": {"scheduler"},
+    "react-router-dom": {"react-router", "@remix-run/router"},
+    "antd": {"@ant-design/icons", "@ant-design/colors", "@ant-design/cssinjs", "dayjs", "classnames"},
+    "recharts": {"lodash", "clsx", "d3-scale", "d3-shape"},
+    "vite": {"esbuild", "rollup", "postcss"},
+}
+
+_stats_lock = threading.Lock()
+_stats = {}
+_disagreements = {}
+
+
+def package_name(specifier: str) -> str:
+    """'@scope/pkg/sub/path' -> '@scope/pkg', 'pkg/sub' -> 'pkg'"""
+    parts = specifier.split("/")
+    return "/".join(parts[:2]) if specifier.startswith("@") else parts[0]
+
+def _resolve(files, importer: str, specifier: str) -> bool:
+    if specifier.startswith("/"):
+        # root-absolute: a project file, or a static asset Vite serves from public/ (e.g. '/vite.svg')
+        base = specifier.lstrip("/").split("?", 1)[0]
+        return any(base + suffix in files for suffix in RESOLVE_SUFFIXES) or "public/" + base in files
+    base = posixpath.normpath(posixpath.join(posixpath.dirname(importer), specifier))
+    base = base.split("?", 1)[0]
+    return any(base + suffix in files for suffix in RESOLVE_SUFFIXES)
+
+def _is_truncated(model_response: str) -> bool:
+    opened = model_response.rfind("<webArtifact")
+    if opened == -1:
+        return False
+    closed = model_response.find("</webArtifact>", opened)
+    if closed == -1:
+        return True
+    block = model_response[opened:closed]
+    return block.count("<webAction") != block.count("</webAction>")
+
+def _declared_packages(package_data: dict, shell_actions) -> set:
+    declared = set()
+    for field in ("dependencies", "devDependencies", "peerDependencies"):
+        if isinstance(package_data.get(field), dict):
+            declared.update(package_data[field].keys())
+    declared.update(package_name(spec.rsplit("@", 1)[0] if spec.rfind("@") > 0 else spec)
+                    for spec in node_modules_store.extra_packages(shell_actions))
+    for name in list(declared):
+        declared.update(HOISTED_DEPENDENCIES.get(name, ()))
+    return declared
+
+def preflight_check(model_response: str) -> Tuple[str, str]:
+    """
+    Cheap static checks that predict a project cannot render, run before npm install.
+
+    Returns (reason code, detail). Relative and root-absolute imports of source files must
+    resolve within the manifest, and bare imports must name a declared dependency or one npm
+    hoists with it (HOISTED_DEPENDENCIES). Only the response itself is looked at, never the
+    node_modules store, so the result does not depend on what earlier rollouts installed.
+    Alias imports (e.g. '@/...') are not checked.
+    """
+    if _is_truncated(model_response):
+        return TRUNCATED, "unclosed webArtifact/webAction"
+    artifact = canonical_artifact(model_response)
+    if artifact is None:
+        return NO_ARTIFACT, ""
+    files = artifact["files"]
+
+    try:
+        package_data = json.loads(files.get("package.json", ""))
+        if not isinstance(package_data, dict):
+            raise ValueError("package.json is not an object")
+    except ValueError as e:
+        return INVALID_PACKAGE_JSON, str(e)
+
+    if "index.html" in files:
+        entry = ENTRY_PATTERN.search(files["index.html"])
+        if entry and not entry.group(1).startswith("http") and not _resolve(files, "index.html", entry.group(1)):
+            return MISSING_ENTRY, entry.group(1)
+
+    vite_config = files.get("vite.config.ts", "") + files.get("vite.config.js", "")
+    has_alias = "alias" in vite_config
+    declared = None
+    for file_path, content in files.items():
+        if not file_path.startswith("src/") or not file_path.endswith(SOURCE_EXTENSIONS):
+            continue
+        content = BLOCK_COMMENT.sub("", LINE_COMMENT.sub("", content))
+        for match in IMPORT_PATTERN.finditer(content):
+            if match.group(1):
+                continue  # `import type` is erased by the compiler
+            specifier = match.group(2) or match.group(3)
+            if specifier.startswith((".", "/")):
+                if not _resolve(files, file_path, specifier):
+                    return MISSING_RELATIVE_IMPORT, f"{file_path} -> {specifier}"
+                continue
+            if specifier.startswith(("virtual:", "node:")) or (has_alias and specifier.startswith(("@/", "~/"))):
+                continue
+            if declared is None:
+                declared = _declared_packages(package_data, artifact["shell"])
+            name = package_name(specifier)
+            if name in declared:
+                continue
+            return MISSING_DEPENDENCY, f"{file_path} -> {name}"
+    return OK, ""
+
+def record_preflight(reason: str):
+    with _stats_lock:
+        _stats[reason] = _stats.get(reason, 0) + 1
+
+def record_outcome(reason: str, score: float) -> bool:
+    """Compare a shadow-mode verdict with the final score, True if a rejected project scored above 0"""
+    disagrees = reason != OK and score > 0
+    if disagrees:
+        with _stats_lock:
+            _disagreements[reason] = _disagreements.get(reason, 0) + 1
+    return disagrees
+
+def preflight_stats() -> Dict[str, dict]:
+    """Count, share and shadow-mode disagreements of each reason code (including "ok") seen by this process"""
+    with _stats_lock:
+        stats, disagreements = dict(_stats), dict(_disagreements)
+    total = sum(stats.values())
+    return {reason: {"count": count, "rate": count / total, "disagreements": disagreements.get(reason, 0)}
+            for reason, count in stats.items()}
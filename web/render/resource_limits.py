@@ -0,0 +1,216 @@
+import os
+import signal
+import shlex
+import threading
+import subprocess
+from pathlib import Path
+from typing import Dict, Optional
+
+from .trace import RenderFailure
+
+
+# Per-project limits for install, build and serve commands. cgroup v2 is used when a writable,
+# delegated parent cgroup is available, otherwise rlimits and nice are applied to each command.
+LIMITS_ENABLED = os.environ.get("PROJECT_LIMITS_ENABLED", "1") == "1"
+CPU_LIMIT = float(os.environ.get("PROJECT_CPU_LIMIT", "2"))  # cores, 0 = unlimited
+MEMORY_LIMIT_MB = int(os.environ.get("PROJECT_MEMORY_LIMIT_MB", "4096"))  # 0 = unlimited
+PIDS_LIMIT = int(os.environ.get("PROJECT_PIDS_LIMIT", "512"))  # 0 = unlimited
+SERVE_WALL_LIMIT = float(os.environ.get("PROJECT_SERVE_WALL_LIMIT", "900"))  # seconds a dev server may live, 0 = unlimited
+CPU_SECONDS_LIMIT = int(os.environ.get("PROJECT_CPU_SECONDS_LIMIT", "1800"))  # rlimit fallback only
+NICE = int(os.environ.get("PROJECT_NICE", "5"))
+# e.g. a systemd slice with Delegate=yes; by default a child of this process's own cgroup is tried
+cgroup_parent = os.environ.get("PROJECT_CGROUP_PARENT", "")
+
+CGROUP_MOUNT = Path("/sys/fs/cgroup")
+CGROUP_PERIOD_US = 100000
+
+_cgroup_base = None
+_cgroup_checked = False
+_cgroup_lock = threading.Lock()
+
+
+def _own_cgroup() -> Optional[Path]:
+    try:
+        with open("/proc/self/cgroup", "r") as f:
+            for line in f:
+                if line.startswith("0::"):
+                    return CGROUP_MOUNT / line.strip()[3:].lstrip("/")
+    except OSError:
+        pass
+    return None
+
+def cgroup_base() -> Optional[Path]:
+    """Parent cgroup for project cgroups with cpu/memory/pids delegated, or None (use rlimits)"""
+    global _cgroup_base, _cgroup_checked
+    with _cgroup_lock:
+        if _cgroup_checked:
+            return _cgroup_base
+        _cgroup_checked = True
+        if not (CGROUP_MOUNT / "cgroup.controllers").exists():
+            return None  # cgroup v1 or no cgroupfs
+        if cgroup_parent:
+            base = Path(cgroup_parent)
+        else:
+            own = _own_cgroup()
+            if own is None:
+                return None
+            base = own / "webgen_projects"
+        required = [c for c, limit in (("cpu", CPU_LIMIT), ("memory", MEMORY_LIMIT_MB), ("pids", PIDS_LIMIT)) if limit > 0]
+        if not required:
+            return None
+        try:
+            base.mkdir(exist_ok=True)
+            available = (base / "cgroup.controllers").read_text().split()
+            missing = [c for c in required if c not in available]
+            if missing:
+                # a cgroup without the controllers would run projects unlimited, rlimits at least cap them
+                print(f"cgroup v2 controllers {missing} not delegated to {base}, using rlimits")
+                return None
+            (base / "cgroup.subtree_control").write_text(" ".join(f"+{c}" for c in required))
+        except OSError as e:
+            print(f"cgroup v2 limits unavailable under {base} ({e}), using rlimits")
+            return None
+        _cgroup_base = base
+        return base
+
+
+def _heap_exhausted(log_path: Optional[str]) -> bool:
+    """node aborts (SIGABRT, exit 134) when V8 hits --max-old-space-size or RLIMIT_DATA stops malloc"""
+    if not LIMITS_ENABLED or MEMORY_LIMIT_MB <= 0:
+        return False
+    if log_path is None:
+        return True  # output not captured, an abort under a memory cap is almost always the heap
+    try:
+        with open(log_path, "rb") as f:
+            f.seek(max(0, os.path.getsize(log_path) - 16384))
+            tail = f.read().decode("utf-8", "replace")
+    except OSError:
+        return True
+    return "heap out of memory" in tail or "Fatal process out of memory" in tail
+
+
+class ProjectLimits:
+    """Resource limits of one project, shared by its install, build and serve commands"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.cgroup = None
+        base = cgroup_base() if LIMITS_ENABLED else None
+        if base is not None:
+            cgroup = base / f"project_{name}"
+            try:
+                cgroup.mkdir(exist_ok=True)
+                if CPU_LIMIT > 0:
+                    (cgroup / "cpu.max").write_text(f"{int(CPU_LIMIT * CGROUP_PERIOD_US)} {CGROUP_PERIOD_US}")
+                if MEMORY_LIMIT_MB > 0:
+                    (cgroup / "memory.max").write_text(str(MEMORY_LIMIT_MB * 1024 * 1024))
+                    (cgroup / "memory.swap.max").write_text("0")
+                if PIDS_LIMIT > 0:
+                    (cgroup / "pids.max").write_text(str(PIDS_LIMIT))
+                self.cgroup = cgroup
+            except OSError as e:
+                print(f"Could not set up cgroup for {name}: {e}, using rlimits")
+                try:
+                    cgroup.rmdir()
+                except OSError:
+                    pass
+
+    def wrap(self, command: str) -> str:
+        """
+        The shell moves itself into the project cgroup, or sets the rlimits and nice level of the
+        fallback on itself, before running the command; everything it starts inherits them.
+        """
+        if self.cgroup is not None:
+            return f"echo $$ > {shlex.quote(str(self.cgroup / 'cgroup.procs'))} && {command}"
+        if not LIMITS_ENABLED:
+            return command
+        limits = []
+        if MEMORY_LIMIT_MB > 0:
+            # RLIMIT_DATA (-d) counts writable private memory, not V8's PROT_NONE reservations like -v would
+            limits.append(f"ulimit -d {MEMORY_LIMIT_MB * 1024}")
+        if CPU_SECONDS_LIMIT > 0:
+            # SIGXCPU at the soft limit, SIGKILL 5 seconds later
+            limits.append(f"ulimit -S -t {CPU_SECONDS_LIMIT}")
+            limits.append(f"ulimit -H -t {CPU_SECONDS_LIMIT + 5}")
+        if NICE:
+            command = f"exec nice -n {NICE} sh -c {shlex.quote(command)}"
+        return "; ".join([f"{limit} 2>/dev/null" for limit in limits] + [command])
+
+    def env(self) -> Dict[str, str]:
+        if not LIMITS_ENABLED or MEMORY_LIMIT_MB <= 0:
+            return {}
+        # keep V8's heap below the limit, so node fails with a heap error instead of being killed
+        node_options = os.environ.get("NODE_OPTIONS", "")
+        return {"NODE_OPTIONS": f"{node_options} --max-old-space-size={int(MEMORY_LIMIT_MB * 0.75)}".strip()}
+
+    def _events(self, filename: str) -> Dict[str, int]:
+        try:
+            lines = (self.cgroup / filename).read_text().split("\n")
+        except OSError:
+            return {}
+        return {k: int(v) for k, v in (line.split() for line in lines if line.strip())}
+
+    def limit_hit(self, returncode: Optional[int] = None, log_path: Optional[str] = None) -> Optional[str]:
+        """Failure class if the project ran into one of its limits, else None"""
+        if self.cgroup is not None:
+            if self._events("memory.events").get("oom_kill", 0) > 0:
+                return "limit_memory"
+            if self._events("pids.events").get("max", 0) > 0:
+                return "limit_pids"
+        if returncode is not None and returncode in (-signal.SIGXCPU, 128 + signal.SIGXCPU):
+            return "limit_cpu"
+        if returncode is not None and returncode in (-signal.SIGABRT, 128 + signal.SIGABRT) and _heap_exhausted(log_path):
+            return "limit_memory"
+        return None
+
+    def close(self):
+        if self.cgroup is not None:
+            try:
+                self.cgroup.rmdir()
+            except OSError:
+                pass  # still populated, the workspace sweep or the next run removes it
+
+
+_limits = {}
+_limits_lock = threading.Lock()
+
+def limits_for(project_path) -> ProjectLimits:
+    name = os.path.basename(os.path.normpath(str(project_path)))
+    with _limits_lock:
+        if name not in _limits:
+            _limits[name] = ProjectLimits(name)
+        return _limits[name]
+
+def release_limits(project_name: str):
+    with _limits_lock:
+        limits = _limits.pop(project_name, None)
+    if limits is not None:
+        limits.close()
+
+def run_limited(cmd: str, cwd, timeout: Optional[float] = None, **popen_kwargs) -> subprocess.CompletedProcess:
+    """
+    subprocess.run(cmd, shell=True, check=True) under the project's limits. The command runs in
+    its own process group so a timeout kills everything it spawned. Raises RenderFailure with a
+    limit_* class when a limit was hit, CalledProcessError/TimeoutExpired otherwise.
+    """
+    limits = limits_for(cwd)
+    process = subprocess.Popen(
+        limits.wrap(cmd), shell=True, cwd=cwd, env={**os.environ, **limits.env(), **popen_kwargs.pop("env", {})},
+        start_new_session=True, **popen_kwargs
+    )
+    try:
+        returncode = process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        process.wait()
+        raise
+    if returncode != 0:
+        log_path = getattr(popen_kwargs.get("stderr"), "name", None)
+        hit = limits.limit_hit(returncode, log_path if isinstance(log_path, str) else None)
+        if hit is not None:
+            raise RenderFailure(hit, f"`{cmd}` exceeded the project's resource limits")
+        raise subprocess.CalledProcessError(returncode, cmd)
+    return subprocess.CompletedProcess(cmd, returncode)
@@ -0,0 +1,186 @@
+import os
+import time
+import sqlite3
+import hashlib
+import tempfile
+import threading
+from typing import List, Optional
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional, without it the cache is disabled
+    Image = None
+
+
+# VLM outputs keyed by instruction, grader and perceptual hashes of the screenshots, so visually
+# identical renders of different sources (default template, the same UI-kit layout) are graded once
+cache_path = os.environ.get("SCREENSHOT_CACHE_PATH", os.path.join(tempfile.gettempdir(), "webgen_screenshot_cache.sqlite"))
+CACHE_ENABLED = os.environ.get("SCREENSHOT_CACHE_ENABLED", "1") == "1"
+HASH_SIZE = int(os.environ.get("SCREENSHOT_CACHE_HASH_SIZE", "16"))  # dHash of HASH_SIZE x HASH_SIZE bits
+MAX_DISTANCE = int(os.environ.get("SCREENSHOT_CACHE_MAX_DISTANCE", "6"))  # Hamming tolerance per screenshot
+MAX_ENTRIES = int(os.environ.get("SCREENSHOT_CACHE_MAX_ENTRIES", "200000"))
+MAX_CANDIDATES = 1000  # most recently used entries of one instruction compared on lookup
+EVICT_EVERY = 1000  # puts between eviction passes
+TOUCH_INTERVAL = 3600  # a hit refreshes last_used (a write) only when it is older than this, seconds
+
+
+def dhash(image_path: str, size: int = HASH_SIZE) -> Optional[str]:
+    """Difference hash: one bit per horizontally adjacent pixel pair of a (size+1) x size grayscale thumbnail"""
+    try:
+        with Image.open(image_path) as image:
+            pixels = list(image.convert("L").resize((size + 1, size)).getdata())
+    except OSError:
+        return None
+    value = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            right = pixels[row * (size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return f"{value:0{size * size // 4}x}"
+
+def hamming(a: str, b: str) -> int:
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+def screenshot_cache_key(instruction: str, grader_version: str) -> str:
+    return hashlib.sha256(f"{grader_version}\0{instruction}".encode("utf-8")).hexdigest()
+
+
+class ScreenshotCache:
+    """
+    Persistent (SQLite, WAL) cache of VLM outputs. An entry matches a lookup with the same key
+    and the same number of screenshots if every screenshot is within `max_distance` bits of the
+    stored hash; the closest entry wins. Exact matches are an index lookup, near matches scan the
+    `MAX_CANDIDATES` most recently used entries of the key. Least recently used entries beyond
+    `max_entries` are evicted (last_used is kept with TOUCH_INTERVAL resolution).
+    """
+
+    def __init__(self, path: str = cache_path, max_entries: int = MAX_ENTRIES, max_distance: int = MAX_DISTANCE):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.local = threading.local()
+        self.stats_lock = threading.Lock()
+        self.stats = {"hits": 0, "near_hits": 0, "misses": 0, "unhashable": 0}
+        self.puts = 0
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS vlm_outputs ("
+            " id INTEGER PRIMARY KEY, key TEXT NOT NULL, hashes TEXT NOT NULL, output TEXT NOT NULL,"
+            " created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS vlm_outputs_key ON vlm_outputs (key, last_used)")
+        conn.execute("CREATE INDEX IF NOT EXISTS vlm_outputs_exact ON vlm_outputs (key, hashes)")
+        conn.execute("CREATE INDEX IF NOT EXISTS vlm_outputs_last_used ON vlm_outputs (last_used)")
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def _count(self, counter: str):
+        with self.stats_lock:
+            self.stats[counter] += 1
+
+    def hashes(self, image_paths: List[str]) -> Optional[List[str]]:
+        """Hashes of the screenshots in file name order, None if one of them cannot be read"""
+        hashes = [dhash(path) for path in sorted(image_paths, key=os.path.basename)]
+        if not hashes or None in hashes:
+            self._count("unhashable")
+            return None
+        return hashes
+
+    def get(self, key: str, hashes: List[str]) -> Optional[str]:
+        try:
+            conn = self._conn()
+            # identical screenshots are the common hit, found through the index before any scan
+            row = conn.execute(
+                "SELECT id, output, last_used FROM vlm_outputs WHERE key = ? AND hashes = ? LIMIT 1",
+                (key, ",".join(hashes)),
+            ).fetchone()
+            best = (0, row[0], row[1], row[2]) if row is not None else None
+            if best is None and self.max_distance > 0:
+                rows = conn.execute(
+                    "SELECT id, hashes, output, last_used FROM vlm_outputs WHERE key = ? ORDER BY last_used DESC LIMIT ?",
+                    (key, MAX_CANDIDATES),
+                ).fetchall()
+                for row_id, stored, output, last_used in rows:
+                    stored = stored.split(",")
+                    if len(stored) != len(hashes):
+                        continue
+                    distances = [hamming(a, b) for a, b in zip(stored, hashes)]
+                    if max(distances) <= self.max_distance and (best is None or sum(distances) < best[0]):
+                        best = (sum(distances), row_id, output, last_used)
+            if best is not None and time.time() - best[3] > TOUCH_INTERVAL:
+                # eviction only needs last_used to the hour, so most hits stay read-only
+                conn.execute("UPDATE vlm_outputs SET last_used = ? WHERE id = ?", (time.time(), best[1]))
+                conn.commit()
+        except sqlite3.Error as e:
+            print(f"Screenshot cache lookup failed: {e}")
+            return None
+        if best is None:
+            self._count("misses")
+            return None
+        self._count("hits" if best[0] == 0 else "near_hits")
+        return best[2]
+
+    def put(self, key: str, hashes: List[str], output: str):
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT INTO vlm_outputs (key, hashes, output, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, ",".join(hashes), output, now, now),
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Screenshot cache write failed: {e}")
+            return
+        with self.stats_lock:
+            self.puts += 1
+            evict = self.puts % EVICT_EVERY == 0
+        if evict:
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop the least recently used entries beyond `max_entries`"""
+        try:
+            conn = self._conn()
+            excess = conn.execute("SELECT COUNT(*) FROM vlm_outputs").fetchone()[0] - self.max_entries
+            removed = 0
+            if excess > 0:
+                removed = conn.execute(
+                    "DELETE FROM vlm_outputs WHERE id IN (SELECT id FROM vlm_outputs ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                ).rowcount
+            conn.commit()
+            return removed
+        except sqlite3.Error as e:
+            print(f"Screenshot cache eviction failed: {e}")
+            return 0
+
+    def cache_stats(self) -> dict:
+        with self.stats_lock:
+            stats = dict(self.stats)
+        lookups = stats["hits"] + stats["near_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["hits"] + stats["near_hits"]) / lookups if lookups else 0.0
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_screenshot_cache() -> Optional[ScreenshotCache]:
+    global _cache
+    if not CACHE_ENABLED or Image is None:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ScreenshotCache()
+    return _cache
@@ -0,0 +1,131 @@
+import os
+import posixpath
+import threading
+from functools import partial
+from http.cookies import CookieError, SimpleCookie
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import unquote, urlsplit
+
+
+# Script injected into built pages so client-side routers see the app at "/" instead of the mount prefix
+# (root-absolute requests the app makes afterwards, e.g. fetch("/data.json"), are mapped back by the server)
+HISTORY_SHIM = (
+    '<script>history.replaceState(null, "", "/" + location.pathname.slice({prefix_len}) '
+    '+ location.search + location.hash)</script>'
+)
+# remembers the last mount a browser context loaded, for requests whose Referer no longer has the prefix
+MOUNT_COOKIE = "webgen_mount"
+
+
+class MountedStaticHandler(SimpleHTTPRequestHandler):
+    """
+    Serve `/<prefix>/<path>` from the directory mounted under `prefix`, with SPA fallback to index.html.
+
+    Paths without a mount prefix (public/ assets and fetches the app makes from "/" after the history
+    shim) are served from the mount named by the Referer, or else by the MOUNT_COOKIE set on the
+    last prefixed response.
+    """
+
+    def __init__(self, *args, mounts: Dict[str, str], **kwargs):
+        self.mounts = mounts
+        self.mount = None
+        super().__init__(*args, **kwargs)
+
+    def _path_parts(self, path: str) -> List[str]:
+        path = posixpath.normpath(unquote(urlsplit(path).path))
+        return [p for p in path.split("/") if p and p not in (".", "..")]
+
+    def referring_mount(self) -> Optional[str]:
+        referer = self._path_parts(self.headers.get("Referer", ""))
+        if referer and referer[0] in self.mounts:
+            return referer[0]
+        try:
+            morsel = SimpleCookie(self.headers.get("Cookie", "")).get(MOUNT_COOKIE)
+        except CookieError:
+            return None
+        return morsel.value if morsel is not None and morsel.value in self.mounts else None
+
+    def translate_path(self, path: str) -> str:
+        parts = self._path_parts(path)
+        if parts and parts[0] in self.mounts:
+            self.mount = mount = parts.pop(0)
+        else:
+            self.mount = None
+            mount = self.referring_mount()
+            if mount is None:
+                return ""
+        root = self.mounts[mount]
+        full_path = os.path.join(root, *parts)
+        if os.path.isdir(full_path):
+            full_path = os.path.join(full_path, "index.html")
+        # client-side routes have no file on disk and no extension, serve the app entry instead
+        if not os.path.exists(full_path) and (not parts or "." not in parts[-1]):
+            full_path = os.path.join(root, "index.html")
+        return full_path
+
+    def send_head(self):
+        if not self.translate_path(self.path):
+            self.send_error(404, "No such mount")
+            return None
+        return super().send_head()
+
+    def end_headers(self):
+        self.send_header("Cache-Control", "no-store")
+        if self.mount is not None:
+            self.send_header("Set-Cookie", f"{MOUNT_COOKIE}={self.mount}; Path=/; SameSite=Lax")
+        super().end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StaticMountServer:
+    """One long-lived HTTP server per worker serving every static build under its own path prefix"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.mounts = {}
+        handler = partial(MountedStaticHandler, mounts=self.mounts)
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="static-mount-server", daemon=True)
+        self.thread.start()
+
+    def mount(self, prefix: str, directory) -> str:
+        self.mounts[prefix] = str(Path(directory).resolve())
+        return f"http://localhost:{self.port}/{prefix}/"
+
+    def unmount(self, prefix: str):
+        self.mounts.pop(prefix, None)
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def inject_history_shim(index_html, prefix: str):
+    """Make the built app believe it is served from "/" once loaded under `/<prefix>/`"""
+    index_html = Path(index_html)
+    content = index_html.read_text(encoding="utf-8")
+    shim = HISTORY_SHIM.format(prefix_len=len(prefix) + 2)
+    if "<head>" in content:
+        content = content.replace("<head>", "<head>" + shim, 1)
+    else:
+        content = shim + content
+    index_html.write_text(content, encoding="utf-8")
+
+
+_server = None
+_server_lock = threading.Lock()
+
+def get_static_server() -> StaticMountServer:
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = StaticMountServer(port=int(os.environ.get("STATIC_SERVER_PORT", "0")))
+    return _server
+
+def peek_static_server() -> Optional[StaticMountServer]:
+    return _server
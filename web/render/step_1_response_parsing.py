@@ -5,6 +5,8 @@ import json
 from pathlib import Path
 from typing import Dict, List, Tuple
 
+from .template_pool import get_template_pool
+
 
 def extract_web_actions(text: str) -> Tuple[List[str], str]:
     # Extract all shell actions
@@ -41,6 +43,14 @@ def extract_and_build_project(model_response: str, output_dir: str = "web_projec
             return None
         
         artifact_content = artifact_match.group(1)
+
+        # Start from a pre-installed starter template if one is ready, so that only files
+        # differing from the template are written and node_modules is usually already in place
+        pool = get_template_pool()
+        template_files = {}
+        if pool is not None and pool.acquire(project_path):
+            template_files = pool.files
+        unchanged_template_files = set(template_files)
         
         # Create dependency install and server start scripts
         install_script = project_path / "install_dependencies.sh"
@@ -87,6 +97,11 @@ def extract_and_build_project(model_response: str, output_dir: str = "web_projec
                     pass
                 except Exception as e:
                     raise
+
+                if file_path in unchanged_template_files:
+                    unchanged_template_files.discard(file_path)
+                    if template_files[file_path] == action_text:
+                        continue
                 
                 with open(full_path, "w", encoding="utf-8") as f:
                     f.write(action_text)
@@ -101,6 +116,10 @@ def extract_and_build_project(model_response: str, output_dir: str = "web_projec
                 with open(start_script, "a", encoding="utf-8") as start_f:
                     start_f.write(f"{action_text}\n")
         
+        # Drop template files the response did not declare, the project must match the manifest
+        for file_path in unchanged_template_files:
+            (project_path / file_path).unlink(missing_ok=True)
+
         # Validate package.json if exists
         if package_json_content:
             try:
@@ -9,15 +9,29 @@ import shlex
 from pathlib import Path
 import shutil
 import socket
+from collections import deque
+
+from . import lockfile_cache
+from . import node_modules_store
+from .build_log_gate import BuildLogGate
+from .log_tail import LogTail
+from .npm_registry import ensure_registry
+from .port_allocator import get_port_allocator
+from .static_server import get_static_server, inject_history_shim
+from .resource_limits import SERVE_WALL_LIMIT, limits_for, run_limited
+from .supervisor import LAUNCHER, get_supervisor
+from .trace import RenderFailure, span
 
 
 RANK = int(os.environ.get("RANK", "0"))
+# "dev": one pm2-managed `npm run dev` per rollout, "static": one-shot `vite build` served in-process
+SERVE_MODE = os.environ.get("SERVE_MODE", "dev")
 
 def run_npm_install(project_path, commands, timeout=300):
     """
     Run npm install commands for each app, retrying with --force and then
-    --legacy-peer-deps if the original command fails.  Errors are logged but
-    never propagate, so the calling code keeps running.
+    --legacy-peer-deps if the original command fails. Raises RenderFailure
+    ("install_failed") if every attempt of a command fails.
     """
     def remove_npm_run_dev(command_line: str) -> str:
         parts = [part.strip() for part in command_line.split("&&")]
@@ -38,38 +52,120 @@ def run_npm_install(project_path, commands, timeout=300):
         os.makedirs(cache_dir, exist_ok=True)
         return cache_dir
 
-    cwd = Path(project_path)
-    if os.path.exists(cwd / "node_modules"):
-        shutil.rmtree(cwd / "node_modules") 
-
-    cache_dir = get_project_cache_dir()
-
-    for raw_cmd in commands["shell_actions"]:
-        raw_cmd = remove_npm_run_dev(raw_cmd)
-        base_cmd = f"npm install --cache {cache_dir}" + raw_cmd.replace("npm install", "").strip()
-        # Build the three attempts
-        attempts = [
-            base_cmd,
-            _add_flag(base_cmd, "--force"),
-            _add_flag(base_cmd, "--legacy-peer-deps"),
-        ]
-
-        for idx, cmd in enumerate(attempts, start=1):
+    def get_install_flags() -> str:
+        install_flags = f"--cache {get_project_cache_dir()}"
+        # resolve packuments and tarballs through the node's caching mirror when it is available
+        registry = ensure_registry()
+        if registry is not None:
+            install_flags += f" --registry {registry} --prefer-offline --no-audit --no-fund"
+        return install_flags
+
+    def install_from_lockfile(resolution) -> bool:
+        """`npm ci` from a cached resolution with the flags that worked before, False if it fails"""
+        original_package_json = (cwd / "package.json").read_text(encoding="utf-8")
+        lockfile_cache.apply(resolution, project_path)
+        cmd = " ".join(["npm ci", get_install_flags()] + resolution["flags"])
+        with span("install_ci", recoverable=True, command=cmd) as record:
             try:
-                # print(f"  ▶ Attempt {idx}: {cmd}")
-                subprocess.run(cmd, shell=True, cwd=cwd, check=True, timeout=timeout) # cwd = project_path
-                # print("  ✅ Success\n")
-                break                       # success → next shell_action
-            except subprocess.TimeoutExpired:  # timeout expired
-                print(f"  ⏰ Attempt {cmd} timed out after {timeout} seconds")
-                continue  
-            except subprocess.CalledProcessError as e:
-                # print(f"  ⚠️  Attempt {idx} failed (exit {e.returncode})")
-                continue
-        else:
-            # all attempts failed
-            # print(f"  ❌ Giving up on {raw_cmd}\n")
-            raise
+                run_limited(cmd, cwd=cwd, timeout=timeout)
+                return True
+            except (subprocess.TimeoutExpired, subprocess.CalledProcessError) as e:
+                record["failure"] = "install_timeout" if isinstance(e, subprocess.TimeoutExpired) else "install_failed"
+        # leave the project as the model wrote it for the regular install
+        (cwd / "package.json").write_text(original_package_json, encoding="utf-8")
+        (cwd / lockfile_cache.LOCKFILE).unlink(missing_ok=True)
+        shutil.rmtree(cwd / "node_modules", ignore_errors=True)
+        return False
+
+    def install_dependencies():
+        """Walk the retry ladder for every shell action, return the extra flags that were needed"""
+        install_flags = get_install_flags()
+        used_flags = []
+
+        for raw_cmd in commands["shell_actions"]:
+            raw_cmd = remove_npm_run_dev(raw_cmd)
+            base_cmd = f"npm install {install_flags} " + raw_cmd.replace("npm install", "").strip()
+            # Build the three attempts
+            attempts = [
+                (None, base_cmd),
+                ("--force", _add_flag(base_cmd, "--force")),
+                ("--legacy-peer-deps", _add_flag(base_cmd, "--legacy-peer-deps")),
+            ]
+
+            for idx, (flag, cmd) in enumerate(attempts, start=1):
+                with span("install_attempt", recoverable=True, attempt=idx, command=cmd) as record:
+                    try:
+                        # print(f"  ▶ Attempt {idx}: {cmd}")
+                        run_limited(cmd, cwd=cwd, timeout=timeout) # cwd = project_path, under the project's limits
+                        # print("  ✅ Success\n")
+                        if flag is not None and flag not in used_flags:
+                            used_flags.append(flag)
+                        break                       # success → next shell_action
+                    except subprocess.TimeoutExpired:  # timeout expired
+                        print(f"  ⏰ Attempt {cmd} timed out after {timeout} seconds")
+                        record["failure"] = "install_timeout"
+                        continue  
+                    except subprocess.CalledProcessError as e:
+                        record["failure"] = "install_failed"
+                        record["exit_code"] = e.returncode
+                        # print(f"  ⚠️  Attempt {idx} failed (exit {e.returncode})")
+                        continue
+            else:
+                # all attempts failed
+                # print(f"  ❌ Giving up on {raw_cmd}\n")
+                raise RenderFailure("install_failed", f"all install attempts failed for: {raw_cmd}")
+        return used_flags
+
+    def setup_commands():
+        """The parts of the shell actions that are neither installs nor server starts, e.g. `npx tailwindcss init -p`"""
+        parts = []
+        for raw_cmd in commands["shell_actions"]:
+            for part in remove_npm_run_dev(raw_cmd).split("&&"):
+                tokens = part.split()
+                if tokens and not (len(tokens) >= 2 and tokens[0] == "npm" and tokens[1] in ("install", "i", "add", "ci")):
+                    parts.append(part.strip())
+        return parts
+
+    def run_setup_commands():
+        """Skipped installs (store hit, npm ci) still run the rest of the shell actions, as a full install does"""
+        for cmd in setup_commands():
+            with span("setup_command", command=cmd):
+                try:
+                    run_limited(cmd, cwd=cwd, timeout=timeout)
+                except (subprocess.TimeoutExpired, subprocess.CalledProcessError):
+                    raise RenderFailure("install_failed", f"shell action failed: {cmd}")
+
+    cwd = Path(project_path)
+
+    # reuse an installed node_modules tree of the same dependency set from the node-wide store
+    store_key = node_modules_store.dependency_key(project_path, commands["shell_actions"])
+    with span("node_modules_link") as record:
+        linked = record["hit"] = node_modules_store.link_into(store_key, project_path, count_miss=False)
+    if linked:
+        run_setup_commands()
+        return
+
+    # concurrent installs of the same dependency set wait here for the first one to publish it
+    with node_modules_store.key_lock(store_key):
+        if node_modules_store.link_into(store_key, project_path):
+            run_setup_commands()
+            return
+        if os.path.exists(cwd / "node_modules"):
+            shutil.rmtree(cwd / "node_modules") 
+        # a dependency set resolved before installs from its lockfile, unless the project ships its own
+        lock_key = lockfile_cache.lockfile_key(project_path, commands["shell_actions"])
+        resolution = None
+        if not (cwd / lockfile_cache.LOCKFILE).exists():
+            resolution = lockfile_cache.lookup(lock_key)
+        if resolution is not None and install_from_lockfile(resolution):
+            run_setup_commands()
+            node_modules_store.populate(store_key, project_path)
+            return
+        if resolution is not None:
+            lockfile_cache.invalidate(lock_key)
+        used_flags = install_dependencies()
+        lockfile_cache.record(lock_key, project_path, used_flags)
+        node_modules_store.populate(store_key, project_path)
 
 def update_vite_config_port(project_path: str):
     """
@@ -205,30 +301,15 @@ def generate_ecosystem_config(project_path, commands, port):
     return ecosystem_path, project_name
 
 
-def start_pm2(project_path, commands, used_ports, port_lock):
+def start_pm2(project_path, commands):
     def run_command(cmd):
         kwargs = dict(shell=True)
         if sys.platform == "win32":
             kwargs["creationflags"] = subprocess.CREATE_NO_WINDOW
         subprocess.run(cmd, **kwargs)
-    # assign a free port to the project
-    def find_free_port():
-        base_port = 30000 + RANK * 5000  
-        with port_lock:
-            for offset in range(5000):
-                port = base_port + offset
-                if port in used_ports:
-                    continue
-                try:
-                    with socket.socket() as s:
-                        time.sleep(RANK * 0.1)  # wait for a while to avoid port conflict
-                        s.bind(("", port))
-                    used_ports.add(port)
-                    return port
-                except OSError:
-                    continue
-        raise RuntimeError("No free port in range!")
-    port = find_free_port()
+    # lease a free port from the node-wide allocator, owned by this project until cleanup
+    project_name = os.path.basename(os.path.normpath(project_path))
+    port = get_port_allocator().allocate(owner=project_name)
 
     ecosystem_path, project_name = generate_ecosystem_config(project_path, commands, port)
     # update vite.config.js to use the assigned port
@@ -248,37 +329,176 @@ def start_pm2(project_path, commands, used_ports, port_lock):
     return project_name
 
 
-def detect_ports_from_pm2_logs(project_path, project_name):
-    # print(f"🔍 Detecting ports from PM2 logs at {project_path}...")
-    
-    port_pattern = re.compile(r"http[s]?://(?:localhost|127\.0\.0\.1):(\d+)", re.IGNORECASE)
-    ansi_escape = re.compile(r'\x1B\[[0-?]*[ -/]*[@-~]')    
+def start_supervised(project_path, commands):
+    """Start the project's dev server as a process group of this worker instead of through pm2"""
+    project_name = os.path.basename(os.path.normpath(project_path))
+    port = get_port_allocator().allocate(owner=project_name)
+    update_vite_config_port(project_path)
+    for log_file in ("out.log", "err.log"):
+        if os.path.exists(os.path.join(project_path, log_file)):
+            os.remove(os.path.join(project_path, log_file))
+    get_supervisor().start(
+        project_name, commands["last_start_action"], cwd=str(project_path),
+        env={"PORT": str(port), "NODE_ENV": "production"},
+        limits=limits_for(project_path), max_seconds=SERVE_WALL_LIMIT,
+    )
+    return project_name
 
-    DETECTION_TIMEOUT = 30  # 20 seconds
-    start_time = time.time()
-    last_port = None
-    while time.time() - start_time < DETECTION_TIMEOUT:
-        log_file = os.path.join(project_path, f"out.log")
-        if not os.path.exists(log_file):
-            continue
 
-        with open(log_file, "r", encoding="utf-8", errors="ignore") as f:
-            content = f.read()
-            content = ansi_escape.sub('', content).strip()
-            match = port_pattern.findall(content) # search(content)
-            if match:
-                port = int(match[-1]) # int(match.group(1))
-                # print(f"✅ {project_name} is running on port {port}")
-                return port
+def stop_project_server(project_name):
+    """Stop a project's dev server, whichever launcher started it"""
+    if LAUNCHER == "pm2":
+        subprocess.run(
+            f"pm2 delete {project_name} || true",
+            shell=True,
+            check=False,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+    else:
+        get_supervisor().stop(project_name)
 
 
-def start_services(project_path, commands, used_ports, port_lock):
-    # step 1: run npm install command
-    run_npm_install(project_path, commands)
-    
-    # step 2: run npm start command with unique port detection
-    project_name = start_pm2(project_path, commands, used_ports, port_lock)
-    port = detect_ports_from_pm2_logs(project_path, project_name)
+PORT_PATTERN = re.compile(r"http[s]?://(?:localhost|127\.0\.0\.1):(\d+)", re.IGNORECASE)
+READINESS_PROBE = os.environ.get("READINESS_PROBE", "http")  # http | tcp
+readiness_log = os.environ.get("READINESS_LOG", "")
+
+_readiness_lock = threading.Lock()
+_readiness_stats = {"ready": 0, "timeouts": 0, "latencies": deque(maxlen=10000)}
+
+STATUS_LINE = re.compile(rb"^HTTP/\d(?:\.\d)? (\d{3})")
+
+def probe_port(port, mode=READINESS_PROBE, timeout=0.5):
+    """
+    True once something accepts connections on the port and, in http mode, answers GET / with a
+    status below 500. Redirects and 404s count: apps with a custom base or without a root route are up.
+    """
+    try:
+        with socket.create_connection(("localhost", port), timeout=timeout) as conn:
+            if mode != "http":
+                return True
+            conn.settimeout(timeout)
+            conn.sendall(f"GET / HTTP/1.1\r\nHost: localhost:{port}\r\nConnection: close\r\n\r\n".encode())
+            status_line = conn.recv(64).split(b"\r\n", 1)[0]
+            status = STATUS_LINE.match(status_line)
+            return status is not None and int(status.group(1)) < 500
+    except OSError:
+        return False
+
+def record_readiness(project_name, port, latency, timed_out):
+    """Keep per-process readiness counters and optionally append one JSON line per project"""
+    with _readiness_lock:
+        if timed_out:
+            _readiness_stats["timeouts"] += 1
+        else:
+            _readiness_stats["ready"] += 1
+            _readiness_stats["latencies"].append(latency)
+    if readiness_log:
+        entry = {"project": project_name, "port": port, "latency": round(latency, 3), "timed_out": timed_out, "rank": RANK}
+        with open(readiness_log, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+def readiness_stats():
+    with _readiness_lock:
+        latencies = sorted(_readiness_stats["latencies"])
+        stats = {"ready": _readiness_stats["ready"], "timeouts": _readiness_stats["timeouts"]}
+    if latencies:
+        stats["p50"] = latencies[len(latencies) // 2]
+        stats["p95"] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    return stats
+
+def detect_ports_from_pm2_logs(project_path, project_name, timeout=30, is_running=None, log_gate=None):
+    """
+    Tail out.log incrementally until the dev server announces its URL, then confirm the
+    port actually serves before returning it. Polls with a short backoff instead of spinning.
+    Returns None if the project is not ready within `timeout` seconds, or as soon as
+    `is_running()` reports that the server has exited. A `log_gate` (BuildLogGate) raises
+    RenderFailure as soon as a fatal compile error shows up in the logs.
+    """
+    # print(f"🔍 Detecting ports from PM2 logs at {project_path}...")
+    tail = LogTail(os.path.join(project_path, "out.log"))
+    start_time = time.time()
+    last_port = None
+    interval = 0.02
+    while time.time() - start_time < timeout:
+        for line in tail.read_new_lines():
+            match = PORT_PATTERN.findall(line)
+            if match:
+                last_port = int(match[-1])
+        if log_gate is not None:
+            log_gate.raise_if_failed()
+        if last_port is not None and probe_port(last_port):
+            # print(f"✅ {project_name} is running on port {last_port}")
+            record_readiness(project_name, last_port, time.time() - start_time, timed_out=False)
+            return last_port
+        if is_running is not None and not is_running():
+            break
+        time.sleep(interval)
+        interval = min(interval * 1.5, 0.25)
+    record_readiness(project_name, last_port, time.time() - start_time, timed_out=True)
+    return None
+
+
+def build_static_site(project_path, project_name, timeout=300):
+    """
+    Run a one-shot production build into dist/ with asset URLs under `/<project_name>/`,
+    the mount prefix used by the shared static server.
+    """
+    dist_path = Path(project_path) / "dist"
+    cmd = f"npx vite build --base=/{project_name}/ --outDir dist --emptyOutDir"
+    out_log_file = os.path.join(project_path, "out.log")
+    err_log_file = os.path.join(project_path, "err.log")
+    with open(out_log_file, "w") as out_f, open(err_log_file, "w") as err_f:
+        run_limited(cmd, cwd=project_path, timeout=timeout, stdout=out_f, stderr=err_f)
+    index_html = dist_path / "index.html"
+    if not index_html.exists():
+        raise FileNotFoundError(f"vite build produced no index.html in {dist_path}")
+    inject_history_shim(index_html, project_name)
+    return dist_path
+
+
+def service_url(port, project_name):
+    """URL of a started project, static builds live under their mount prefix on the shared server"""
+    if SERVE_MODE == "static":
+        return f"http://localhost:{port}/{project_name}/"
+    return f"http://localhost:{port}/"
+
+
+def serve_project(project_path, commands):
+    """Start an installed project and return its (port, project_name)"""
+    if SERVE_MODE == "static":
+        # build once and mount dist/ on the worker's static server, no pm2 or per-project port
+        project_name = os.path.basename(os.path.normpath(project_path))
+        with span("static_build", failure="build_failed"):
+            try:
+                dist_path = build_static_site(project_path, project_name)
+            except subprocess.CalledProcessError:
+                BuildLogGate(project_path).raise_if_failed()  # classify the failure from the build log
+                raise
+        server = get_static_server()
+        server.mount(project_name, dist_path)
+        port = server.port
+    else:
+        # run npm start command with unique port detection
+        is_running = None
+        if LAUNCHER == "pm2":
+            with span("pm2_start", failure="start_failed"):
+                project_name = start_pm2(project_path, commands)
+        else:
+            with span("server_start", failure="start_failed"):
+                project_name = start_supervised(project_path, commands)
+            is_running = lambda: get_supervisor().is_running(project_name)
+        log_gate = BuildLogGate(project_path)
+        with span("port_detect"):
+            port = detect_ports_from_pm2_logs(project_path, project_name, is_running=is_running, log_gate=log_gate)
+            if port is None:
+                if is_running is not None and not is_running():
+                    failure_class = get_supervisor().exit_reason(project_name) or "server_exited"
+                    raise RenderFailure(failure_class, f"{project_name} exited before serving")
+                raise RenderFailure("port_timeout", f"{project_name} did not serve within the timeout")
+        with span("build_log_gate"):
+            # fail before the browser launches if Vite cannot compile the entry modules
+            log_gate.settle(service_url(port, project_name))
 
     output_path = os.path.join(project_path, "services.json")
     with open(output_path, "w") as f:
@@ -286,3 +506,11 @@ def start_services(project_path, commands, used_ports, port_lock):
     # print(f"📄 Saved service ports to {output_path}")
 
     return port, project_name
+
+
+def start_services(project_path, commands):
+    # step 1: run npm install command
+    run_npm_install(project_path, commands)
+    
+    # step 2: start the project (pm2 dev server or static build)
+    return serve_project(project_path, commands)
@@ -1,7 +1,6 @@
 import math
 import os
 import sys
-import time
 from pathlib import Path
 
 from selenium import webdriver
@@ -10,9 +9,13 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 import tempfile
 
+from .browser_pool import get_browser_pool
+from .page_readiness import READINESS_MODE, capture_deadline, install_readiness_hooks, settle
+
 
 chrome_path = os.environ.get("CHROME", "./chrome/chrome-linux64/chrome")
 chrome_driver_path = os.environ.get("CHROME_DRIVER", "./chrome/chromedriver-linux64/chromedriver")
+BROWSER_POOL_ENABLED = os.environ.get("BROWSER_POOL_ENABLED", "1") == "1"
 
 def make_driver(width: int = 1024, height: int = 768, user_data_dir: str = "chrome_data") -> webdriver.Chrome:
     """Create a headless Chrome WebDriver with a fixed viewport."""
@@ -40,23 +43,43 @@ def capture_scroll_screenshots(url: str,
                                viewport_height: int = 768) -> None:
     """Scroll the page, saving at most `max_shots` screenshots."""
     Path(out_dir).mkdir(parents=True, exist_ok=True)
+    if BROWSER_POOL_ENABLED:
+        # borrow an isolated context from the worker's long-lived browsers
+        with get_browser_pool().page(height=viewport_height) as driver:
+            return _capture_with_driver(driver, url, out_dir, max_shots, pause, viewport_height)
+
     driver = make_driver(height=viewport_height, user_data_dir=user_data_dir)
     try:
+        return _capture_with_driver(driver, url, out_dir, max_shots, pause, viewport_height)
+    finally:
+        driver.quit()
+
+
+def _capture_with_driver(driver: webdriver.Chrome,
+                         url: str,
+                         out_dir: str,
+                         max_shots: int,
+                         pause: float,
+                         viewport_height: int):
+    try:
+        if READINESS_MODE == "events":
+            install_readiness_hooks(driver)
         driver.get(url)
     except Exception as e:
         # print(f"Error loading page: {e}")
-        driver.quit()
         return
 
-    # Give the page a moment to settle.
-    time.sleep(pause)
+    # Wait until the page settles (network idle, DOM quiet, fonts loaded) or the hard cap,
+    # which is shared by all screenshots of the page.
+    deadline = capture_deadline()
+    settle(driver, pause, deadline)
 
     total_height = driver.execute_script("return document.body.scrollHeight")
     n_required   = math.ceil(total_height / viewport_height) 
     n_to_take    = min(max_shots, max(n_required, 1)) 
 
     for idx in range(n_to_take):
-        time.sleep(pause)  # wait for lazy‑loaded images, JS, etc.
+        settle(driver, pause, deadline)  # wait for lazy‑loaded images, JS, etc.
         
         # File names: shot_1.png, shot_2.png, …
         fname = os.path.join(out_dir, f"shot_{idx + 1}.png")
@@ -70,6 +93,4 @@ def capture_scroll_screenshots(url: str,
         # Scroll down exactly one viewport height.
         driver.execute_script("window.scrollBy(0, arguments[0]);", viewport_height)
 
-    driver.quit()
     return out_dir
-    
\ No newline at end of file
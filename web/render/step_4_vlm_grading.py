@@ -1,16 +1,12 @@
-import openai
 import base64
 import re
-from openai import OpenAI
-import time
-import os
+import asyncio
+import hashlib
 
+from .graders import get_grader
+from .screenshot_cache import get_screenshot_cache, screenshot_cache_key
+from .vlm_client import VLMRequestError
 
-client = OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY")
-)
-
-model_name = "gpt-4o-2024-11-20"
 appearance_prompt = """
 ## Instruction:
 You are tasked with evaluating the functional design of a webpage that had been constructed based on the following instruction:
@@ -45,11 +41,19 @@ Grade: [0-5]
 ## Your Response:
 """
 
+# returned when the VLM could not be reached, never cached as a real grade
+FALLBACK_OUTPUT = "Grade: 0"
+PROMPT_DIGEST = hashlib.sha256(appearance_prompt.encode('utf-8')).hexdigest()[:12]
+
+def grader_version():
+    """Identifies the grader in cache keys, changes whenever the grading model or the prompt changes"""
+    return f"{get_grader().version}:{PROMPT_DIGEST}"
+
 def encode_image(image_path):
   with open(image_path, "rb") as image_file:
     return base64.b64encode(image_file.read()).decode('utf-8')
 
-def get_score_result(image_paths, instruction):
+def build_messages(image_paths, instruction):
     base64_images = []
     
     for image_path in image_paths:    
@@ -76,27 +80,50 @@ def get_score_result(image_paths, instruction):
                 }
             }
         )
+    return [
+        {"role": "system", "content": "You are a helpful assistant."},
+        {"role": "user", "content": user_content}
+    ]
 
-    retry_count = 0
-    delay = 1
-    max_retries = 3
-    
-    while retry_count < max_retries:
-        try:
-            chat_response = client.chat.completions.create(
-                model=model_name,
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant."},
-                    {"role": "user", "content": user_content}
-                ]
-            )
-            return chat_response.choices[0].message.content
-        except Exception as e:
-            print(f"Request exception, retrying {retry_count + 1}/{max_retries}...")
-            retry_count += 1
-            time.sleep(delay)
-            delay *= 2  
-    return "Grade: 0"
+def cached_score_result(image_paths, instruction):
+    """(output, hashes) from the screenshot cache, output is None on a miss and hashes None if uncacheable"""
+    cache = get_screenshot_cache()
+    if cache is None:
+        return None, None
+    hashes = cache.hashes(image_paths)
+    if hashes is None:
+        return None, None
+    return cache.get(screenshot_cache_key(instruction, grader_version()), hashes), hashes
+
+def store_score_result(instruction, hashes, output):
+    if hashes is not None and output != FALLBACK_OUTPUT:
+        get_screenshot_cache().put(screenshot_cache_key(instruction, grader_version()), hashes, output)
+
+def get_score_result(image_paths, instruction):
+    output, hashes = cached_score_result(image_paths, instruction)
+    if output is not None:
+        return output
+    # the backend (graders.py) handles rate limits and retries
+    try:
+        output = get_grader().complete(build_messages(image_paths, instruction))
+    except VLMRequestError as e:
+        print(e)
+        return FALLBACK_OUTPUT
+    store_score_result(instruction, hashes, output)
+    return output
+
+async def async_get_score_result(image_paths, instruction):
+    """Same as get_score_result, awaited without holding a worker thread"""
+    output, hashes = await asyncio.to_thread(cached_score_result, image_paths, instruction)
+    if output is not None:
+        return output
+    try:
+        output = await get_grader().acomplete(build_messages(image_paths, instruction))
+    except VLMRequestError as e:
+        print(e)
+        return FALLBACK_OUTPUT
+    await asyncio.to_thread(store_score_result, instruction, hashes, output)
+    return output
 
 
 def first_grade_int(text: str) -> int:
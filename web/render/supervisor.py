@@ -0,0 +1,216 @@
+import os
+import time
+import atexit
+import signal
+import asyncio
+import selectors
+import threading
+import subprocess
+from typing import Dict, Optional
+
+
+# "supervisor": project servers are children of this process, "pm2": the global pm2 daemon
+LAUNCHER = os.environ.get("LAUNCHER", "supervisor")
+STOP_GRACE = float(os.environ.get("SUPERVISOR_STOP_GRACE", "2"))
+
+
+class ManagedProcess:
+    def __init__(self, name: str, process: subprocess.Popen, out_path: str, err_path: str,
+                 limits=None, deadline: Optional[float] = None):
+        self.name = name
+        self.process = process
+        self.limits = limits
+        self.deadline = deadline
+        self.limit_hit = None
+        self.err_path = err_path
+        self.pgid = process.pid  # start_new_session makes the child a group leader
+        self.logs = {process.stdout.fileno(): open(out_path, "ab"), process.stderr.fileno(): open(err_path, "ab")}
+        self.open_streams = 2
+        self.exited = threading.Event()
+        self.returncode = None
+
+    def is_running(self) -> bool:
+        if self.process.poll() is not None and self.open_streams == 0:
+            self.returncode = self.process.returncode
+            self.exited.set()
+        return not self.exited.is_set()
+
+
+class ProcessSupervisor:
+    """
+    Runs project start commands in their own session/process group, without pm2.
+
+    `start` returns as soon as the process is spawned. One selector thread copies the stdout and
+    stderr pipes of all processes into each project's out.log/err.log (so readiness detection
+    can tail them as before) and notices exits. `stop` kills the whole process group, which also
+    takes down the dev server that `npm run dev` forks.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.processes: Dict[str, ManagedProcess] = {}
+        self.selector = selectors.DefaultSelector()
+        self.wake_r, self.wake_w = os.pipe()
+        os.set_blocking(self.wake_r, False)
+        self.selector.register(self.wake_r, selectors.EVENT_READ, None)
+        self.thread = threading.Thread(target=self._pump, daemon=True, name="process-supervisor")
+        self.thread.start()
+
+    def start(self, name: str, command: str, cwd: str, env: Optional[dict] = None,
+              out_path: Optional[str] = None, err_path: Optional[str] = None,
+              limits=None, max_seconds: float = 0) -> ManagedProcess:
+        """
+        Spawn `command` for project `name`. `limits` (resource_limits.ProjectLimits) confines the
+        process group, and it is killed after `max_seconds` of wall-clock time if that is > 0.
+        """
+        self.stop(name)
+        if limits is not None:
+            command = limits.wrap(command)
+            env = {**limits.env(), **(env or {})}
+        process = subprocess.Popen(
+            command, shell=True, cwd=cwd, env={**os.environ, **(env or {})},
+            stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            start_new_session=True,
+        )
+        managed = ManagedProcess(
+            name, process,
+            out_path or os.path.join(cwd, "out.log"),
+            err_path or os.path.join(cwd, "err.log"),
+            limits=limits,
+            deadline=time.time() + max_seconds if max_seconds > 0 else None,
+        )
+        with self.lock:
+            self.processes[name] = managed
+            for stream in (process.stdout, process.stderr):
+                os.set_blocking(stream.fileno(), False)
+                self.selector.register(stream, selectors.EVENT_READ, managed)
+        os.write(self.wake_w, b"x")  # pick up the new pipes
+        return managed
+
+    def _close_stream(self, managed: ManagedProcess, stream):
+        self.selector.unregister(stream)
+        managed.logs.pop(stream.fileno()).close()
+        stream.close()
+        managed.open_streams -= 1
+        if managed.open_streams == 0:
+            # both pipes closed: the server and everything it forked with them is gone
+            managed.returncode = managed.process.poll()
+            if managed.returncode is not None:
+                managed.exited.set()
+
+    def _enforce_deadlines(self):
+        now = time.time()
+        with self.lock:
+            expired = [m for m in self.processes.values() if m.deadline is not None and m.deadline < now]
+        for managed in expired:
+            managed.deadline = None
+            managed.limit_hit = "limit_wall_clock"
+            try:
+                os.killpg(managed.pgid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    def _pump(self):
+        while True:
+            self._enforce_deadlines()
+            for key, _ in self.selector.select(timeout=1.0):
+                if key.data is None:
+                    try:
+                        os.read(self.wake_r, 4096)
+                    except BlockingIOError:
+                        pass
+                    continue
+                managed, stream = key.data, key.fileobj
+                with self.lock:
+                    try:
+                        chunk = os.read(stream.fileno(), 65536)
+                    except BlockingIOError:
+                        continue
+                    except OSError:
+                        chunk = b""
+                    if chunk:
+                        log = managed.logs[stream.fileno()]
+                        log.write(chunk)
+                        log.flush()
+                    else:
+                        self._close_stream(managed, stream)
+
+    def exit_reason(self, name: str) -> Optional[str]:
+        """limit_* failure class if the process was stopped by one of its limits"""
+        managed = self.get(name)
+        if managed is None:
+            return None
+        if managed.limit_hit is not None:
+            return managed.limit_hit
+        if managed.limits is not None:
+            return managed.limits.limit_hit(managed.process.poll(), managed.err_path)
+        return None
+
+    def get(self, name: str) -> Optional[ManagedProcess]:
+        with self.lock:
+            return self.processes.get(name)
+
+    def is_running(self, name: str) -> bool:
+        managed = self.get(name)
+        return managed is not None and managed.is_running()
+
+    def stop(self, name: str, grace: float = STOP_GRACE) -> bool:
+        """SIGTERM the process group, SIGKILL it after `grace` seconds. True if something was running."""
+        with self.lock:
+            managed = self.processes.pop(name, None)
+        if managed is None:
+            return False
+        try:
+            os.killpg(managed.pgid, signal.SIGTERM)
+        except ProcessLookupError:
+            return False
+        deadline = time.time() + grace
+        while time.time() < deadline:
+            managed.process.poll()  # reap the leader, a zombie would keep the group alive
+            try:
+                os.killpg(managed.pgid, 0)
+            except ProcessLookupError:
+                break
+            time.sleep(0.05)
+        else:
+            try:
+                os.killpg(managed.pgid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            try:
+                managed.process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                pass
+        return True
+
+    async def wait(self, name: str, timeout: Optional[float] = None) -> Optional[int]:
+        """Await the exit of a process from asyncio code, its return code or None on timeout"""
+        managed = self.get(name)
+        if managed is None:
+            return None
+        loop = asyncio.get_running_loop()
+        if not await loop.run_in_executor(None, managed.exited.wait, timeout):
+            return None
+        return managed.returncode
+
+    async def astop(self, name: str, grace: float = STOP_GRACE) -> bool:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.stop, name, grace)
+
+    def stop_all(self):
+        with self.lock:
+            names = list(self.processes)
+        for name in names:
+            self.stop(name, grace=0.5)
+
+
+_supervisor = None
+_supervisor_lock = threading.Lock()
+
+def get_supervisor() -> ProcessSupervisor:
+    global _supervisor
+    with _supervisor_lock:
+        if _supervisor is None:
+            _supervisor = ProcessSupervisor()
+            atexit.register(_supervisor.stop_all)  # project servers must not outlive the worker
+    return _supervisor
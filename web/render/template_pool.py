@@ -0,0 +1,198 @@
+import os
+import re
+import time
+import atexit
+import uuid
+import fcntl
+import shutil
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Dict, Optional
+
+from . import node_modules_store
+from .step_2_start_service import run_npm_install
+from .system_prompt import WEB_GEN_SYSTEM_PROMPT
+from .workspace import PROJECT_NAME_PATTERN, _pid_alive, project_root
+
+
+# Pool of pre-materialized `vite-react-typescript-starter` projects with dependencies installed
+pool_root = os.environ.get("TEMPLATE_POOL_DIR", os.path.join(project_root, ".template_pool"))
+POOL_ENABLED = os.environ.get("TEMPLATE_POOL_ENABLED", "1") == "1"
+POOL_SIZE = int(os.environ.get("TEMPLATE_POOL_SIZE", "4"))
+
+RANK = int(os.environ.get("RANK", "0"))
+
+
+def load_template_files(prompt: str = WEB_GEN_SYSTEM_PROMPT) -> Dict[str, str]:
+    """Parse the starter template files out of the base template block of the system prompt"""
+    block = re.search(r'```xml\s*(<webArtifact.*?</webArtifact>)\s*```', prompt, re.DOTALL)
+    if not block:
+        return {}
+    files = {}
+    for match in re.finditer(r'<webAction\s+type="file"\s+filePath="([^"]+)"\s*>(.*?)</webAction>', block.group(1), re.DOTALL):
+        files[match.group(1)] = match.group(2).strip()  # same normalization as extract_and_build_project
+    return files
+
+TEMPLATE_FILES = load_template_files()
+
+
+class TemplatePool:
+    """
+    Keeps `size` ready-to-use clones of the starter template for this worker.
+
+    A single node-wide base copy is installed once (through the node_modules store) and each
+    slot is cloned from it by a background thread, so `acquire` is a single directory rename.
+    Source files in a slot are real copies because later steps edit them in place (e.g.
+    vite.config.ts), while node_modules is reflinked/hardlinked from the base.
+    """
+
+    def __init__(self, root: str = pool_root, size: int = POOL_SIZE, files: Dict[str, str] = TEMPLATE_FILES):
+        self.root = Path(root)
+        self.size = size
+        self.files = files
+        self.base = self.root / "base"
+        self.slot_dir = self.root / "slots"
+        self.slot_prefix = f"rank{RANK}_pid{os.getpid()}_"
+        self.ready = deque()
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.failed = False
+        self.closed = False
+
+    def _build_base(self) -> bool:
+        """Install the template once per node, other processes wait on the lock and reuse it"""
+        if (self.base / ".ready").exists():
+            return True
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / "base.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if (self.base / ".ready").exists():
+                    return True
+                staging = self.root / f"base.tmp-{uuid.uuid4().hex}"
+                try:
+                    for file_path, content in self.files.items():
+                        full_path = staging / file_path
+                        full_path.parent.mkdir(parents=True, exist_ok=True)
+                        full_path.write_text(content, encoding="utf-8")
+                    run_npm_install(str(staging), {"shell_actions": ["npm install"], "last_start_action": "npm run dev"})
+                    shutil.rmtree(staging / "npm_cache", ignore_errors=True)
+                    (staging / ".ready").touch()
+                    os.rename(staging, self.base)
+                except Exception as e:
+                    print(f"Failed to build template pool base: {e}")
+                    shutil.rmtree(staging, ignore_errors=True)
+                    return False
+                return True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _make_slot(self) -> Path:
+        slot = self.slot_dir / f"{self.slot_prefix}{uuid.uuid4().hex}"
+        slot.mkdir(parents=True)
+        try:
+            for file_path in self.files:
+                full_path = slot / file_path
+                full_path.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(self.base / file_path, full_path)
+            mode = node_modules_store.clone_tree(self.base / "node_modules", slot / "node_modules")
+            (slot / "node_modules" / node_modules_store.LINK_MODE_MARKER).write_text(mode)
+        except Exception:
+            shutil.rmtree(slot, ignore_errors=True)
+            raise
+        return slot
+
+    def _replenish(self):
+        if not self._build_base():
+            self.failed = True
+            return
+        while not self.closed:
+            while len(self.ready) < self.size and not self.closed:
+                try:
+                    slot = self._make_slot()
+                except Exception as e:
+                    print(f"Failed to clone template pool slot: {e}")
+                    time.sleep(5)
+                    continue
+                with self.lock:
+                    if self.closed:
+                        shutil.rmtree(slot, ignore_errors=True)
+                        break
+                    self.ready.append(slot)
+            self.wakeup.wait()
+            self.wakeup.clear()
+
+    def sweep(self) -> int:
+        """Remove the slots of processes that no longer exist (crashed workers never release theirs)"""
+        if not self.slot_dir.is_dir():
+            return 0
+        swept = 0
+        for slot in self.slot_dir.iterdir():
+            match = PROJECT_NAME_PATTERN.match(slot.name)
+            if match and not _pid_alive(int(match.group(1))):
+                shutil.rmtree(slot, ignore_errors=True)
+                swept += 1
+        return swept
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.sweep()
+                self.thread = threading.Thread(target=self._replenish, name="template-pool", daemon=True)
+                self.thread.start()
+
+    def close(self):
+        """Stop replenishing and delete this process's ready slots"""
+        with self.lock:
+            self.closed = True
+            slots, self.ready = list(self.ready), deque()
+        self.wakeup.set()
+        for slot in slots:
+            shutil.rmtree(slot, ignore_errors=True)
+
+    def acquire(self, project_path) -> bool:
+        """
+        Move a ready template clone to `project_path` (which must be empty or absent).
+        Returns False without blocking if no slot is ready yet, the caller then builds from scratch.
+        """
+        if self.failed or self.closed:
+            return False
+        self.start()
+        with self.lock:
+            slot = self.ready.popleft() if self.ready else None
+        self.wakeup.set()
+        if slot is None:
+            return False
+        project_path = Path(project_path)
+        if not node_modules_store.same_filesystem(slot, project_path.parent):
+            # a rename cannot cross filesystems, so no slot will ever be usable for this workspace
+            print(f"Template pool {self.root} is not on the filesystem of {project_path.parent}, disabling it")
+            self.failed = True
+            self.close()
+            shutil.rmtree(slot, ignore_errors=True)
+            return False
+        try:
+            if project_path.exists():
+                project_path.rmdir()
+            os.rename(slot, project_path)
+        except OSError:
+            shutil.rmtree(slot, ignore_errors=True)
+            project_path.mkdir(parents=True, exist_ok=True)  # the caller builds from scratch in it
+            return False
+        return True
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_template_pool() -> Optional[TemplatePool]:
+    global _pool
+    if not POOL_ENABLED or not TEMPLATE_FILES:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = TemplatePool()
+            atexit.register(_pool.close)  # slots are full project trees, often in /dev/shm
+    return _pool
@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+import contextvars
+import logging.handlers
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+
+# One rotating JSONL file per process; rotation is not safe across processes sharing a file
+trace_file = os.environ.get("RENDER_TRACE_FILE", "./render_traces/trace_rank{rank}_pid{pid}.jsonl")
+TRACE_ENABLED = os.environ.get("RENDER_TRACE_ENABLED", "1") == "1"
+TRACE_MAX_BYTES = int(float(os.environ.get("RENDER_TRACE_MAX_MB", "64")) * 1024 * 1024)
+TRACE_BACKUPS = int(os.environ.get("RENDER_TRACE_BACKUPS", "5"))
+# upper bounds (seconds) of the duration histogram buckets, the last bucket is unbounded
+HISTOGRAM_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+RANK = int(os.environ.get("RANK", "0"))
+
+
+class RenderFailure(Exception):
+    """Raised by a render step to stop the rollout with a known failure class (port_timeout, ...)"""
+
+    def __init__(self, failure_class: str, message: str = ""):
+        super().__init__(message or failure_class)
+        self.failure_class = failure_class
+
+
+_logger = None
+_logger_lock = threading.Lock()
+_listeners = []
+
+def _trace_logger() -> logging.Logger:
+    global _logger
+    with _logger_lock:
+        if _logger is None:
+            path = trace_file.format(rank=RANK, pid=os.getpid())
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(
+                path, maxBytes=TRACE_MAX_BYTES, backupCount=TRACE_BACKUPS, encoding="utf-8"
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger = logging.getLogger(f"web.render.trace.{os.getpid()}")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            logger.addHandler(handler)
+            _logger = logger
+    return _logger
+
+def add_listener(callback: Callable[[dict], None]):
+    """Also hand every span/trace record to `callback` in-process (used by the benchmark harness)"""
+    _listeners.append(callback)
+
+def remove_listener(callback: Callable[[dict], None]):
+    if callback in _listeners:
+        _listeners.remove(callback)
+
+def write_record(record: dict):
+    for callback in list(_listeners):
+        callback(record)
+    if TRACE_ENABLED:
+        _trace_logger().info(json.dumps(record, ensure_ascii=False, default=str))
+
+
+class SpanAggregator:
+    """Duration histograms and failure counts per span name, reset at every training step"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.step = 0
+        self.reset()
+
+    def reset(self):
+        self.spans = {}
+        self.failures = {}
+        self.traces = 0
+
+    def add_span(self, name: str, duration: float, failure: Optional[str]):
+        with self.lock:
+            stats = self.spans.setdefault(
+                name, {"count": 0, "errors": 0, "seconds": 0.0, "buckets": [0] * (len(HISTOGRAM_BUCKETS) + 1)}
+            )
+            stats["count"] += 1
+            stats["seconds"] += duration
+            stats["errors"] += failure is not None
+            bucket = next((i for i, bound in enumerate(HISTOGRAM_BUCKETS) if duration <= bound), len(HISTOGRAM_BUCKETS))
+            stats["buckets"][bucket] += 1
+
+    def add_trace(self, failure: Optional[str]):
+        with self.lock:
+            self.traces += 1
+            key = failure or "ok"
+            self.failures[key] = self.failures.get(key, 0) + 1
+
+    def summary(self, reset: bool = False) -> dict:
+        with self.lock:
+            summary = {
+                "type": "step",
+                "step": self.step,
+                "rank": RANK,
+                "traces": self.traces,
+                "failures": dict(self.failures),
+                "buckets": [str(bound) for bound in HISTOGRAM_BUCKETS] + ["inf"],
+                "spans": {name: dict(stats, buckets=list(stats["buckets"])) for name, stats in self.spans.items()},
+            }
+            if reset:
+                self.step += 1
+                self.reset()
+        return summary
+
+
+_aggregator = SpanAggregator()
+_current_trace = contextvars.ContextVar("render_trace", default=None)
+
+
+class RenderTrace:
+    """Spans of one rollout render. The first non-recoverable failure is the rollout's failure class."""
+
+    def __init__(self, problem_id: str):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.problem_id = str(problem_id)
+        self.start = time.time()
+        self.failure = None
+
+    @contextmanager
+    def span(self, name: str, failure: Optional[str] = None, recoverable: bool = False, **attrs):
+        """
+        Time a block. The yielded dict is written with the span, so the block can add attributes
+        or set record["failure"] without raising. Exceptions are tagged with a failure class
+        (RenderFailure's own, else `failure`, else "exception") and re-raised. Failures of
+        `recoverable` spans (e.g. an install attempt followed by a retry) are counted but do not
+        become the rollout's failure class.
+        """
+        record = {"type": "span", "trace": self.trace_id, "problem_id": self.problem_id, "rank": RANK,
+                  "span": name, "failure": None, **attrs}
+        start = time.time()
+        token = _current_trace.set(self)
+        try:
+            yield record
+        except Exception as e:
+            if getattr(e, "failure_class", None) is None:
+                try:
+                    e.failure_class = failure or "exception"
+                except AttributeError:
+                    pass
+            record["failure"] = getattr(e, "failure_class", None) or failure or "exception"
+            record["error"] = str(e)[:500]
+            raise
+        finally:
+            _current_trace.reset(token)
+            duration = time.time() - start
+            record["start"] = start
+            record["duration"] = round(duration, 4)
+            record["outcome"] = "ok" if record["failure"] is None else "error"
+            if record["failure"] is not None and self.failure is None and not recoverable:
+                self.failure = record["failure"]
+            _aggregator.add_span(name, duration, record["failure"])
+            write_record(record)
+
+    def finish(self, score: float, **attrs):
+        _aggregator.add_trace(self.failure)
+        write_record({
+            "type": "trace", "trace": self.trace_id, "problem_id": self.problem_id, "rank": RANK,
+            "start": self.start, "duration": round(time.time() - self.start, 4),
+            "failure": self.failure, "score": score, **attrs,
+        })
+
+
+@contextmanager
+def span(name: str, failure: Optional[str] = None, recoverable: bool = False, **attrs):
+    """Child span of the trace active in this thread, a plain no-op block outside of a traced render"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield {}
+        return
+    with trace.span(name, failure=failure, recoverable=recoverable, **attrs) as record:
+        yield record
+
+def step_summary(reset: bool = False) -> Dict[str, dict]:
+    return _aggregator.summary(reset=reset)
+
+def flush_step_summary() -> dict:
+    """Write the per-step histograms to the trace file and start a new step"""
+    summary = step_summary(reset=True)
+    if summary["traces"]:
+        write_record(summary)
+        print(f"render trace step {summary['step']}: {summary['traces']} renders, failures {summary['failures']}")
+    return summary
@@ -0,0 +1,219 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from typing import List, Optional
+
+import httpx
+import openai
+from openai import AsyncOpenAI
+
+
+# Limits of the VLM API quota, 0 = unlimited
+VLM_RPM_LIMIT = int(os.environ.get("VLM_RPM_LIMIT", "0"))
+VLM_TPM_LIMIT = int(os.environ.get("VLM_TPM_LIMIT", "0"))
+VLM_MAX_IN_FLIGHT = int(os.environ.get("VLM_MAX_IN_FLIGHT", "64"))
+VLM_MAX_RETRIES = int(os.environ.get("VLM_MAX_RETRIES", "5"))
+VLM_TIMEOUT = float(os.environ.get("VLM_TIMEOUT", "120"))
+VLM_MAX_BACKOFF = float(os.environ.get("VLM_MAX_BACKOFF", "60"))
+# token cost reserved per request before the real usage is known (prompt text is estimated separately)
+VLM_IMAGE_TOKENS = int(os.environ.get("VLM_IMAGE_TOKENS", "765"))  # gpt-4o, one 1024x768 high-detail image
+VLM_EXPECTED_OUTPUT_TOKENS = int(os.environ.get("VLM_EXPECTED_OUTPUT_TOKENS", "600"))
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+LATENCY_WINDOW = 10000
+
+
+class VLMRequestError(Exception):
+    pass
+
+
+class TokenBucket:
+    """
+    Refills `limit` units per minute up to a burst of `limit`. `acquire` waits until the
+    amount is available; the bucket may go negative through `adjust` when a request used
+    more than was reserved, later requests then wait for the debt to refill.
+    """
+
+    def __init__(self, limit_per_minute: int):
+        self.limit = limit_per_minute
+        self.rate = limit_per_minute / 60.0
+        self.tokens = float(limit_per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.limit, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float):
+        if self.limit <= 0:
+            return
+        amount = min(amount, self.limit)  # a single oversized request still has to go through eventually
+        while True:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+            await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def adjust(self, amount: float):
+        if self.limit > 0:
+            self._refill()
+            self.tokens -= amount
+
+
+def estimate_tokens(messages: List[dict]) -> int:
+    """Rough prompt size: ~4 characters per text token plus a fixed cost per image"""
+    tokens = 0
+    for message in messages:
+        content = message["content"]
+        parts = content if isinstance(content, list) else [{"type": "text", "text": content}]
+        for part in parts:
+            if part.get("type") == "text":
+                tokens += len(part["text"]) // 4
+            else:
+                tokens += VLM_IMAGE_TOKENS
+    return tokens + VLM_EXPECTED_OUTPUT_TOKENS
+
+def retry_after(e: Exception) -> Optional[float]:
+    """Delay the server asked for (retry-after-ms / retry-after headers), if any"""
+    response = getattr(e, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        pass  # an HTTP date, fall back to exponential backoff
+    return None
+
+def is_retryable(e: Exception) -> bool:
+    if isinstance(e, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    return isinstance(e, openai.APIStatusError) and e.status_code in RETRYABLE_STATUS
+
+
+class VLMClient:
+    """
+    One AsyncOpenAI client (and connection pool) per grading endpoint, driven by its own event loop thread.
+
+    Callers from worker threads block on `complete`, asyncio callers await `acomplete`; either way
+    the request waits on the RPM/TPM token buckets and the in-flight semaphore inside the loop, so
+    a backed-off request holds no thread. Retries honor retry-after and pause the whole client,
+    since a 429 means the shared quota is exhausted, not just this request.
+    """
+
+    def __init__(self, base_url: Optional[str] = None, api_key: Optional[str] = None,
+                 rpm_limit: int = VLM_RPM_LIMIT, tpm_limit: int = VLM_TPM_LIMIT,
+                 max_in_flight: int = VLM_MAX_IN_FLIGHT, max_retries: int = VLM_MAX_RETRIES):
+        self.base_url = base_url or os.getenv("OPENAI_BASE_URL")
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_retries = max_retries
+        self.requests = TokenBucket(rpm_limit)
+        self.tokens = TokenBucket(tpm_limit)
+        self.paused_until = 0.0  # loop time before which nothing is sent, set by 429 responses
+        self.stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "succeeded": 0, "failed": 0, "retries": 0, "rate_limited": 0,
+                      "prompt_tokens": 0, "completion_tokens": 0, "in_flight": 0}
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.started = threading.Event()
+        self.setup_error = None
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run_loop, daemon=True, name="vlm-client")
+        self.thread.start()
+        self.started.wait()
+        if self.setup_error is not None:
+            # e.g. no API key: fail here instead of leaving callers blocked on a loop that never ran
+            self.thread.join()
+            raise self.setup_error
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            # created inside the loop, both are bound to it
+            self.semaphore = asyncio.Semaphore(self.max_in_flight)
+            self.client = AsyncOpenAI(
+                base_url=self.base_url, api_key=self.api_key, timeout=VLM_TIMEOUT, max_retries=0,
+                http_client=httpx.AsyncClient(limits=httpx.Limits(max_connections=self.max_in_flight,
+                                                                  max_keepalive_connections=self.max_in_flight)),
+            )
+        except Exception as e:
+            self.setup_error = e
+            self.loop.close()
+            return
+        finally:
+            self.started.set()
+        self.loop.run_forever()
+
+    def _bump(self, **counters):
+        with self.stats_lock:
+            for name, value in counters.items():
+                self.stats[name] += value
+
+    async def _complete(self, model: str, messages: List[dict], **kwargs) -> str:
+        reserved = estimate_tokens(messages)
+        for attempt in range(self.max_retries + 1):
+            while self.loop.time() < self.paused_until:
+                await asyncio.sleep(self.paused_until - self.loop.time())
+            await self.requests.acquire(1)
+            await self.tokens.acquire(reserved)
+            async with self.semaphore:
+                self._bump(requests=1, in_flight=1)
+                start = time.time()
+                try:
+                    response = await self.client.chat.completions.create(model=model, messages=messages, **kwargs)
+                except Exception as e:
+                    error = e
+                else:
+                    error = None
+                finally:
+                    self._bump(in_flight=-1)
+            if error is None:
+                usage = response.usage
+                used = (usage.prompt_tokens + usage.completion_tokens) if usage is not None else reserved
+                self.tokens.adjust(used - reserved)
+                with self.stats_lock:
+                    self.latencies.append(time.time() - start)
+                    self.stats["succeeded"] += 1
+                    if usage is not None:
+                        self.stats["prompt_tokens"] += usage.prompt_tokens
+                        self.stats["completion_tokens"] += usage.completion_tokens
+                return response.choices[0].message.content
+            if not is_retryable(error) or attempt == self.max_retries:
+                self._bump(failed=1)
+                raise VLMRequestError(f"VLM request failed after {attempt + 1} attempts: {error}") from error
+            delay = retry_after(error)
+            if isinstance(error, openai.APIStatusError) and error.status_code == 429:
+                self._bump(rate_limited=1)
+                pause = delay if delay is not None else 2 ** attempt
+                self.paused_until = max(self.paused_until, self.loop.time() + min(pause, VLM_MAX_BACKOFF))
+            if delay is None:
+                delay = min(VLM_MAX_BACKOFF, 2 ** attempt) * (0.5 + random.random())
+            self._bump(retries=1)
+            print(f"VLM request failed ({error.__class__.__name__}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+            await asyncio.sleep(min(delay, VLM_MAX_BACKOFF))
+
+    def complete(self, model: str, messages: List[dict], **kwargs) -> str:
+        """Blocking chat completion, raises VLMRequestError once retries are exhausted"""
+        return asyncio.run_coroutine_threadsafe(self._complete(model, messages, **kwargs), self.loop).result()
+
+    async def acomplete(self, model: str, messages: List[dict], **kwargs) -> str:
+        """Same as `complete` for coroutines running on any other event loop"""
+        future = asyncio.run_coroutine_threadsafe(self._complete(model, messages, **kwargs), self.loop)
+        return await asyncio.wrap_future(future)
+
+    def vlm_stats(self) -> dict:
+        with self.stats_lock:
+            stats = dict(self.stats)
+            latencies = sorted(self.latencies)
+        if latencies:
+            stats["latency_p50"] = latencies[len(latencies) // 2]
+            stats["latency_p95"] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        return stats
@@ -0,0 +1,229 @@
+import os
+import re
+import queue
+import atexit
+import shutil
+import signal
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from . import node_modules_store
+from .port_allocator import get_port_allocator
+from .trace import RenderFailure
+
+
+def _default_root() -> str:
+    """RAM-backed /dev/shm when available, the old on-disk ./projects otherwise"""
+    if os.environ.get("WORKSPACE_TMPFS", "1") == "1" and os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return "/dev/shm/webgen_projects"
+    return "./projects"
+
+# Rollout projects (sources, node_modules, logs, Chrome data, screenshots) live here
+project_root = os.environ.get("PROJECT_ROOT", _default_root())
+# used for new projects while the primary root has less than WORKSPACE_MIN_FREE_MB left
+fallback_root = os.environ.get("WORKSPACE_FALLBACK_ROOT", "./projects")
+MIN_FREE_BYTES = int(float(os.environ.get("WORKSPACE_MIN_FREE_MB", "2048")) * 1024 * 1024)
+# per-project limit; node_modules counts unless its files are shared with the store/template pool
+PROJECT_QUOTA_BYTES = int(float(os.environ.get("WORKSPACE_PROJECT_QUOTA_MB", "2048")) * 1024 * 1024)
+REAPER_THREADS = int(os.environ.get("WORKSPACE_REAPER_THREADS", "2"))
+
+REAPING_DIR = ".reaping"
+PROJECT_NAME_PATTERN = re.compile(r'^rank\d+_pid(\d+)_')
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _node_modules_shared(node_modules: str) -> bool:
+    """A reflinked node_modules shares its blocks with the store although every file has one link"""
+    try:
+        with open(os.path.join(node_modules, node_modules_store.LINK_MODE_MARKER), "r") as f:
+            return f.read().strip() == "reflink"
+    except OSError:
+        return False
+
+def project_size(project_path) -> int:
+    """
+    Bytes a project occupies on its own. Files in node_modules with more than one link are
+    hardlinks into the store or template pool and cost nothing extra, real copies are counted.
+    """
+    total = 0
+    for dirpath, dirnames, filenames in os.walk(project_path):
+        if "node_modules" in dirnames and _node_modules_shared(os.path.join(dirpath, "node_modules")):
+            dirnames.remove("node_modules")
+        in_node_modules = f"{os.sep}node_modules" in dirpath[len(str(project_path)):]
+        for name in filenames:
+            try:
+                st = os.lstat(os.path.join(dirpath, name))
+            except OSError:
+                continue
+            if in_node_modules and st.st_nlink > 1:
+                continue
+            total += st.st_size
+    return total
+
+def kill_processes_in(path) -> int:
+    """Kill processes whose working directory is inside `path` (servers left behind by a dead rank)"""
+    path = str(Path(path).resolve())
+    killed = 0
+    for pid_dir in Path("/proc").glob("[0-9]*"):
+        try:
+            cwd = os.readlink(pid_dir / "cwd")
+        except OSError:
+            continue
+        if cwd == path or cwd.startswith(path + os.sep):
+            try:
+                os.kill(int(pid_dir.name), signal.SIGKILL)
+                killed += 1
+            except OSError:
+                pass
+    return killed
+
+
+class Workspace:
+    """
+    Creates rollout project directories and removes them off the hot path.
+
+    `reap` renames a project into `<root>/.reaping/` (a cheap same-filesystem rename, so the
+    caller returns immediately) and hands process teardown and the recursive delete to
+    background threads. `sweep` removes what crashed processes left behind.
+    """
+
+    def __init__(self, root: str = project_root, fallback: str = fallback_root, reaper_threads: int = REAPER_THREADS):
+        self.root = Path(root)
+        self.fallback = Path(fallback)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.jobs = queue.Queue()
+        self.stats_lock = threading.Lock()
+        self.stats = {"created": 0, "fallback": 0, "reaped": 0, "swept": 0, "quota_exceeded": 0}
+        self.threads = [
+            threading.Thread(target=self._reap_loop, daemon=True, name=f"workspace-reaper-{i}")
+            for i in range(max(1, reaper_threads))
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def _bump(self, counter: str):
+        with self.stats_lock:
+            self.stats[counter] += 1
+
+    def create_project_dir(self, prefix: str) -> str:
+        root = self.root
+        try:
+            if shutil.disk_usage(root).free < MIN_FREE_BYTES:
+                root = self.fallback
+                self._bump("fallback")
+        except OSError:
+            pass
+        root.mkdir(parents=True, exist_ok=True)
+        self._bump("created")
+        return tempfile.mkdtemp(prefix=prefix, dir=root)
+
+    def check_quota(self, project_path, quota: int = PROJECT_QUOTA_BYTES):
+        """Stop a project that writes more than its quota (logs, build output, ...)"""
+        if quota <= 0 or not project_path:
+            return
+        size = project_size(project_path)
+        if size > quota:
+            self._bump("quota_exceeded")
+            raise RenderFailure("workspace_quota", f"{project_path} uses {size >> 20} MB, quota {quota >> 20} MB")
+
+    def reap(self, project_path, teardown: Optional[Callable[[], None]] = None, extra_paths: List = ()):
+        """Queue a project for teardown and deletion"""
+        project_path = Path(project_path)
+        trash = project_path.parent / REAPING_DIR / project_path.name
+        try:
+            trash.parent.mkdir(exist_ok=True)
+            os.rename(project_path, trash)
+        except OSError:
+            trash = project_path  # already gone, or rename failed: delete in place
+        self.jobs.put((trash, teardown, list(extra_paths)))
+
+    def _reap_loop(self):
+        while True:
+            trash, teardown, extra_paths = self.jobs.get()
+            try:
+                if teardown is not None:
+                    teardown()
+                shutil.rmtree(trash, ignore_errors=True)
+                for path in extra_paths:
+                    Path(path).unlink(missing_ok=True)
+                self._bump("reaped")
+            except Exception as e:
+                print(f"Workspace reaper failed on {trash}: {e}")
+            finally:
+                self.jobs.task_done()
+
+    def drain(self):
+        """Wait for queued deletions, e.g. before the process exits"""
+        self.jobs.join()
+
+    def sweep(self) -> int:
+        """
+        Remove projects, servers and port leases of processes that no longer exist.
+        Only top-level project directories (`rank*_pid<pid>_...`) are considered, so the
+        template pool and other shared directories under the root are left alone.
+        """
+        swept = 0
+        pm2 = shutil.which("pm2")
+        for root in {self.root, self.fallback}:
+            for base in (root, root / REAPING_DIR):
+                if not base.is_dir():
+                    continue
+                for entry in base.iterdir():
+                    match = PROJECT_NAME_PATTERN.match(entry.name)
+                    if not match or _pid_alive(int(match.group(1))):
+                        continue
+                    if entry.is_dir():
+                        kill_processes_in(entry)
+                        if pm2:
+                            subprocess.run([pm2, "delete", entry.name], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                        shutil.rmtree(entry, ignore_errors=True)
+                    else:
+                        entry.unlink(missing_ok=True)  # <project>_ecosystem.config.js
+                    swept += 1
+        get_port_allocator().reclaim_dead()
+        with self.stats_lock:
+            self.stats["swept"] += swept
+        if swept:
+            print(f"Workspace sweep removed {swept} orphaned projects under {self.root}")
+        return swept
+
+    def workspace_stats(self) -> dict:
+        with self.stats_lock:
+            stats = dict(self.stats)
+        stats["pending_reaps"] = self.jobs.qsize()
+        return stats
+
+
+def check_store_filesystem(root) -> bool:
+    """Warn if the node_modules store cannot be linked into projects under `root`"""
+    if not node_modules_store.STORE_ENABLED or node_modules_store.same_filesystem(root, node_modules_store.get_store_root()):
+        return True
+    print(f"Warning: node_modules store {node_modules_store.get_store_root()} is not on the filesystem of {root}, "
+          f"every store hit becomes a full copy. Point NODE_MODULES_STORE to the same filesystem as PROJECT_ROOT.")
+    return False
+
+
+_workspace = None
+_workspace_lock = threading.Lock()
+
+def get_workspace() -> Workspace:
+    """The process-wide workspace, swept for orphans of crashed processes on first use"""
+    global _workspace
+    with _workspace_lock:
+        if _workspace is None:
+            _workspace = Workspace()
+            check_store_filesystem(_workspace.root)
+            _workspace.sweep()
+            atexit.register(_workspace.drain)
+    return _workspace
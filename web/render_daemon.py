@@ -0,0 +1,153 @@
+"""
+Node-local render service shared by all training ranks.
+
+Start one per node before training:
+
+    python -m web.render_daemon --socket /tmp/webgen_render.sock
+
+and export RENDER_DAEMON_SOCKET=/tmp/webgen_render.sock for the trainer, which turns
+`async_grade_web_appearance` into a thin client. The daemon owns the node_modules store,
+template pool, browser pool, port leases and render stage pools, so they are sized once per
+node instead of once per rank.
+
+Protocol: newline-delimited JSON over a Unix domain socket. A request
+{"id": ..., "model_response": ..., "problem_id": ..., "instruction": ...} is answered with
+{"id": ..., "score": ...}; {"id": ..., "op": "stats"} returns the daemon's counters.
+Requests on one connection are served concurrently and may be answered out of order.
+"""
+
+import os
+import json
+import asyncio
+import argparse
+from typing import Optional
+
+
+DAEMON_SOCKET = os.environ.get("RENDER_DAEMON_SOCKET", "")
+MAX_CONCURRENT_JOBS = int(os.environ.get("RENDER_DAEMON_MAX_JOBS", "256"))
+STREAM_LIMIT = 64 * 1024 * 1024  # responses can be large, allow long lines
+
+
+def daemon_stats() -> dict:
+    from .render_pipeline import get_render_pipeline
+    from .reward_cache import get_reward_cache
+    from .render import lockfile_cache
+    from .render import build_log_gate
+    from .render import node_modules_store
+    from .render.graders import get_grader
+    from .render.image_gate import gate_stats
+    from .render.preflight import preflight_stats
+    from .render.screenshot_cache import get_screenshot_cache
+    from .render.trace import step_summary
+    from .render.workspace import get_workspace
+
+    cache = get_reward_cache()
+    screenshot_cache = get_screenshot_cache()
+    return {
+        "stages": get_render_pipeline().stage_stats(),
+        "reward_cache": cache.cache_stats() if cache is not None else {},
+        "screenshot_cache": screenshot_cache.cache_stats() if screenshot_cache is not None else {},
+        "node_modules_store": node_modules_store.store_stats(),
+        "lockfile_cache": lockfile_cache.lockfile_stats(),
+        "preflight": preflight_stats(),
+        "build_log_gate": build_log_gate.gate_stats(),
+        "image_gate": gate_stats(),
+        "trace": step_summary(),
+        "grader": get_grader().grader_stats(),
+        "workspace": get_workspace().workspace_stats(),
+    }
+
+
+class RenderDaemon:
+    def __init__(self, socket_path: str, max_jobs: int = MAX_CONCURRENT_JOBS):
+        self.socket_path = socket_path
+        self.max_jobs = max_jobs
+        self.jobs = None
+
+    async def _serve_request(self, request: dict, writer: asyncio.StreamWriter, write_lock: asyncio.Lock):
+        from .web_appearance import async_grade_web_appearance_local
+
+        response = {"id": request.get("id")}
+        try:
+            if request.get("op") == "stats":
+                response["stats"] = daemon_stats()
+            else:
+                async with self.jobs:
+                    response["score"] = await async_grade_web_appearance_local(
+                        request["model_response"], request["problem_id"], request["instruction"], log_rollout=False
+                    )
+        except Exception as e:
+            response["error"] = str(e)
+        async with write_lock:
+            writer.write((json.dumps(response) + "\n").encode("utf-8"))
+            await writer.drain()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        write_lock = asyncio.Lock()
+        pending = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                task = asyncio.create_task(self._serve_request(request, writer, write_lock))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        finally:
+            writer.close()
+
+    async def serve_forever(self):
+        self.jobs = asyncio.Semaphore(self.max_jobs)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        server = await asyncio.start_unix_server(self._handle_connection, path=self.socket_path, limit=STREAM_LIMIT)
+        os.chmod(self.socket_path, 0o666)
+        print(f"Render daemon listening on {self.socket_path}")
+        async with server:
+            await server.serve_forever()
+
+
+async def grade_via_daemon(model_response: str, problem_id: str, instruction: str,
+                           socket_path: str = DAEMON_SOCKET) -> Optional[float]:
+    """
+    Submit one grading job to the node's render daemon. A connection per job keeps the client
+    independent of the event loop (the reward functions run a fresh loop per call).
+    Returns None if the daemon is unreachable so the caller can grade locally.
+    """
+    try:
+        reader, writer = await asyncio.open_unix_connection(socket_path, limit=STREAM_LIMIT)
+    except OSError as e:
+        print(f"Render daemon unavailable at {socket_path}: {e}")
+        return None
+    try:
+        request = {"id": 0, "model_response": model_response, "problem_id": str(problem_id), "instruction": instruction}
+        writer.write((json.dumps(request, ensure_ascii=False) + "\n").encode("utf-8"))
+        await writer.drain()
+        line = await reader.readline()
+    finally:
+        writer.close()
+    if not line:
+        return None
+    response = json.loads(line)
+    if "error" in response:
+        print(f"Render daemon error for problem ID {problem_id}: {response['error']}")
+        return 0.0
+    return response["score"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Node-local render daemon for web appearance grading")
+    parser.add_argument("--socket", default=DAEMON_SOCKET or "/tmp/webgen_render.sock")
+    parser.add_argument("--max-jobs", type=int, default=MAX_CONCURRENT_JOBS)
+    args = parser.parse_args()
+    asyncio.run(RenderDaemon(args.socket, args.max_jobs).serve_forever())
+
+
+if __name__ == "__main__":
+    main()
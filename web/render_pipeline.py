@@ -0,0 +1,71 @@
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict
+
+
+# Worker threads per render stage, each stage has its own pool (and work queue) so that slow
+# installs cannot occupy the threads needed by I/O-bound screenshot or VLM calls.
+DEFAULT_STAGE_WORKERS = {
+    "parse": int(os.environ.get("RENDER_PARSE_WORKERS", "8")),
+    "install": int(os.environ.get("RENDER_INSTALL_WORKERS", "8")),
+    "serve": int(os.environ.get("RENDER_SERVE_WORKERS", "16")),
+    "capture": int(os.environ.get("RENDER_CAPTURE_WORKERS", os.environ.get("BROWSER_POOL_SIZE", "4"))),
+    "grade": int(os.environ.get("RENDER_GRADE_WORKERS", "32")),
+    "cleanup": int(os.environ.get("RENDER_CLEANUP_WORKERS", "4")),
+}
+
+
+class RenderPipeline:
+    """
+    Run blocking render stages on per-stage bounded thread pools from asyncio code.
+
+    A rollout awaits each stage in turn, so rollouts of one batch overlap across stages
+    (one installing while another is captured) while every stage keeps its own concurrency cap.
+    """
+
+    def __init__(self, stage_workers: Dict[str, int] = DEFAULT_STAGE_WORKERS):
+        self.executors = {
+            stage: ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix=f"render-{stage}")
+            for stage, workers in stage_workers.items()
+        }
+        self.stats_lock = threading.Lock()
+        self.stats = {stage: {"queued": 0, "active": 0, "done": 0, "busy_seconds": 0.0} for stage in stage_workers}
+
+    def _timed(self, stage: str, fn: Callable, *args):
+        with self.stats_lock:
+            self.stats[stage]["queued"] -= 1
+            self.stats[stage]["active"] += 1
+        start = time.time()
+        try:
+            return fn(*args)
+        finally:
+            with self.stats_lock:
+                self.stats[stage]["active"] -= 1
+                self.stats[stage]["done"] += 1
+                self.stats[stage]["busy_seconds"] += time.time() - start
+
+    async def run(self, stage: str, fn: Callable, *args):
+        """Run `fn(*args)` on the pool of `stage` and await its result"""
+        with self.stats_lock:
+            self.stats[stage]["queued"] += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executors[stage], partial(self._timed, stage, fn, *args))
+
+    def stage_stats(self) -> Dict[str, dict]:
+        with self.stats_lock:
+            return {stage: dict(stats) for stage, stats in self.stats.items()}
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+def get_render_pipeline() -> RenderPipeline:
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = RenderPipeline()
+    return _pipeline
@@ -0,0 +1,138 @@
+import os
+import time
+import sqlite3
+import tempfile
+import threading
+from typing import Optional
+
+
+# Node-local persistent score cache shared by all ranks (SQLite in WAL mode). Keep it off network
+# filesystems: WAL needs shared memory between the ranks, and NFS locking is unreliable.
+cache_path = os.environ.get("REWARD_CACHE_PATH", os.path.join(tempfile.gettempdir(), "webgen_reward_cache.sqlite"))
+CACHE_ENABLED = os.environ.get("REWARD_CACHE_ENABLED", "1") == "1"
+MAX_ENTRIES = int(os.environ.get("REWARD_CACHE_MAX_ENTRIES", "1000000"))
+MAX_AGE_SECONDS = float(os.environ.get("REWARD_CACHE_MAX_AGE_DAYS", "30")) * 86400
+EVICT_EVERY = 1000  # puts between eviction passes
+TOUCH_INTERVAL = 3600  # a hit refreshes last_used (a write) only when it is older than this, seconds
+
+
+class RewardCache:
+    """
+    Content-addressed score cache. Keys are canonical artifact hashes (see
+    render/artifact.py) scoped by a namespace such as the reward name and grader version.
+    Entries are evicted by age and, beyond `max_entries`, least recently used first
+    (last_used is kept with TOUCH_INTERVAL resolution).
+    """
+
+    def __init__(self, path: str = cache_path, max_entries: int = MAX_ENTRIES, max_age: float = MAX_AGE_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.local = threading.local()
+        self.stats_lock = threading.Lock()
+        self.stats = {}
+        self.puts = 0
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS scores ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, score REAL NOT NULL,"
+            " created REAL NOT NULL, last_used REAL NOT NULL, PRIMARY KEY (namespace, key))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS scores_last_used ON scores (last_used)")
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def _count(self, namespace: str, hit: bool):
+        with self.stats_lock:
+            counters = self.stats.setdefault(namespace, {"hits": 0, "misses": 0})
+            counters["hits" if hit else "misses"] += 1
+
+    def get(self, namespace: str, key: Optional[str]) -> Optional[float]:
+        if key is None:
+            return None
+        try:
+            conn = self._conn()
+            row = conn.execute(
+                "SELECT score, created, last_used FROM scores WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            if row is not None and time.time() - row[1] > self.max_age:
+                row = None
+            if row is not None and time.time() - row[2] > TOUCH_INTERVAL:
+                # eviction only needs last_used to the hour, so most hits stay read-only
+                conn.execute(
+                    "UPDATE scores SET last_used = ? WHERE namespace = ? AND key = ?", (time.time(), namespace, key)
+                )
+                conn.commit()
+        except sqlite3.Error as e:
+            print(f"Reward cache lookup failed: {e}")
+            return None
+        self._count(namespace, row is not None)
+        return row[0] if row is not None else None
+
+    def put(self, namespace: str, key: Optional[str], score: float):
+        if key is None:
+            return
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO scores (namespace, key, score, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, float(score), now, now),
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Reward cache write failed: {e}")
+            return
+        with self.stats_lock:
+            self.puts += 1
+            evict = self.puts % EVICT_EVERY == 0
+        if evict:
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop entries older than `max_age`, then the least recently used ones beyond `max_entries`"""
+        try:
+            conn = self._conn()
+            removed = conn.execute("DELETE FROM scores WHERE created < ?", (time.time() - self.max_age,)).rowcount
+            excess = conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0] - self.max_entries
+            if excess > 0:
+                removed += conn.execute(
+                    "DELETE FROM scores WHERE rowid IN (SELECT rowid FROM scores ORDER BY last_used LIMIT ?)", (excess,)
+                ).rowcount
+            conn.commit()
+            return removed
+        except sqlite3.Error as e:
+            print(f"Reward cache eviction failed: {e}")
+            return 0
+
+    def cache_stats(self) -> dict:
+        """Hits, misses and hit rate per namespace for this process"""
+        with self.stats_lock:
+            stats = {namespace: dict(counters) for namespace, counters in self.stats.items()}
+        for counters in stats.values():
+            lookups = counters["hits"] + counters["misses"]
+            counters["hit_rate"] = counters["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_reward_cache() -> Optional[RewardCache]:
+    global _cache
+    if not CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = RewardCache()
+    return _cache
@@ -3,27 +3,37 @@ import re
 import json
 import time
 import asyncio
-import subprocess
-import threading
-import shutil
 from pathlib import Path
+from typing import List
 
 import uuid
-import tempfile
 
 from .web_code_format import validate_code_format
 from .render.step_1_response_parsing import extract_and_build_project, extract_web_actions
-from .render.step_2_start_service import start_services
+from .render.step_2_start_service import SERVE_MODE, run_npm_install, serve_project, service_url, stop_project_server
+from .render.static_server import peek_static_server
+from .render.port_allocator import get_port_allocator
+from .render.resource_limits import release_limits
 from .render.step_3_get_screenshots import capture_scroll_screenshots
-from .render.step_4_vlm_grading import get_score_result, first_grade_int
+from .render.step_4_vlm_grading import FALLBACK_OUTPUT, async_get_score_result, first_grade_int, get_score_result, grader_version
+from .render.artifact import artifact_digest
+from .render.image_gate import GATE_MODE, archive_grade, gate_screenshots
+from .render.preflight import PREFLIGHT_ENABLED, PREFLIGHT_MODE, preflight_check, record_outcome, record_preflight
+from .render.trace import RenderFailure, RenderTrace
+from .render.workspace import get_workspace
 from .render.utils import load_json, save_json, load_json_or_jsonl
+from .render_pipeline import get_render_pipeline
+from .reward_cache import get_reward_cache
+from .render_daemon import DAEMON_SOCKET, grade_via_daemon
+from .work_queue import RenderWorkQueue, queue_root
 
 
-project_root = os.environ.get("PROJECT_ROOT", "./projects")
-os.makedirs(project_root, exist_ok=True) 
 rollout_file = os.environ.get("ROLLOUT_FILE", "./web_rollout.jsonl")
 
 RANK = int(os.environ.get("RANK", "0"))
+APPEARANCE_CACHE_NAMESPACE = "web_appearance"
+# a screenshot PNG this small is a (nearly) uniform page, only used to label traces
+BLANK_PAGE_MAX_BYTES = int(os.environ.get("BLANK_PAGE_MAX_BYTES", "6000"))
 def rollout_to_jsonl(problem_id: str, instruction: str, model_response: str, file_path: str=rollout_file):  
     if RANK == 3:
         entry = {
@@ -34,6 +44,14 @@ def rollout_to_jsonl(problem_id: str, instruction: str, model_response: str, fil
         with open(file_path, "a", encoding="utf-8") as f:
             f.write(json.dumps(entry, ensure_ascii=False) + "\n")
 
+def stop_project_processes(project_name: str):
+    # Stop the dev server and everything it forked (ignore failures)
+    if SERVE_MODE != "static":
+        stop_project_server(project_name)
+    # Return the project's port leases to the node-wide allocator once nothing listens on them
+    get_port_allocator().release_owner(project_name)
+    release_limits(project_name)
+
 def clear_web_project(project_path):
     try:
         # Validate input
@@ -43,96 +61,265 @@ def clear_web_project(project_path):
         project_path = Path(project_path).resolve()
         # Get project name safely
         project_name = project_path.name
-        # Stop pm2 service (ignore failures)
-        subprocess.run(
-            f"pm2 delete {project_name} || true",
-            shell=True,
-            check=False,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        # Remove project directory if exists
-        if project_path.exists():
-            shutil.rmtree(project_path, ignore_errors=True)
-        # Remove ecosystem config file if exists
+        # Unmount a static build from the shared server (no-op in dev-server mode)
+        static_server = peek_static_server()
+        if static_server is not None:
+            static_server.unmount(project_name)
+        # Stopping the server and deleting the project directory and its ecosystem config
+        # happen on the workspace reaper threads, scoring does not wait for them
         ecosystem_file = project_path.parent / f"{project_name}_ecosystem.config.js"
-        if ecosystem_file.exists():
-            ecosystem_file.unlink(missing_ok=True)
+        get_workspace().reap(project_path, teardown=lambda: stop_project_processes(project_name),
+                             extra_paths=[ecosystem_file])
         return 1
     except Exception:
         # Return 0 for any exception
         return 0
 
-port_lock = threading.Lock()
-used_ports = set()
-def grade_web_appearance(model_response: str, problem_id: str, instruction: str) -> float:
-    # save rollout for analysis
-    rollout_to_jsonl(str(problem_id), instruction, model_response)
-
+def stage_parse(job: dict) -> bool:
+    """Format check, project extraction and command resolution. Returns False to stop with a 0 score."""
+    model_response, problem_id, trace = job["model_response"], job["problem_id"], job["trace"]
     # step 0: web format checking
-    try:
+    with trace.span("format_check") as record:
         if not validate_code_format(model_response):
             print(f"Invalid code format for problem ID {problem_id}. Skipping...")
-            return 0.0
-    except Exception as e:
-        print(f"Error occurred while processing problem ID {problem_id}: {str(e)}")
-        return 0.0
-    
+            record["failure"] = "format_invalid"
+            return False
+
+    # reject projects that cannot build before paying for npm install and a browser (in shadow mode only record it)
+    if PREFLIGHT_ENABLED:
+        with trace.span("preflight", mode=PREFLIGHT_MODE) as record:
+            reason, detail = preflight_check(model_response)
+            record_preflight(reason)
+            job["preflight"] = reason
+            record["reason"] = reason
+            if reason != "ok":
+                record["detail"] = detail
+            if reason != "ok" and PREFLIGHT_MODE == "enforce":
+                print(f"Pre-flight rejected problem ID {problem_id}: {reason} {detail}")
+                record["failure"] = f"preflight_{reason}"
+                return False
+
+    # identical artifacts graded before (other steps, resumed runs) are served from the score cache
+    cache = get_reward_cache()
+    if cache is not None:
+        with trace.span("cache_lookup") as record:
+            job["cache_key"] = artifact_digest(model_response, job["instruction"], grader_version())
+            cached_score = cache.get(APPEARANCE_CACHE_NAMESPACE, job["cache_key"])
+            record["hit"] = cached_score is not None
+        if cached_score is not None:
+            job["score"] = cached_score
+            job["cached"] = True
+            return False
+
     # unique ID for the project
     unique_id = f"rank{RANK}_pid{os.getpid()}_{problem_id}_{uuid.uuid4()}" 
-    project_path = tempfile.mkdtemp(prefix=unique_id, dir=project_root)
+    job["project_path"] = get_workspace().create_project_dir(prefix=unique_id)
+
+    # step 1: response parsing and project extraction
+    with trace.span("extract", failure="extract_failed"):
+        extract_and_build_project(model_response, output_dir=job["project_path"])
+
+    # step 2: get install and start commands, if not provided, npm install and npm run dev will be used by default
+    shell_actions, last_start_action = extract_web_actions(model_response)
+    commands = {"shell_actions": shell_actions, "last_start_action": last_start_action}
+    if commands["shell_actions"] is None or len(commands["shell_actions"]) == 0:
+        commands["shell_actions"] = ["npm install"]
+    if commands["last_start_action"] is None or len(commands["last_start_action"]) == 0:
+        commands["last_start_action"] = "npm run dev"
+    job["commands"] = commands
+    return True
+
+def stage_install(job: dict) -> bool:
+    run_npm_install(job["project_path"], job["commands"])
+    get_workspace().check_quota(job["project_path"])
+    return True
+
+def stage_serve(job: dict) -> bool:
+    # step 3: run the project
+    port, project_name = serve_project(job["project_path"], job["commands"])
+    job["url"] = service_url(port, project_name)
+    return True
+
+def stage_capture(job: dict) -> bool:
+    # step 4: capture screenshots by port
+    job["shot_path"] = capture_scroll_screenshots(
+        url = job["url"],
+        out_dir = os.path.join(job["project_path"], "shots"),
+        user_data_dir = os.path.join(job["project_path"], "chrome_data"),
+        max_shots = 1,
+        pause = 0.8, # 0.4
+        viewport_height = 768
+    )
+    if job["shot_path"] is None:
+        raise RenderFailure("page_load_failed", f"could not load {job['url']}")
+    shots = [os.path.join(job["shot_path"], f) for f in os.listdir(job["shot_path"]) if f.endswith(".png")]
+    if not shots:
+        raise RenderFailure("no_screenshot")
+    get_workspace().check_quota(job["project_path"])
+    with job["trace"].span("blank_check") as record:
+        if all(os.path.getsize(shot) <= BLANK_PAGE_MAX_BYTES for shot in shots):
+            record["failure"] = "blank_page"
+    return True
+
+def prepare_grade(job: dict):
+    """Screenshots to send to the VLM, or None if the image gate already scored the job"""
+    shot_path, instruction = job["shot_path"], job["instruction"]
+    image_paths = [os.path.join(shot_path, f) for f in os.listdir(shot_path) if f.endswith(".png")]
+    with job["trace"].span("image_gate", mode=GATE_MODE) as record:
+        job["gate_reason"] = gate_reason = gate_screenshots(image_paths)
+        record["reason"] = gate_reason
+        if gate_reason is not None and GATE_MODE == "enforce":
+            record["failure"] = f"gate_{gate_reason.split(':')[0]}"
+    if gate_reason is not None and GATE_MODE == "enforce":
+        # a certain 0, skip the VLM call; not cached so that gate changes take effect
+        save_json([{"instruction": instruction}, {"vlm_output": None}, {"grade_score": 0}, {"gate_reason": gate_reason}],
+                  os.path.join(shot_path, "appearance_result.json"))
+        archive_grade(shot_path, job["project_path"])
+        job["score"] = 0
+        return None
+    return image_paths
+
+def finish_grade(job: dict, output: str):
+    shot_path = job["shot_path"]
+    grade_score = first_grade_int(output)
+    save_json([
+        {"instruction": job["instruction"]}, 
+        {"vlm_output": output}, 
+        {"grade_score": grade_score},
+        {"gate_reason": job.get("gate_reason")}
+    ], os.path.join(shot_path, "appearance_result.json"))
+    if output != FALLBACK_OUTPUT:
+        archive_grade(shot_path, job["project_path"])
+    job["score"] = grade_score # / 5.0
+    cache = get_reward_cache()
+    if cache is not None and output != FALLBACK_OUTPUT:
+        cache.put(APPEARANCE_CACHE_NAMESPACE, job.get("cache_key"), grade_score)
+
+def stage_grade(job: dict) -> bool:
+    # step 5: evaluate the appearance
+    image_paths = prepare_grade(job)
+    if image_paths is None:
+        return True
+    with job["trace"].span("vlm", failure="vlm_error", images=len(image_paths)) as record:
+        output = get_score_result(image_paths, job["instruction"])
+        if output == FALLBACK_OUTPUT:
+            record["failure"] = "vlm_error"
+    finish_grade(job, output)
+    return True
+
+async def async_stage_grade(job: dict, pipeline) -> bool:
+    """stage_grade for the pipeline: the VLM request is awaited on the event loop, not on a grade worker"""
+    with job["trace"].span("grade", failure="grade_failed"):
+        image_paths = await pipeline.run("grade", prepare_grade, job)
+        if image_paths is None:
+            return True
+        with job["trace"].span("vlm", failure="vlm_error", images=len(image_paths)) as record:
+            output = await async_get_score_result(image_paths, job["instruction"])
+            if output == FALLBACK_OUTPUT:
+                record["failure"] = "vlm_error"
+        await pipeline.run("grade", finish_grade, job, output)
+    return True
+
+RENDER_STAGES = [
+    ("parse", stage_parse),
+    ("install", stage_install),
+    ("serve", stage_serve),
+    ("capture", stage_capture),
+    ("grade", stage_grade),
+]
+
+def new_render_job(model_response: str, problem_id: str, instruction: str, log_rollout: bool = True) -> dict:
+    # save rollout for analysis
+    if log_rollout:
+        rollout_to_jsonl(str(problem_id), instruction, model_response)
+    return {"model_response": model_response, "problem_id": problem_id, "instruction": instruction, "score": 0.0,
+            "trace": RenderTrace(problem_id)}
+
+def run_stage(stage: str, stage_fn, job: dict) -> bool:
+    """Run one stage inside its trace span, so that spans opened by the render steps nest under it"""
+    with job["trace"].span(stage, failure=f"{stage}_failed"):
+        return stage_fn(job)
+
+def report_failure(job: dict, e: Exception):
+    failure_class = getattr(e, "failure_class", None) or "exception"
+    print(f"Error occurred while processing problem ID {job['problem_id']} ({failure_class}): {str(e)}")
+
+def finish_render_job(job: dict):
+    reason = job.get("preflight")
+    if reason is not None and PREFLIGHT_MODE != "enforce" and record_outcome(reason, job["score"]):
+        print(f"Pre-flight disagreement for problem ID {job['problem_id']}: {reason} but scored {job['score']}")
+    job["trace"].finish(job["score"], cached=job.get("cached", False), preflight=reason)
+
+def render_dedup_key(model_response: str, instruction: str):
+    """
+    Completions with the same key build the same project for the same instruction and pass or fail
+    the format check alike, so one render can score all of them. None if there is no artifact.
+    """
+    return artifact_digest(model_response, instruction, str(validate_code_format(model_response)))
+
+def grade_web_appearance(model_response: str, problem_id: str, instruction: str) -> float:
+    job = new_render_job(model_response, problem_id, instruction)
     try:
-        # step 1: response parsing and project extraction
-        extract_and_build_project(model_response, output_dir=project_path)
-
-        # step 2: get install and start commands, if not provided, npm install and npm run dev will be used by default
-        shell_actions, last_start_action = extract_web_actions(model_response)
-        commands = {"shell_actions": shell_actions, "last_start_action": last_start_action}
-        if commands["shell_actions"] is None or len(commands["shell_actions"]) == 0:
-            commands["shell_actions"] = ["npm install"]
-        if commands["last_start_action"] is None or len(commands["last_start_action"]) == 0:
-            commands["last_start_action"] = "npm run dev"
-        
-        # step 3: run the project and take screenshots
-        port, project_name = start_services(project_path, commands, used_ports, port_lock)
-
-        # step 4: capture screenshots by port
-        shot_path = capture_scroll_screenshots(
-            url = f"http://localhost:{port}/",
-            out_dir = os.path.join(project_path, "shots"),
-            user_data_dir = os.path.join(project_path, "chrome_data"),
-            max_shots = 1,
-            pause = 0.8, # 0.4
-            viewport_height = 768
-        )
-
-        # step 5: evaluate the appearance
-        image_paths = [os.path.join(shot_path, f) for f in os.listdir(shot_path) if f.endswith(".png")]
-        output = get_score_result(image_paths, instruction)
-        grade_score = first_grade_int(output)
-        result_path = os.path.join(project_path, "shots", "appearance_result.json")
-        save_json([
-            {"instruction": instruction}, 
-            {"vlm_output": output}, 
-            {"grade_score": grade_score}
-        ], result_path)
-
-        return grade_score # / 5.0
+        for stage, stage_fn in RENDER_STAGES:
+            if not run_stage(stage, stage_fn, job):
+                break
     except Exception as e:
-        print(f"Error occurred while processing problem ID {problem_id}: {str(e)}")
-        return 0.0
+        report_failure(job, e)
+        job["score"] = 0.0
     finally:
-        clear_web_project(project_path)
-        if 'port' in locals():
-            with port_lock:
-                used_ports.discard(port)
-
-async def async_grade_web_appearance(model_response: str, problem_id: str, instruction: str) -> float:
-    return await asyncio.to_thread(
-        grade_web_appearance,
-        model_response,
-        problem_id,
-        instruction
-    )
+        clear_web_project(job.get("project_path"))
+        finish_render_job(job)
+    return job["score"]
+
+async def async_grade_web_appearance_local(model_response: str, problem_id: str, instruction: str,
+                                           log_rollout: bool = True) -> float:
+    """Same as grade_web_appearance, but every stage runs on its own bounded pool of the render pipeline"""
+    pipeline = get_render_pipeline()
+    job = new_render_job(model_response, problem_id, instruction, log_rollout=log_rollout)
+    try:
+        for stage, stage_fn in RENDER_STAGES:
+            if stage == "grade":
+                await async_stage_grade(job, pipeline)
+            elif not await pipeline.run(stage, run_stage, stage, stage_fn, job):
+                break
+    except Exception as e:
+        report_failure(job, e)
+        job["score"] = 0.0
+    finally:
+        await pipeline.run("cleanup", clear_web_project, job.get("project_path"))
+        finish_render_job(job)
+    return job["score"]
+
+async def async_grade_web_appearance(model_response: str, problem_id: str, instruction: str,
+                                     log_rollout: bool = True) -> float:
+    """Grade through the node's render daemon if RENDER_DAEMON_SOCKET is set, otherwise in-process"""
+    if DAEMON_SOCKET:
+        if log_rollout:
+            rollout_to_jsonl(str(problem_id), instruction, model_response)
+        score = await grade_via_daemon(model_response, problem_id, instruction)
+        if score is not None:
+            return score
+        return await async_grade_web_appearance_local(model_response, problem_id, instruction, log_rollout=False)
+    return await async_grade_web_appearance_local(model_response, problem_id, instruction, log_rollout=log_rollout)
+
+async def async_grade_web_appearance_batch(model_responses: List[str], problem_ids: List[str], instructions: List[str]) -> List[float]:
+    """
+    Grade a batch of one rank. With RENDER_QUEUE_DIR set the jobs go through the node's shared work
+    queue, where ranks that finish early steal pending jobs from busy ones; otherwise all jobs run here.
+    """
+    if not queue_root:
+        return await asyncio.gather(*[
+            async_grade_web_appearance(model_response, problem_id, instruction)
+            for model_response, problem_id, instruction in zip(model_responses, problem_ids, instructions)
+        ])
+
+    work_queue = RenderWorkQueue()
+    job_ids = []
+    for model_response, problem_id, instruction in zip(model_responses, problem_ids, instructions):
+        rollout_to_jsonl(str(problem_id), instruction, model_response)
+        job_ids.append(work_queue.submit(model_response, problem_id, instruction))
+
+    async def grade_job(model_response, problem_id, instruction):
+        return await async_grade_web_appearance(model_response, problem_id, instruction, log_rollout=False)
 
-    
\ No newline at end of file
+    return await work_queue.run_until_done(job_ids, grade_job)
@@ -1,10 +1,28 @@
 import re
 import json
 import asyncio
+import functools
 from typing import Dict, List, Tuple
 
 
+FORMAT_CACHE_SIZE = 4096
+
+
 def validate_code_format(model_response: str) -> float:
+    """
+    Memoized `check_code_format`. Only the webArtifact block is inspected, so it is the cache key;
+    the check is a few regexes, cheaper than any shared cache lookup would be.
+    """
+    artifact_match = re.search(r'<webArtifact\s+([^>]*)>(.*?)</webArtifact>', model_response, re.DOTALL)
+    if not artifact_match:
+        return 0.0
+    return _check_artifact(artifact_match.group(0))
+
+@functools.lru_cache(maxsize=FORMAT_CACHE_SIZE)
+def _check_artifact(artifact_block: str) -> float:
+    return check_code_format(artifact_block)
+
+def check_code_format(model_response: str) -> float:
     """
     Validate if the LLM response strictly follows the required web project generation format
 
@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+from pathlib import Path
+from typing import Awaitable, Callable, List
+
+
+# Filesystem job queue shared by the ranks of a node, idle ranks steal pending render jobs
+queue_root = os.environ.get("RENDER_QUEUE_DIR", "")
+QUEUE_CONCURRENCY = int(os.environ.get("RENDER_QUEUE_CONCURRENCY", "32"))
+QUEUE_TIMEOUT = float(os.environ.get("RENDER_QUEUE_TIMEOUT", "3600"))
+# a claimed job whose file was not touched for this long belongs to a dead rank and is requeued
+QUEUE_LEASE = float(os.environ.get("RENDER_QUEUE_LEASE", "300"))
+HEARTBEAT_INTERVAL = QUEUE_LEASE / 5
+POLL_INTERVAL = 0.05
+
+RANK = int(os.environ.get("RANK", "0"))
+
+
+def _write_atomic(path: Path, data: dict):
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.rename(tmp, path)
+
+
+class RenderWorkQueue:
+    """
+    Cross-rank render queue on a node-local filesystem.
+
+    Jobs are files in `pending/`. A rank claims a job by renaming it into its own `running/<rank>/`
+    directory (atomic, so exactly one rank wins), and writes the score to the originating rank's
+    `results/<origin>/` directory. Ranks first drain their own jobs, then steal from others, and
+    only leave once their own results are back and nothing is left to steal.
+
+    The mtime of a claimed file is its lease: the claiming rank touches it every HEARTBEAT_INTERVAL,
+    and any rank moves files older than QUEUE_LEASE back to `pending/`, so the jobs of a rank that
+    died are picked up by the others. A new queue first drops what an earlier run of its rank left.
+    """
+
+    def __init__(self, root: str = queue_root, rank: int = RANK):
+        self.root = Path(root)
+        self.rank = rank
+        self.pending = self.root / "pending"
+        self.running = self.root / "running" / str(rank)
+        self.results = self.root / "results" / str(rank)
+        for directory in (self.pending, self.running, self.results):
+            directory.mkdir(parents=True, exist_ok=True)
+        self._clean_previous_run()
+
+    def _clean_previous_run(self):
+        """
+        Nobody waits for the jobs an earlier run of this rank submitted any more: drop them and their
+        results, and give back the jobs of other ranks it had claimed.
+        """
+        own_tag = f"-r{self.rank}-"
+        stale = [path for path in self.pending.glob("*.json") if own_tag in path.name]
+        stale += list(self.results.glob("*.json"))
+        for path in self.running.glob("*.json"):
+            if own_tag in path.name:
+                stale.append(path)
+            else:
+                try:
+                    os.rename(path, self.pending / path.name)
+                except OSError:
+                    pass
+        for path in stale:
+            path.unlink(missing_ok=True)
+
+    def submit(self, model_response: str, problem_id: str, instruction: str) -> str:
+        job_id = f"{time.time():.6f}-r{self.rank}-{uuid.uuid4().hex[:8]}"
+        job = {
+            "id": job_id,
+            "origin": self.rank,
+            "model_response": model_response,
+            "problem_id": str(problem_id),
+            "instruction": instruction,
+        }
+        _write_atomic(self.pending / f"{job_id}.json", job)
+        return job_id
+
+    def _claim(self):
+        """Claim one pending job, own jobs first, then the oldest job of any other rank"""
+        try:
+            names = [name for name in os.listdir(self.pending) if name.endswith(".json")]
+        except OSError:
+            return None
+        own_tag = f"-r{self.rank}-"
+        names.sort(key=lambda name: (own_tag not in name, name))  # ids start with the submit time
+        for name in names:
+            claimed = self.running / name
+            try:
+                os.rename(self.pending / name, claimed)
+                os.utime(claimed)  # the rename keeps the submit time, start the lease now
+                with open(claimed, "r", encoding="utf-8") as f:
+                    return claimed, json.load(f)
+            except OSError:
+                continue  # another rank was faster
+        return None
+
+    def _heartbeat(self, claimed: List[Path]):
+        for path in claimed:
+            try:
+                os.utime(path)
+            except OSError:
+                pass  # finished, or requeued after a stall; a second grade of the job is harmless
+
+    def _requeue_stale(self) -> int:
+        """Move claimed jobs whose lease expired back to pending, return how many"""
+        requeued = 0
+        deadline = time.time() - QUEUE_LEASE
+        for path in (self.root / "running").glob("*/*.json"):
+            if path.parent == self.running:
+                continue
+            try:
+                if path.stat().st_mtime < deadline:
+                    os.rename(path, self.pending / path.name)
+                    requeued += 1
+            except OSError:
+                continue  # finished or requeued by another rank
+        return requeued
+
+    def _has_pending(self) -> bool:
+        try:
+            return any(name.endswith(".json") for name in os.listdir(self.pending))
+        except OSError:
+            return False
+
+    async def _execute(self, claimed: Path, job: dict, grade_fn: Callable[..., Awaitable[float]]):
+        try:
+            score = await grade_fn(job["model_response"], job["problem_id"], job["instruction"])
+        except Exception as e:
+            print(f"Error occurred while processing problem ID {job['problem_id']}: {str(e)}")
+            score = 0.0
+        result_dir = self.root / "results" / str(job["origin"])
+        result_dir.mkdir(parents=True, exist_ok=True)
+        _write_atomic(result_dir / f"{job['id']}.json", {"id": job["id"], "score": score, "worker": self.rank})
+        claimed.unlink(missing_ok=True)
+
+    async def run_until_done(self, job_ids: List[str], grade_fn: Callable[..., Awaitable[float]],
+                             concurrency: int = QUEUE_CONCURRENCY, timeout: float = QUEUE_TIMEOUT) -> List[float]:
+        """Work on the shared queue until all of `job_ids` have results, return their scores in order"""
+        scores = {}
+        running = {}  # task -> claimed file
+        stolen = requeued = 0
+        busy = idle = 0.0
+        start = last = last_heartbeat = time.time()
+        while True:
+            if time.time() - last_heartbeat > HEARTBEAT_INTERVAL:
+                last_heartbeat = time.time()
+                self._heartbeat(list(running.values()))
+                requeued += self._requeue_stale()
+
+            while len(running) < concurrency:
+                claim = self._claim()
+                if claim is None:
+                    break
+                if claim[1]["origin"] != self.rank:
+                    stolen += 1
+                running[asyncio.create_task(self._execute(claim[0], claim[1], grade_fn))] = claim[0]
+
+            for job_id in job_ids:
+                if job_id not in scores:
+                    result_path = self.results / f"{job_id}.json"
+                    if result_path.exists():
+                        with open(result_path, "r", encoding="utf-8") as f:
+                            scores[job_id] = json.load(f)["score"]
+                        result_path.unlink(missing_ok=True)
+
+            if len(scores) == len(job_ids) and not running and not self._has_pending():
+                break
+            if time.time() - start > timeout and not running:
+                print(f"Render queue timed out on rank {self.rank}, {len(job_ids) - len(scores)} jobs scored 0")
+                break
+
+            was_busy = bool(running)
+            if running:
+                done, _ = await asyncio.wait(running, timeout=POLL_INTERVAL, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    del running[task]
+            else:
+                await asyncio.sleep(POLL_INTERVAL)
+            now = time.time()
+            if was_busy:
+                busy += now - last
+            else:
+                idle += now - last
+            last = now
+
+        print(
+            f"render queue rank {self.rank}: {len(job_ids)} own jobs, {stolen} stolen, {requeued} requeued, "
+            f"busy {busy:.1f}s, idle {idle:.1f}s"
+        )
+        return [scores.get(job_id, 0.0) for job_id in job_ids]